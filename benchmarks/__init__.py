@@ -0,0 +1,8 @@
+"""
+Бенчмарки сервиса справочников.
+
+Запуск из корня проекта, например:
+    python -m benchmarks.bench_import --rows 100000
+
+Каждый бенчмарк работает во временной тестовой базе данных и не изменяет db.sqlite3.
+"""
@@ -0,0 +1,77 @@
+"""
+Время открытия страниц административной панели и число SQL-запросов на больших справочниках
+(по умолчанию 10 справочников × 4 версии × 25 000 элементов = 1 млн элементов).
+
+    python -m benchmarks.bench_admin --size 10x4x25000 --repeat 5
+"""
+import argparse
+import time
+
+from benchmarks.datagen import element_code, generate, parse_size
+from benchmarks.utils import setup_django, test_database
+
+
+def pages(refbook, version):
+    """
+    Возвращает адреса проверяемых страниц административной панели.
+    """
+    from django.urls import reverse
+
+    elements = reverse('admin:reference_referenceelement_changelist')
+    return {
+        'refbook list': reverse('admin:reference_reference_changelist'),
+        'refbook change': reverse('admin:reference_reference_change', args=[refbook.id]),
+        'version list': reverse('admin:reference_referenceversion_changelist'),
+        'version change': reverse('admin:reference_referenceversion_change', args=[version.id]),
+        'element list': elements,
+        'elements of refbook': f'{elements}?version__reference__id__exact={refbook.id}',
+        'elements of version': f'{elements}?version={version.id}',
+        'search code': f'{elements}?q={element_code(12345)}',
+        'search words': f'{elements}?q=Value+12345+of',
+        'search words in version': f'{elements}?version={version.id}&q=Value+12345+of',
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', default='10x4x25000', help='Размер данных NxMxK (справочники x версии x элементы)')
+    parser.add_argument('--repeat', type=int, default=5, help='Число открытий каждой страницы')
+    args = parser.parse_args()
+    try:
+        size = parse_size(args.size)
+    except ValueError as error:
+        parser.error(str(error))
+
+    setup_django()
+    from django.conf import settings
+    from django.contrib.auth.models import User
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import CaptureQueriesContext
+    from reference.models import ReferenceVersion
+
+    settings.ALLOWED_HOSTS = ['*']
+    with test_database():
+        started = time.perf_counter()
+        refbooks = generate(size)
+        print(f'Generated {size.refbooks * size.versions * size.elements} elements '
+              f'in {time.perf_counter() - started:.1f} s')
+        version = ReferenceVersion.objects.filter(reference=refbooks[0]).order_by('start_date').last()
+        client = Client()
+        client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'admin'))
+
+        print(f'{"page":<26}{"status":>8}{"queries":>9}{"median ms":>11}')
+        for name, url in pages(refbooks[0], version).items():
+            timings = []
+            for _ in range(args.repeat):
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    response = client.get(url)
+                    timings.append(time.perf_counter() - started)
+            timings.sort()
+            print(f'{name:<26}{response.status_code:>8}{len(queries.captured_queries):>9}'
+                  f'{timings[len(timings) // 2] * 1000:>11.1f}')
+
+
+if __name__ == '__main__':
+    main()
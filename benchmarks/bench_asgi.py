@@ -0,0 +1,97 @@
+"""
+Нагрузочное сравнение чтения справочников: синхронные представления DRF (WSGI, пул потоков)
+против асинхронных представлений reference.async_views (ASGI, одна петля событий).
+
+Запросы выполняются в одном процессе через обработчики Django тестового клиента,
+поэтому результат показывает накладные расходы путей обработки запроса, а не сети.
+
+    python -m benchmarks.bench_asgi --requests 2000 --concurrency 50
+"""
+import argparse
+import asyncio
+import datetime
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.utils import percentile, rate, setup_django, test_database
+
+
+def run_wsgi(urls, concurrency):
+    from django.test import Client
+
+    def request(url):
+        started = time.perf_counter()
+        response = Client().get(url)
+        assert response.status_code == 200, (url, response.status_code)
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = list(executor.map(request, urls))
+    return latencies, time.perf_counter() - started
+
+
+def run_asgi(urls, concurrency):
+    from django.test import AsyncClient
+
+    async def main():
+        semaphore = asyncio.Semaphore(concurrency)
+        client = AsyncClient()
+
+        async def request(url):
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.get(url)
+                assert response.status_code == 200, (url, response.status_code)
+                return time.perf_counter() - started
+
+        started = time.perf_counter()
+        latencies = await asyncio.gather(*(request(url) for url in urls))
+        return latencies, time.perf_counter() - started
+
+    return asyncio.run(main())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=2000, help='Число запросов для каждого пути')
+    parser.add_argument('--concurrency', type=int, default=50, help='Число одновременных запросов')
+    parser.add_argument('--elements', type=int, default=1000, help='Число элементов в версии справочника')
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    from reference.cache import element_cache
+    from reference.models import Reference, ReferenceVersion, ReferenceElement
+
+    settings.ALLOWED_HOSTS = ['*']
+    results = []
+    with test_database():
+        reference = Reference.objects.create(code='BENCH', name='Benchmark')
+        version = ReferenceVersion.objects.create(reference=reference, version='1.0',
+                                                  start_date=datetime.date(2020, 1, 1))
+        ReferenceElement.objects.bulk_create(
+            ReferenceElement(version=version, code=f'C{i:06d}', value=f'Value {i}') for i in range(args.elements)
+        )
+        element_cache.clear()
+
+        paths = {
+            'check_element': (f'/refbooks/{reference.id}/check_element/?code=C000001&value=Value+1',
+                              f'/async/refbooks/{reference.id}/check_element/?code=C000001&value=Value+1'),
+            'elements': (f'/refbooks/{reference.id}/elements/',
+                         f'/async/refbooks/{reference.id}/elements/'),
+        }
+        for name, (sync_url, async_url) in paths.items():
+            for mode, runner, url in (('wsgi', run_wsgi, sync_url), ('asgi', run_asgi, async_url)):
+                runner([url] * 10, 1)  # прогрев кэша и соединений
+                latencies, seconds = runner([url] * args.requests, args.concurrency)
+                results.append((f'{name} ({mode})', args.requests, seconds, latencies))
+
+    print(f'{"endpoint":<26}{"requests":>10}{"req/sec":>10}{"p50 ms":>10}{"p99 ms":>10}')
+    for name, count, seconds, latencies in results:
+        print(f'{name:<26}{count:>10}{rate(count, seconds):>10.0f}'
+              f'{percentile(latencies, 0.5) * 1000:>10.2f}{percentile(latencies, 0.99) * 1000:>10.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+"""
+Бенчмарк публичных API: RefBookList, RefbookElementsView, RefbookElementCheckView и RefbookElementSearchView
+на синтетических данных нескольких размеров (справочники × версии × элементы).
+
+Для каждого размера и API измеряются перцентили времени ответа, число SQL-запросов
+на холодный (пустой кэш) и прогретый запрос и пиковое потребление памяти холодным запросом.
+
+    python -m benchmarks.bench_endpoints --sizes 10x3x100,50x5x10000 --output results.json
+
+Режим порогов: сравнение с ранее сохранённым результатом, код возврата 1 при регрессии.
+
+    python -m benchmarks.bench_endpoints --sizes 10x3x100 --baseline results.json --tolerance 0.25
+"""
+import argparse
+import datetime
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+from benchmarks.datagen import FIRST_START_DATE, element_code, element_value, generate, parse_size
+from benchmarks.utils import percentile, setup_django, test_database
+
+# Метрики, по которым ищутся регрессии, и допустимый рост относительно базового результата.
+# Число запросов сравнивается точно: любой лишний запрос считается регрессией.
+LATENCY_METRICS = ('p50_ms', 'p95_ms')
+EXACT_METRICS = ('queries', 'cold_queries')
+MEMORY_METRICS = ('peak_memory_kb',)
+
+
+def endpoint_urls(refbooks, size):
+    """
+    Возвращает URL API для последнего созданного справочника и его последней версии.
+    """
+    from django.urls import reverse
+
+    refbook = refbooks[-1]
+    last = size.versions - 1
+    date = FIRST_START_DATE.replace(year=FIRST_START_DATE.year + last).isoformat()
+    code = element_code(size.elements // 2)
+    return {
+        'refbook_list': f'{reverse("reference:refbook-list")}?date={date}',
+        'elements': f'{reverse("reference:refbook_elements_list", args=[refbook.id])}?version={last + 1}.0',
+        'check_element': (f'{reverse("reference:check_refbook_element", args=[refbook.id])}'
+                          f'?code={code}&value={element_value(last, size.elements // 2).replace(" ", "+")}'),
+        'search': f'{reverse("reference:search_refbook_elements", args=[refbook.id])}?q={size.elements // 2}',
+    }
+
+
+def measure(client, url, requests):
+    """
+    Выполняет холодный запрос при пустом кэше, затем requests прогретых запросов.
+    """
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from reference.cache import element_cache
+
+    element_cache.clear()
+    tracemalloc.start()
+    with CaptureQueriesContext(connection) as cold:
+        response = client.get(url)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert response.status_code == 200, (url, response.status_code)
+
+    latencies = []
+    with CaptureQueriesContext(connection) as warm:
+        for _ in range(requests):
+            started = time.perf_counter()
+            response = client.get(url)
+            if hasattr(response, 'streaming_content'):
+                b''.join(response.streaming_content)
+            latencies.append((time.perf_counter() - started) * 1000)
+    return {
+        'requests': requests,
+        'p50_ms': round(percentile(latencies, 0.5), 3),
+        'p95_ms': round(percentile(latencies, 0.95), 3),
+        'p99_ms': round(percentile(latencies, 0.99), 3),
+        'mean_ms': round(sum(latencies) / len(latencies), 3),
+        'cold_queries': len(cold),
+        'queries': round(len(warm) / requests, 2),
+        'peak_memory_kb': round(peak / 1024, 1),
+        'response_bytes': len(response.content),
+    }
+
+
+def run(sizes, requests):
+    from django.conf import settings
+    from django.test import Client
+
+    settings.ALLOWED_HOSTS = ['*']
+    results = {}
+    for size_name, size in sizes:
+        with test_database():
+            started = time.monotonic()
+            refbooks = generate(size)
+            print(f'{size_name}: generated in {time.monotonic() - started:.1f}s', file=sys.stderr)
+            client = Client()
+            results[size_name] = {
+                name: measure(client, url, requests) for name, url in endpoint_urls(refbooks, size).items()
+            }
+    return results
+
+
+def find_regressions(baseline, current, tolerance):
+    """
+    Сравнивает результаты с базовыми.
+
+    :argument:
+        baseline (dict): базовый результат (поле results сохранённого JSON)
+        current (dict): текущий результат
+        tolerance (float): допустимый относительный рост времени и памяти, например 0.25
+
+    :returns:
+        список строк с описанием регрессий; размеры и API, которых нет в базовом результате, пропускаются
+    """
+    regressions = []
+    for size_name, endpoints in current.items():
+        for name, metrics in endpoints.items():
+            base = baseline.get(size_name, {}).get(name)
+            if base is None:
+                continue
+            for metric in LATENCY_METRICS + MEMORY_METRICS + EXACT_METRICS:
+                if metric not in base:
+                    continue
+                limit = base[metric] if metric in EXACT_METRICS else base[metric] * (1 + tolerance)
+                if metrics[metric] > limit:
+                    regressions.append(
+                        f'{size_name} {name} {metric}: {metrics[metric]} > {limit:g} (baseline {base[metric]})'
+                    )
+    return regressions
+
+
+def print_table(results):
+    print(f'{"size":<14}{"endpoint":<16}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}'
+          f'{"queries":>9}{"cold q":>8}{"peak KB":>10}')
+    for size_name, endpoints in results.items():
+        for name, m in endpoints.items():
+            print(f'{size_name:<14}{name:<16}{m["p50_ms"]:>9.2f}{m["p95_ms"]:>9.2f}{m["p99_ms"]:>9.2f}'
+                  f'{m["queries"]:>9g}{m["cold_queries"]:>8}{m["peak_memory_kb"]:>10.0f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='10x3x100,50x5x10000',
+                        help='Размеры данных через запятую в формате NxMxK (справочники x версии x элементы)')
+    parser.add_argument('--requests', type=int, default=200, help='Число прогретых запросов к каждому API')
+    parser.add_argument('--output', help='Файл для результата в формате JSON')
+    parser.add_argument('--baseline', help='Базовый результат (JSON) для проверки регрессий')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Допустимый относительный рост времени ответа и памяти в режиме порогов')
+    args = parser.parse_args()
+
+    try:
+        sizes = [(value.strip(), parse_size(value.strip())) for value in args.sizes.split(',')]
+    except ValueError as error:
+        parser.error(str(error))
+
+    setup_django()
+    import django
+    results = run(sizes, args.requests)
+    print_table(results)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as stream:
+            json.dump({
+                'created': datetime.datetime.now().isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'requests': args.requests,
+                'results': results,
+            }, stream, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as stream:
+            baseline = json.load(stream)['results']
+        regressions = find_regressions(baseline, results, args.tolerance)
+        for regression in regressions:
+            print(f'REGRESSION {regression}', file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Сравнение скорости загрузки версии справочника: import_refbook (потоковый разбор и bulk_create)
+против loaddata (разбор всего файла в память и сохранение каждого объекта по отдельности).
+
+    python -m benchmarks.bench_import --rows 100000
+"""
+import argparse
+import datetime
+import io
+import json
+import os
+import tempfile
+import time
+
+from benchmarks.utils import rate, setup_django, test_database
+
+
+def write_csv(path, rows):
+    with open(path, 'w', encoding='utf-8', newline='') as stream:
+        stream.write('code,value\n')
+        for i in range(rows):
+            stream.write(f'C{i:08d},Value of element {i}\n')
+
+
+def write_fixture(path, rows, reference_id, version_id):
+    with open(path, 'w', encoding='utf-8') as stream:
+        objects = [{'model': 'reference.referenceversion', 'pk': version_id,
+                    'fields': {'reference': reference_id, 'version': 'loaddata', 'start_date': '2030-01-01'}}]
+        objects.extend({'model': 'reference.referenceelement',
+                        'fields': {'version': version_id, 'code': f'C{i:08d}', 'value': f'Value of element {i}'}}
+                       for i in range(rows))
+        json.dump(objects, stream)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100000, help='Число элементов в версии')
+    parser.add_argument('--batch-size', type=int, default=None, help='Размер пакета bulk_create')
+    args = parser.parse_args()
+
+    setup_django()
+    from django.core.management import call_command
+    from reference.importers import IMPORT_BATCH_SIZE, import_version, iter_rows
+    from reference.models import Reference
+
+    directory = tempfile.mkdtemp()
+    csv_path = os.path.join(directory, 'elements.csv')
+    fixture_path = os.path.join(directory, 'fixture.json')
+    write_csv(csv_path, args.rows)
+
+    results = []
+    with test_database():
+        reference = Reference.objects.create(code='BENCH', name='Benchmark')
+
+        with open(csv_path, encoding='utf-8', newline='') as stream:
+            result = import_version(reference, 'import_refbook', datetime.date(2029, 1, 1),
+                                    iter_rows(stream, 'csv'), batch_size=args.batch_size or IMPORT_BATCH_SIZE)
+        results.append(('import_refbook (csv)', result.count, result.seconds))
+
+        write_fixture(fixture_path, args.rows, reference.id, 10 ** 9)
+        started = time.monotonic()
+        call_command('loaddata', fixture_path, verbosity=0, stdout=io.StringIO())
+        results.append(('loaddata (json)', args.rows, time.monotonic() - started))
+
+    for path in (csv_path, fixture_path):
+        os.remove(path)
+    os.rmdir(directory)
+
+    print(f'{"method":<24}{"rows":>10}{"seconds":>10}{"rows/sec":>12}')
+    for name, count, seconds in results:
+        print(f'{name:<24}{count:>10}{seconds:>10.2f}{rate(count, seconds):>12.0f}')
+    print(f'speedup: {results[1][2] / results[0][2]:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
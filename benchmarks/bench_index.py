@@ -0,0 +1,68 @@
+"""
+Сравнение памяти на элемент и скорости проверки элемента: компактный индекс reference.index.ElementIndex
+против словаря код → значение из объектов str.
+
+    python -m benchmarks.bench_index --elements 1000000 --distinct-values 1000
+"""
+import argparse
+import gc
+import random
+import sys
+import time
+
+from benchmarks.utils import rate, setup_django
+
+
+def generate(count, distinct_values):
+    for i in range(count):
+        yield f'C{i:09d}', f'Value of element {i % distinct_values if distinct_values else i}'
+
+
+def measure_build(build, rows):
+    gc.collect()
+    started = time.perf_counter()
+    result = build(rows)
+    return result, time.perf_counter() - started
+
+
+def measure_lookups(contains, probes):
+    started = time.perf_counter()
+    for code, value in probes:
+        contains(code, value)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--elements', type=int, default=1000000, help='Число элементов в версии')
+    parser.add_argument('--distinct-values', type=int, default=0,
+                        help='Число различных значений (0 — все значения различны)')
+    parser.add_argument('--lookups', type=int, default=200000, help='Число проверок элемента')
+    args = parser.parse_args()
+
+    setup_django()
+    from reference.index import ElementIndex
+
+    rows = list(generate(args.elements, args.distinct_values))
+    probes = [random.choice(rows) for _ in range(args.lookups // 2)]
+    probes += [(code, value + '!') for code, value in probes]
+
+    # Строки создаются заново при построении, как при чтении из базы данных
+    elements, dict_seconds = measure_build(dict, generate(args.elements, args.distinct_values))
+    index, index_seconds = measure_build(ElementIndex.build, generate(args.elements, args.distinct_values))
+    dict_bytes = sys.getsizeof(elements) + sum(sys.getsizeof(code) + sys.getsizeof(value)
+                                               for code, value in elements.items())
+    index_bytes = index.nbytes
+    dict_lookup = measure_lookups(lambda code, value: code in elements and elements[code] == value, probes)
+    index_lookup = measure_lookups(index.contains, probes)
+
+    print(f'{"structure":<14}{"bytes/elem":>12}{"total MB":>10}{"build s":>10}{"lookups/sec":>14}')
+    for name, size, seconds, lookup in (('dict', dict_bytes, dict_seconds, dict_lookup),
+                                        ('ElementIndex', index_bytes, index_seconds, index_lookup)):
+        print(f'{name:<14}{size / args.elements:>12.1f}{size / 2 ** 20:>10.1f}{seconds:>10.2f}'
+              f'{rate(len(probes), lookup):>14.0f}')
+    print(f'memory ratio: {dict_bytes / index_bytes:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
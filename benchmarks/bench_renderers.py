@@ -0,0 +1,75 @@
+"""
+Размер ответа и процессорное время формирования списка элементов в разных форматах (на 10 000 элементов).
+
+Сравниваются сериализация через ModelSerializer (RefBookElementSerializer) и простые словари,
+рендереры JSONRenderer, ORJSONRenderer и MessagePackRenderer и сжатие ответа gzip и brotli
+(как в reference.middleware.CompressionMiddleware). Форматы, для которых не установлен пакет, пропускаются.
+
+    python -m benchmarks.bench_renderers --elements 10000 --repeat 20
+"""
+import argparse
+import time
+
+from benchmarks.datagen import element_code, element_value
+from benchmarks.utils import setup_django
+
+
+def cpu_ms(function, repeat):
+    """
+    Возвращает результат функции и среднее процессорное время одного вызова в миллисекундах.
+    """
+    result = function()
+    started = time.process_time()
+    for _ in range(repeat):
+        function()
+    return result, (time.process_time() - started) * 1000 / repeat
+
+
+def formats(elements):
+    """
+    Возвращает функции, формирующие тело ответа для каждого формата, с учётом сериализации данных.
+    """
+    from django.utils.text import compress_string
+    from rest_framework.renderers import JSONRenderer
+    from reference.middleware import BROTLI_QUALITY, brotli
+    from reference.renderers import MessagePackRenderer, ORJSONRenderer, msgpack, orjson
+    from reference.serializers import RefBookElementSerializer
+
+    def plain():
+        return {'elements': [{'code': element.code, 'value': element.value} for element in elements]}
+
+    result = {
+        'ModelSerializer + JSONRenderer': lambda: JSONRenderer().render(
+            {'elements': RefBookElementSerializer(elements, many=True).data}),
+        'dict + JSONRenderer': lambda: JSONRenderer().render(plain()),
+    }
+    if orjson is not None:
+        result['dict + ORJSONRenderer'] = lambda: ORJSONRenderer().render(plain())
+        result['dict + ORJSONRenderer + gzip'] = lambda: compress_string(ORJSONRenderer().render(plain()))
+        if brotli is not None:
+            result['dict + ORJSONRenderer + brotli'] = lambda: brotli.compress(ORJSONRenderer().render(plain()),
+                                                                               quality=BROTLI_QUALITY)
+    if msgpack is not None:
+        result['dict + MessagePackRenderer'] = lambda: MessagePackRenderer().render(plain())
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--elements', type=int, default=10000, help='Число элементов в ответе')
+    parser.add_argument('--repeat', type=int, default=20, help='Число повторений каждого формата')
+    args = parser.parse_args()
+
+    setup_django()
+    from reference.models import ReferenceElement
+
+    elements = [ReferenceElement(code=element_code(i), value=element_value(0, i)) for i in range(args.elements)]
+    scale = 10000 / args.elements
+    print(f'{"format":<34}{"bytes/10k":>12}{"CPU ms/10k":>12}')
+    for name, function in formats(elements).items():
+        body, ms = cpu_ms(function, args.repeat)
+        print(f'{name:<34}{len(body) * scale:>12.0f}{ms * scale:>12.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+Генератор синтетических данных для бенчмарков: N справочников × M версий × K элементов.
+"""
+import datetime
+from collections import namedtuple
+
+DataSize = namedtuple('DataSize', ['refbooks', 'versions', 'elements'])
+
+# Дата начала действия первой версии, следующие версии начинаются через год
+FIRST_START_DATE = datetime.date(2000, 1, 1)
+
+
+def parse_size(value):
+    """
+    Разбирает размер данных в формате NxMxK, например 10x3x1000.
+    """
+    try:
+        refbooks, versions, elements = (int(part) for part in value.lower().split('x'))
+    except ValueError:
+        raise ValueError(f'Invalid data size "{value}", expected NxMxK, e.g. 10x3x1000')
+    return DataSize(refbooks, versions, elements)
+
+
+def element_code(index):
+    return f'C{index:08d}'
+
+
+def element_value(version_index, index):
+    return f'Value {index} of version {version_index + 1}'
+
+
+def generate(size, batch_size=5000):
+    """
+    Создаёт справочники, версии и элементы пакетами через bulk_create.
+
+    :argument:
+        size (DataSize): число справочников, версий каждого справочника и элементов каждой версии
+        batch_size (int): число элементов в одном bulk_create
+
+    :returns:
+        список созданных справочников (Reference)
+    """
+    from reference.models import Reference, ReferenceVersion, ReferenceElement
+
+    refbooks = Reference.objects.bulk_create(
+        Reference(code=f'BENCH-{i}', name=f'Benchmark refbook {i}') for i in range(size.refbooks)
+    )
+    for refbook in refbooks:
+        versions = [
+            ReferenceVersion.objects.create(
+                reference=refbook, version=f'{v + 1}.0',
+                start_date=FIRST_START_DATE.replace(year=FIRST_START_DATE.year + v),
+            )
+            for v in range(size.versions)
+        ]
+        for v, version in enumerate(versions):
+            batch = []
+            for i in range(size.elements):
+                batch.append(ReferenceElement(version=version, code=element_code(i), value=element_value(v, i)))
+                if len(batch) >= batch_size:
+                    ReferenceElement.objects.bulk_create(batch)
+                    batch = []
+            ReferenceElement.objects.bulk_create(batch)
+    return refbooks
@@ -0,0 +1,55 @@
+import contextlib
+import os
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+def setup_django():
+    """
+    Настраивает Django для запуска бенчмарка как отдельного скрипта.
+    """
+    if str(BASE_DIR) not in sys.path:
+        sys.path.insert(0, str(BASE_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    import django
+    django.setup()
+
+
+@contextlib.contextmanager
+def test_database(sqlite_path=None):
+    """
+    Создаёт временную тестовую базу данных с применёнными миграциями и удаляет её по выходу.
+    Реплики (TEST MIRROR) на это время подключаются к той же тестовой базе.
+
+    :argument:
+        sqlite_path (str, optional): файл тестовой базы SQLite вместо базы в памяти
+            (нужен, чтобы несколько потоков работали с базой как разные клиенты)
+    """
+    from django.db import connection, connections
+
+    old_name = connection.settings_dict['NAME']
+    if sqlite_path is not None and connection.vendor == 'sqlite':
+        connection.settings_dict['TEST']['NAME'] = sqlite_path
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    for alias in connections:
+        if connections[alias].settings_dict['TEST'].get('MIRROR') == connection.alias:
+            connections[alias].creation.set_as_test_mirror(connection.settings_dict)
+    try:
+        yield
+    finally:
+        connections.close_all()
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def rate(count, seconds):
+    return count / seconds if seconds else float('inf')
+
+
+def percentile(values, fraction):
+    """
+    Возвращает перцентиль fraction (от 0 до 1) списка значений.
+    """
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
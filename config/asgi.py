@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 application = get_asgi_application()
+
+# Фоновая загрузка в кэш версий справочников, которые скоро станут текущими (REFERENCE_WARMUP_INTERVAL)
+from reference.warmup import start_scheduler  # noqa: E402
+
+start_scheduler()
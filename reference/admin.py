@@ -1,34 +1,294 @@
-from django.contrib import admin
+import io
+
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.views.main import PAGE_VAR
+from django.core.exceptions import PermissionDenied
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.shortcuts import get_object_or_404, redirect
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
+from django.utils.functional import cached_property
+from django.utils.html import format_html
+from django.utils.translation import gettext_lazy as _
+
+from .importers import IMPORT_FORMATS, RefbookImportError, guess_format, import_version, iter_rows
 from .models import Reference, ReferenceVersion, ReferenceElement
+from .search import search_words, value_filter
+
+
+def elements_url(**params):
+    """
+    Возвращает адрес списка элементов в административной панели, отфильтрованного по params.
+    """
+    query = '&'.join(f'{name}={value}' for name, value in params.items())
+    return f'{reverse("admin:reference_referenceelement_changelist")}?{query}'
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Пагинатор списка элементов: в PostgreSQL число строк таблицы без фильтров берётся из статистики
+    (pg_class.reltuples), а не вычисляется COUNT(*) по миллионам строк при каждом открытии списка.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            connection = connections[queryset.db]
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                                   [queryset.model._meta.db_table])
+                    row = cursor.fetchone()
+                if row and row[0] > 0:
+                    return int(row[0])
+        return super().count
 
 
 class ReferenceVersionInline(admin.TabularInline):
     model = ReferenceVersion
+    fields = ('version', 'start_date', 'parent')
+    autocomplete_fields = ('parent',)
+    show_change_link = True
     extra = 1
 
 
-class ReferenceElementInline(admin.TabularInline):
-    model = ReferenceElement
-    extra = 1
+class VersionImportForm(forms.Form):
+    """
+    Форма загрузки новой версии справочника из файла (reference.importers)
+    """
+    file = forms.FileField(label='Файл', help_text='CSV с заголовком code,value, JSON или NDJSON')
+    version = forms.CharField(max_length=50, label='Версия справочника')
+    start_date = forms.DateField(label='Дата начала действия версии', help_text='В формате yyyy-mm-dd')
+    format = forms.ChoiceField(choices=[('', 'По расширению файла')] + [(item, item) for item in IMPORT_FORMATS],
+                               required=False, label='Формат')
 
 
 @admin.register(Reference)
 class ReferenceAdmin(admin.ModelAdmin):
-    list_display = ('id', 'code', 'name', 'get_current_version')
+    """
+    Справочники. Текущая версия (Reference.current_version) загружается в том же запросе, что и список
+    справочников, и пересчитывается только у справочников с наступившей датой смены версии; новую версию можно загрузить из файла (VersionImportForm) вместо ввода элементов по одному.
+    """
+    list_display = ('id', 'code', 'name', 'current_version_number', 'next_switch_date', 'elements')
+    list_select_related = ('current_version',)
     search_fields = ('code', 'name')
     inlines = [ReferenceVersionInline]
 
+    @admin.display(description='Текущая версия', ordering='current_version__version')
+    def current_version_number(self, obj):
+        # get_current_version пересчитывает указатель, если дата смены версии уже наступила
+        version = obj.get_current_version()
+        return version.version if version else None
+
+    @admin.display(description='Элементы')
+    def elements(self, obj):
+        return format_html('<a href="{}">Элементы</a>', elements_url(version__reference__id__exact=obj.pk))
+
+    def get_urls(self):
+        return [
+            path('<path:object_id>/import/', self.admin_site.admin_view(self.import_view),
+                 name='reference_reference_import'),
+        ] + super().get_urls()
+
+    def import_view(self, request, object_id):
+        """
+        Загрузка новой версии справочника из файла: элементы сохраняются пакетами (reference.importers.import_version).
+        """
+        refbook = get_object_or_404(Reference, pk=object_id)
+        if not request.user.has_perm('reference.add_referenceversion'):
+            raise PermissionDenied
+        form = VersionImportForm(request.POST or None, request.FILES or None)
+        if form.is_valid():
+            data = form.cleaned_data
+            import_format = data['format'] or guess_format(data['file'].name)
+            if import_format is None:
+                form.add_error('format', 'Не удалось определить формат по расширению файла, укажите формат')
+            else:
+                stream = io.TextIOWrapper(data['file'].file, encoding='utf-8', newline='')
+                try:
+                    result = import_version(refbook, data['version'], data['start_date'],
+                                            iter_rows(stream, import_format))
+                except (RefbookImportError, UnicodeDecodeError) as error:
+                    form.add_error('file', str(error))
+                else:
+                    self.message_user(request, f'Версия {result.version.version} загружена: '
+                                               f'{result.count} элементов за {result.seconds:.1f} с', messages.SUCCESS)
+                    return redirect('admin:reference_referenceversion_change', result.version.pk)
+        context = {
+            **self.admin_site.each_context(request),
+            'title': f'Загрузка версии справочника {refbook}',
+            'opts': self.model._meta,
+            'original': refbook,
+            'form': form,
+        }
+        return TemplateResponse(request, 'admin/reference/reference/import_version.html', context)
+
+
+class RefbookListFilter(admin.SimpleListFilter):
+    """
+    Фильтр по справочнику без перечисления всех справочников (их тысячи): в поле ввода указывается код
+    или часть наименования, а в списке выбора — только найденные справочники (не больше REFBOOK_FILTER_LIMIT)
+    или выбранный справочник. Значение параметра — идентификатор справочника или строка поиска.
+
+    Attributes:
+        - parameter_name: параметр запроса, совпадает с параметром стандартного фильтра по внешнему ключу,
+          поэтому ссылки вида ?version__reference__id__exact=<id> продолжают работать
+        - field_path: путь к справочнику от модели списка
+        - reset_parameters: параметры, которые сбрасываются при выборе другого справочника
+    """
+    title = 'справочник'
+    template = 'admin/reference/refbook_filter.html'
+    field_path = 'reference'
+    reset_parameters = ()
+    REFBOOK_FILTER_LIMIT = 20
+
+    def __init__(self, request, params, model, model_admin):
+        super().__init__(request, params, model, model_admin)
+        self.hidden_params = [(name, value) for name, value in request.GET.items()
+                              if name not in (self.parameter_name, PAGE_VAR, *self.reset_parameters)]
+
+    def refbooks(self):
+        value = (self.value() or '').strip()
+        if value.isdigit():
+            return Reference.objects.filter(pk=value)
+        return Reference.objects.filter(Q(code__icontains=value) | Q(name__icontains=value))
+
+    def has_output(self):
+        # Поле поиска выводится и без найденных справочников
+        return True
+
+    def lookups(self, request, model_admin):
+        if not (self.value() or '').strip():
+            return []
+        refbooks = self.refbooks().order_by('code')[:self.REFBOOK_FILTER_LIMIT]
+        return [(str(pk), f'{name} {code}') for pk, code, name in refbooks.values_list('pk', 'code', 'name')]
+
+    def choices(self, changelist):
+        yield {
+            'selected': self.value() is None,
+            'query_string': changelist.get_query_string(remove=[self.parameter_name, *self.reset_parameters]),
+            'display': _('All'),
+        }
+        for lookup, title in self.lookup_choices:
+            yield {
+                'selected': self.value() == lookup,
+                'query_string': changelist.get_query_string({self.parameter_name: lookup}, self.reset_parameters),
+                'display': title,
+            }
+
+    def queryset(self, request, queryset):
+        value = (self.value() or '').strip()
+        if value.isdigit():
+            return queryset.filter(**{f'{self.field_path}_id': value})
+        if value:
+            return queryset.filter(**{f'{self.field_path}__in': self.refbooks()})
+        return queryset
+
+
+class ElementRefbookListFilter(RefbookListFilter):
+    parameter_name = 'version__reference__id__exact'
+    field_path = 'version__reference'
+    # Версия относится к прежнему справочнику
+    reset_parameters = ('version',)
+
+
+class VersionRefbookListFilter(RefbookListFilter):
+    parameter_name = 'reference__id__exact'
+
 
 @admin.register(ReferenceVersion)
 class ReferenceVersionAdmin(admin.ModelAdmin):
-    list_display = ('id', 'reference', 'version', 'start_date')
-    list_filter = ('reference',)
-    search_fields = ('reference__code', 'reference__name')
-    inlines = [ReferenceElementInline]
+    """
+    Версии справочников. Элементы версии не выводятся на её странице (в версии могут быть сотни тысяч элементов):
+    вместо них — число элементов и ссылка на отфильтрованный по версии список элементов. У производной версии
+    в этом списке только её отличия от родительской, а число элементов — с учётом унаследованных.
+    """
+    list_display = ('id', 'reference', 'version', 'start_date', 'parent', 'elements')
+    list_select_related = ('reference', 'parent')
+    list_filter = (VersionRefbookListFilter,)
+    search_fields = ('version', 'reference__code', 'reference__name')
+    autocomplete_fields = ('reference', 'parent')
+    readonly_fields = ('revision', 'updated_at', 'elements_summary')
+
+    def lookup_allowed(self, lookup, value):
+        # Параметр фильтра по справочнику не совпадает с полем list_filter
+        return lookup == VersionRefbookListFilter.parameter_name or super().lookup_allowed(lookup, value)
+
+    def get_readonly_fields(self, request, obj=None):
+        # Производная версия хранит только отличия от родительской, поэтому родительскую версию не меняют
+        if obj is not None:
+            return ('parent', *self.readonly_fields)
+        return self.readonly_fields
+
+    @admin.display(description='Элементы')
+    def elements(self, obj):
+        return format_html('<a href="{}">Элементы</a>', elements_url(version=obj.pk))
+
+    @admin.display(description='Элементы версии')
+    def elements_summary(self, obj):
+        if obj.pk is None:
+            return '-'
+        count = ReferenceElement.objects.in_version(obj.pk).count()
+        return format_html('<a href="{}">{} элементов</a>', elements_url(version=obj.pk), count)
+
+
+class VersionListFilter(admin.SimpleListFilter):
+    """
+    Фильтр элементов по версии: предлагает только версии выбранного справочника,
+    а не все версии всех справочников.
+    """
+    title = 'версия справочника'
+    parameter_name = 'version'
+
+    def lookups(self, request, model_admin):
+        refbook_id = request.GET.get('version__reference__id__exact', '')
+        if not refbook_id and (self.value() or '').isdigit():
+            refbook_id = ReferenceVersion.objects.filter(pk=self.value()).values_list('reference_id', flat=True).first()
+        if not str(refbook_id).isdigit():
+            return []
+        versions = ReferenceVersion.objects.filter(reference_id=refbook_id).order_by('-start_date')
+        return [(str(pk), f'{version} ({start_date})')
+                for pk, version, start_date in versions.values_list('pk', 'version', 'start_date')]
+
+    def queryset(self, request, queryset):
+        if (self.value() or '').isdigit():
+            return queryset.filter(version_id=self.value())
+        return queryset
 
 
 @admin.register(ReferenceElement)
 class ReferenceElementAdmin(admin.ModelAdmin):
-    list_display = ('id', 'version', 'code', 'value')
-    list_filter = ('version__reference', 'version')
-    search_fields = ('version__reference__code', 'version__reference__name', 'code', 'value')
+    """
+    Элементы справочников. Поиск — по точному коду и по словам значения через полнотекстовый индекс
+    (reference.search.value_filter); справочник выбирается поиском (ElementRefbookListFilter),
+    фильтр версий показывает только версии выбранного справочника.
+    """
+    list_display = ('id', 'code', 'value', 'removed', 'version', 'refbook')
+    list_select_related = ('version__reference',)
+    list_filter = (ElementRefbookListFilter, VersionListFilter)
+    search_fields = ('code', 'value')
+    search_help_text = 'Точный код элемента или слова значения'
+    autocomplete_fields = ('version',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def lookup_allowed(self, lookup, value):
+        return lookup == ElementRefbookListFilter.parameter_name or super().lookup_allowed(lookup, value)
+
+    @admin.display(description='Справочник', ordering='version__reference__code')
+    def refbook(self, obj):
+        return obj.version.reference.code
+
+    def get_search_results(self, request, queryset, search_term):
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        words = search_words(search_term)
+        matches = queryset.filter(code=search_term)
+        if words:
+            matches |= queryset.filter(value_filter(words))
+        return matches, False
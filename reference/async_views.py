@@ -0,0 +1,240 @@
+"""
+Асинхронные представления для чтения справочников под ASGI (config/asgi.py).
+
+Представления повторяют RefBookList, RefbookElementsView и RefbookElementCheckView,
+но не занимают поток на время ожидания клиента или базы данных: данные берутся
+из кэша (reference.cache), а при промахе — через асинхронный ORM.
+Уведомления о публикации версий (reference.notifications) доставляются потоком
+Server-Sent Events (refbook_events) или долгим опросом (refbook_events_poll).
+"""
+import asyncio
+import datetime
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+
+from . import notifications
+from .cache import ElementLookup, element_cache, find_version, find_version_on_date
+from .conditional import not_modified_response, set_cache_headers
+from .models import Reference
+from .snapshots import aelement_index, snapshots
+from .streaming import astream_elements, stream_format
+from .views import refbooks_queryset
+
+JSON_DUMPS_PARAMS = {'ensure_ascii': False}
+
+# Интервал комментариев keepalive в потоке событий (с): прокси не закрывают простаивающее соединение
+EVENTS_KEEPALIVE = 15
+# Интервал переподключения клиента EventSource после обрыва соединения (мс)
+EVENTS_RETRY_MS = 3000
+# Время жизни потока событий (с): Django не замечает отключения клиента во время потоковой передачи,
+# поэтому поток завершается сам, а EventSource переподключается с заголовком Last-Event-ID
+EVENTS_STREAM_LIFETIME = getattr(settings, 'REFERENCE_EVENTS_STREAM_LIFETIME', 300)
+# Время ожидания событий при долгом опросе по умолчанию и максимальное (с)
+EVENTS_POLL_TIMEOUT = 25
+EVENTS_POLL_MAX_TIMEOUT = 60
+
+
+async def aget_refbook_versions(refbook_id):
+    """
+    Возвращает версии справочника (VersionInfo) из кэша.
+
+    Raises: Http404:
+    В случае отсутствия запрашиваемого справочника.
+    """
+    versions = await element_cache.aget_versions(refbook_id)
+    if not versions and not await Reference.objects.filter(id=refbook_id).aexists():
+        raise Http404('No Reference matches the given query.')
+    return versions
+
+
+async def refbook_list(request):
+    """
+    Асинхронный вариант RefBookList: список справочников, отфильтрованный по дате date.
+    """
+    date = request.GET.get('date')
+    if element_cache.shared.enabled:
+        refbooks = await sync_to_async(element_cache.get_refbook_list)(
+            date, lambda: list(refbooks_queryset(date))
+        )
+    else:
+        refbooks = [refbook async for refbook in refbooks_queryset(date)]
+    return JsonResponse({'refbooks': refbooks}, json_dumps_params=JSON_DUMPS_PARAMS)
+
+
+async def refbook_elements(request, id):
+    """
+    Асинхронный вариант RefbookElementsView: элементы указанной (version) или текущей версии справочника.
+    Поддерживает потоковую выдачу (stream=1 или stream=ndjson) и условные запросы.
+    """
+    try:
+        stream = stream_format(request.GET.get('stream'))
+    except ValueError:
+        return JsonResponse({'message': 'Invalid stream, expected a boolean or ndjson'}, status=400)
+    versions = await aget_refbook_versions(id)
+    version = request.GET.get('version')
+    if version:
+        refbook_version = find_version(versions, version)
+    else:
+        refbook_version = find_version_on_date(versions, datetime.date.today())
+
+    versioned = bool(version)
+    if refbook_version is not None:
+        not_modified = not_modified_response(request, refbook_version, versioned)
+        if not_modified is not None:
+            return not_modified
+
+    if stream:
+        response = astream_elements(refbook_version.id if refbook_version else None, ndjson=stream == 'ndjson',
+                                    versions=versions)
+    else:
+        snapshot = snapshots.open(refbook_version.id, refbook_version.revision) if refbook_version else None
+        if snapshot is not None:
+            elements = snapshot.items()
+        else:
+            elements = (await element_cache.aget_elements(id, refbook_version.id)).items() if refbook_version else ()
+        response = JsonResponse(
+            {'elements': [{'code': code, 'value': value} for code, value in elements]},
+            json_dumps_params=JSON_DUMPS_PARAMS,
+        )
+
+    if refbook_version is not None:
+        set_cache_headers(response, request, refbook_version, versioned)
+    return response
+
+
+async def check_element(request, id):
+    """
+    Асинхронный вариант RefbookElementCheckView: проверка наличия элемента с кодом code
+    и значением value в указанной (version) или текущей версии справочника.
+    """
+    code = request.GET.get('code')
+    value = request.GET.get('value')
+    version = request.GET.get('version')
+
+    versions = await aget_refbook_versions(id)
+    if version is None:
+        refbook_version = find_version_on_date(versions, datetime.date.today())
+        if refbook_version is None:
+            return JsonResponse({'message': 'No current version found'}, status=404)
+    else:
+        refbook_version = find_version(versions, version)
+
+    if refbook_version is None:
+        return JsonResponse({'exists': False})
+
+    not_modified = not_modified_response(request, refbook_version, version is not None)
+    if not_modified is not None:
+        return not_modified
+
+    index = await aelement_index(id, refbook_version)
+    if isinstance(index, ElementLookup):
+        # Индекс версии не помещается в кэш: проверка выполняется запросом к базе
+        exists = await sync_to_async(index.contains)(code, value)
+    else:
+        exists = index.contains(code, value)
+    response = JsonResponse({'exists': exists})
+    return set_cache_headers(response, request, refbook_version, version is not None)
+
+
+def parse_events_params(request):
+    """
+    Разбирает параметры подписки на уведомления: курсор (заголовок Last-Event-ID при переподключении
+    EventSource или параметр since) и идентификаторы справочников (refbook, через запятую).
+
+    :returns:
+        (курсор или None, множество идентификаторов справочников или None — все справочники)
+
+    Raises: ValueError:
+    В случае нечислового или отрицательного курсора или идентификатора справочника.
+    """
+    since = request.headers.get('Last-Event-ID') or request.GET.get('since')
+    if since is not None:
+        since = int(since)
+        if since < 0:
+            raise ValueError(since)
+    refbook_ids = request.GET.get('refbook')
+    if refbook_ids:
+        refbook_ids = {int(refbook_id) for refbook_id in refbook_ids.split(',')}
+    return since, refbook_ids or None
+
+
+async def wait_events(since, timeout, refbook_ids=None):
+    """
+    Ждёт событий после курсора since не дольше timeout секунд; события других справочников пропускаются.
+
+    :returns:
+        (события, новый курсор)
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while True:
+        events = await notifications.broker.wait(since, max(deadline - loop.time(), 0))
+        if events:
+            since = events[-1]['seq']
+            events = [event for event in events if refbook_ids is None or event['refbook_id'] in refbook_ids]
+            if events:
+                return events, since
+        if loop.time() >= deadline:
+            return [], since
+
+
+async def refbook_events(request):
+    """
+    Поток Server-Sent Events (text/event-stream) о публикации версий справочников (event: published)
+    и о версиях, ставших текущими (event: current). id события — курсор, с которого EventSource
+    продолжает поток после переподключения (заголовок Last-Event-ID).
+
+    Поток завершается через EVENTS_STREAM_LIFETIME секунд. Keepalive тоже передаёт курсор (поле id
+    без данных), поэтому клиент, не получивший событий своих справочников, переподключается без пропусков.
+    """
+    try:
+        since, refbook_ids = parse_events_params(request)
+    except ValueError:
+        return JsonResponse({'message': 'Invalid since or refbook'}, status=400)
+    if since is None:
+        since = notifications.broker.cursor()
+
+    async def stream(since):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + EVENTS_STREAM_LIFETIME
+        yield f'retry: {EVENTS_RETRY_MS}\n\n'.encode()
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return
+            events, since = await wait_events(since, min(EVENTS_KEEPALIVE, remaining), refbook_ids)
+            if not events:
+                yield f': keepalive\nid: {since}\n\n'.encode()
+            for event in events:
+                data = json.dumps(event, ensure_ascii=False)
+                yield f'id: {event["seq"]}\nevent: {event["event"]}\ndata: {data}\n\n'.encode()
+
+    response = StreamingHttpResponse(stream(since), content_type='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Отключает буферизацию ответа в nginx
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+async def refbook_events_poll(request):
+    """
+    Долгий опрос уведомлений о версиях справочников: ответ приходит, как только появятся события
+    после курсора since, или по истечении timeout секунд с пустым списком событий.
+    Без since сразу возвращается текущий курсор.
+    """
+    try:
+        since, refbook_ids = parse_events_params(request)
+        timeout = float(request.GET.get('timeout', EVENTS_POLL_TIMEOUT))
+        if not 0 <= timeout:
+            raise ValueError(timeout)
+    except ValueError:
+        return JsonResponse({'message': 'Invalid since, refbook or timeout'}, status=400)
+    if since is None:
+        return JsonResponse({'cursor': notifications.broker.cursor(), 'events': []})
+    events, cursor = await wait_events(since, min(timeout, EVENTS_POLL_MAX_TIMEOUT), refbook_ids)
+    response = JsonResponse({'cursor': cursor, 'events': events}, json_dumps_params=JSON_DUMPS_PARAMS)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
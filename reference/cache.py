@@ -0,0 +1,614 @@
+import asyncio
+import bisect
+import hashlib
+import sys
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from contextlib import contextmanager
+from functools import partial
+from operator import attrgetter
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from .index import ElementIndex
+from .models import ReferenceVersion, ReferenceElement
+from .routers import primary_reads
+
+VERSION_INFO_FIELDS = ('start_date', 'id', 'version', 'parent_id', 'revision', 'updated_at')
+VersionInfo = namedtuple('VersionInfo', VERSION_INFO_FIELDS)
+
+# Число строк, читаемых из базы за раз при построении индекса элементов
+INDEX_CHUNK_SIZE = 5000
+# Оценка размера служебных данных индекса на элемент (смещения, номер значения, ячейка хэш-таблицы), байт
+INDEX_ROW_OVERHEAD = 16
+# Число кодов в одном запросе ElementLookup.contains_many
+LOOKUP_CHUNK_SIZE = 500
+
+# Сколько секунд процессы ждут записи, которую загружает другой процесс (SharedCache.get_or_build),
+# прежде чем загрузить её сами; столько же живёт блокировка загрузки, если загружающий процесс завершился
+BUILD_WAIT_TIMEOUT = getattr(settings, 'REFERENCE_CACHE_BUILD_TIMEOUT', 30)
+# Интервал проверки общего кэша при ожидании записи (с)
+BUILD_POLL_INTERVAL = 0.05
+
+
+def _sizeof_versions(versions):
+    return sys.getsizeof(versions) + sum(sys.getsizeof(item) + sys.getsizeof(item.version) for item in versions)
+
+
+def _sizeof_elements(elements):
+    return sys.getsizeof(elements) + sum(sys.getsizeof(code) + sys.getsizeof(value)
+                                         for code, value in elements.items())
+
+
+def find_version(versions, version):
+    """
+    Ищет версию справочника по её номеру в списке версий.
+
+    :argument:
+        versions (tuple[VersionInfo]): версии справочника
+        version (str): номер версии
+
+    :returns:
+        VersionInfo найденной версии или None
+    """
+    matches = [item for item in versions if item.version == version]
+    return min(matches, key=lambda item: item.id) if matches else None
+
+
+def find_version_on_date(versions, date):
+    """
+    Ищет версию справочника, действующую на указанную дату.
+
+    :argument:
+        versions (tuple[VersionInfo]): версии справочника, отсортированные по start_date
+        date (date): дата, на которую нужно определить версию
+
+    :returns:
+        VersionInfo найденной версии или None
+    """
+    # Версии отсортированы по дате начала действия: действующая версия —
+    # последняя, чья start_date не больше date, её позиция ищется бинарным поиском
+    position = bisect.bisect_right(versions, date, key=attrgetter('start_date'))
+    return versions[position - 1] if position else None
+
+
+class ElementLookup:
+    """
+    Проверка элементов версии запросами к базе по покрывающему индексу (version, code, value).
+    Используется вместо ElementIndex для версий, индекс которых не помещается в бюджет памяти кэша:
+    такой индекс не сохранялся бы в кэше и строился бы заново при каждом запросе.
+    Элементы производной версии ищутся по цепочке родительских версий chain (ReferenceElementQuerySet.in_chain).
+    """
+    nbytes = 64
+
+    def __init__(self, version_id, chain=None):
+        self.version_id = version_id
+        self.chain = chain or [version_id]
+
+    def contains(self, code, value):
+        if code is None or value is None:
+            return False
+        return ReferenceElement.objects.in_chain(self.chain).filter(code=code, value=value).exists()
+
+    def contains_many(self, pairs):
+        """
+        Проверяет пары (код, значение): элементы с нужными кодами читаются запросами по LOOKUP_CHUNK_SIZE кодов.
+        """
+        pairs = list(pairs)
+        codes = list({code for code, value in pairs if code is not None and value is not None})
+        found = set()
+        for start in range(0, len(codes), LOOKUP_CHUNK_SIZE):
+            found.update(ReferenceElement.objects.in_chain(self.chain).filter(
+                code__in=codes[start:start + LOOKUP_CHUNK_SIZE]
+            ).values_list('code', 'value'))
+        return [(code, value) in found for code, value in pairs]
+
+
+class _IndexTooLarge(Exception):
+    pass
+
+
+class SharedCache:
+    """
+    Общий для всех процессов кэш справочников поверх django cache framework.
+
+    Используется кэш из CACHES с псевдонимом settings.REFERENCE_CACHE_ALIAS
+    (файловый, Redis и т.д.). Если псевдоним не задан, общий кэш отключён.
+
+    Ключи записей содержат метку (stamp) справочника. Запись в справочник
+    увеличивает его метку, после чего все процессы обращаются к новым ключам,
+    а старые записи истекают по таймауту — широковещательная рассылка не нужна.
+    """
+    prefix = 'reference'
+
+    @property
+    def alias(self):
+        return getattr(settings, 'REFERENCE_CACHE_ALIAS', None)
+
+    @property
+    def enabled(self):
+        return self.alias is not None
+
+    @property
+    def timeout(self):
+        return getattr(settings, 'REFERENCE_CACHE_TIMEOUT', 60 * 60)
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def _stamp_key(self, scope):
+        return f'{self.prefix}:stamp:{scope}'
+
+    def stamp(self, scope):
+        """
+        Возвращает текущую метку области кэша (идентификатор справочника или '*' для списка справочников).
+        """
+        if not self.enabled:
+            return 0
+        key = self._stamp_key(scope)
+        stamp = self.cache.get(key)
+        if stamp is None:
+            # Начальная метка зависит от времени, чтобы после вытеснения метки
+            # не совпасть с ключами записей, которые ещё не истекли
+            self.cache.add(key, time.time_ns(), timeout=None)
+            stamp = self.cache.get(key)
+        return stamp
+
+    def bump(self, scope):
+        """
+        Увеличивает метку области кэша, делая недействительными все её записи во всех процессах.
+        """
+        if not self.enabled:
+            return
+        key = self._stamp_key(scope)
+        try:
+            self.cache.incr(key)
+        except ValueError:
+            self.cache.set(key, time.time_ns(), timeout=None)
+
+    def stamps(self, scopes):
+        """
+        Возвращает метки нескольких областей кэша за одно обращение к кэшу.
+        """
+        if not self.enabled:
+            return {scope: 0 for scope in scopes}
+        keys = {self._stamp_key(scope): scope for scope in scopes}
+        found = self.cache.get_many(keys)
+        result = {keys[key]: stamp for key, stamp in found.items()}
+        for scope in scopes:
+            if scope not in result:
+                result[scope] = self.stamp(scope)
+        return result
+
+    def key(self, *parts):
+        return ':'.join([self.prefix, *map(str, parts)])
+
+    def get(self, key):
+        if not self.enabled:
+            return None
+        return self.cache.get(key)
+
+    def get_many(self, keys):
+        if not self.enabled:
+            return {}
+        return self.cache.get_many(keys)
+
+    def set(self, key, value):
+        if self.enabled:
+            self.cache.set(key, value, timeout=self.timeout)
+
+    def set_many(self, data):
+        if self.enabled and data:
+            self.cache.set_many(data, timeout=self.timeout)
+
+    def get_or_build(self, key, loader):
+        """
+        Возвращает запись общего кэша, при промахе загружает её функцией loader и сохраняет.
+
+        Запись загружает только процесс, получивший блокировку загрузки (cache.add),
+        остальные ждут её появления в общем кэше до BUILD_WAIT_TIMEOUT секунд —
+        так при промахе в момент смены версии база не получает одинаковый запрос от каждого процесса.
+        """
+        if not self.enabled:
+            return loader()
+        value = self.cache.get(key)
+        if value is not None:
+            return value
+        lock_key = f'{key}:lock'
+        deadline = time.monotonic() + BUILD_WAIT_TIMEOUT
+        while not self.cache.add(lock_key, 1, timeout=BUILD_WAIT_TIMEOUT):
+            if time.monotonic() >= deadline:
+                # Загрузка в другом процессе слишком долгая: загружаем сами
+                return loader()
+            time.sleep(BUILD_POLL_INTERVAL)
+            value = self.cache.get(key)
+            if value is not None:
+                return value
+        try:
+            value = loader()
+            self.set(key, value)
+        finally:
+            self.cache.delete(lock_key)
+        return value
+
+    # Асинхронные варианты обращаются к общему кэшу в потоках пула (thread_sensitive=False):
+    # обращения из разных запросов не выстраиваются в очередь к одному потоку, общему для синхронного кода
+
+    async def astamp(self, scope):
+        if not self.enabled:
+            return 0
+        return await sync_to_async(self.stamp, thread_sensitive=False)(scope)
+
+    async def aget(self, key):
+        if not self.enabled:
+            return None
+        return await sync_to_async(self.cache.get, thread_sensitive=False)(key)
+
+    async def aget_or_build(self, key, aloader):
+        """
+        Асинхронный вариант get_or_build: запись загружает корутина aloader,
+        а ожидание записи, которую загружает другой процесс, не занимает поток.
+        """
+        if not self.enabled:
+            return await aloader()
+        value = await self.aget(key)
+        if value is not None:
+            return value
+        lock_key = f'{key}:lock'
+        add = sync_to_async(self.cache.add, thread_sensitive=False)
+        deadline = time.monotonic() + BUILD_WAIT_TIMEOUT
+        while not await add(lock_key, 1, timeout=BUILD_WAIT_TIMEOUT):
+            if time.monotonic() >= deadline:
+                return await aloader()
+            await asyncio.sleep(BUILD_POLL_INTERVAL)
+            value = await self.aget(key)
+            if value is not None:
+                return value
+        try:
+            value = await aloader()
+            await sync_to_async(self.set, thread_sensitive=False)(key, value)
+        finally:
+            await sync_to_async(self.cache.delete, thread_sensitive=False)(lock_key)
+        return value
+
+
+class VersionElementCache:
+    """
+    Кэш версий и элементов справочников в памяти процесса.
+
+    Хранит для каждого справочника список его версий, а для каждой версии
+    словарь код → значение её элементов и компактный индекс для их проверки
+    (reference.index). Записи вытесняются по принципу LRU, когда суммарный
+    размер превышает max_bytes. Инвалидация выполняется сигналами моделей
+    (см. reference.signals).
+
+    Если включён общий кэш (SharedCache), он используется как второй уровень:
+    ключи записей в памяти процесса содержат метку справочника из общего кэша,
+    поэтому запись в справочник в любом процессе делает их недействительными.
+
+    При промахе запись загружает один поток процесса, а при включённом общем кэше — один процесс
+    (single flight), остальные ждут её: в момент смены текущей версии все воркеры обращаются к новой версии
+    одновременно. Версии, которые скоро станут текущими, загружаются заранее (reference.warmup).
+
+    Записи загружаются из основной базы даже при чтении с реплик (reference.routers):
+    иначе отстающая реплика вернула бы данные до изменения, и они остались бы в кэше до следующей инвалидации.
+
+    Attributes:
+        - max_bytes: бюджет памяти кэша в байтах
+        - shared: общий для всех процессов кэш
+        - hits, misses, evictions: счётчики попаданий, промахов и вытеснений
+    """
+
+    def __init__(self, max_bytes, shared=None):
+        self.max_bytes = max_bytes
+        self.shared = shared or SharedCache()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._generation = 0
+        self._lock = threading.RLock()
+        # Блокировки загрузки записей: ключ → [блокировка, число ожидающих потоков]
+        self._flights = {}
+
+    def _get(self, key, count_miss=True):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                if count_miss:
+                    self.misses += 1
+                return None, self._generation
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0], self._generation
+
+    def _set(self, key, value, size, generation):
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            # Пока шла загрузка из базы, кэш мог быть инвалидирован — такие данные не сохраняем
+            if generation != self._generation:
+                return
+            if key in self._entries:
+                self.current_bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+                self.evictions += 1
+
+    @contextmanager
+    def _single_flight(self, key):
+        """
+        Блокировка загрузки записи key: при промахе запись загружает один поток процесса, остальные ждут его.
+        """
+        with self._lock:
+            flight = self._flights.setdefault(key, [threading.Lock(), 0])
+            flight[1] += 1
+        try:
+            with flight[0]:
+                yield
+        finally:
+            with self._lock:
+                flight[1] -= 1
+                if not flight[1]:
+                    del self._flights[key]
+
+    def _fetch(self, key, loader, sizeof):
+        """
+        Возвращает запись из памяти процесса или общего кэша, при промахе загружает её функцией loader.
+        Одну запись одновременно загружает один поток процесса, а при включённом общем кэше — один процесс.
+        """
+        value, generation = self._get(key)
+        if value is None:
+            with self._single_flight(key):
+                # Пока поток ждал блокировку, запись мог загрузить другой поток
+                value, generation = self._get(key, count_miss=False)
+                if value is None:
+                    value = self.shared.get_or_build(self.shared.key(*key), loader)
+                    self._set(key, value, sizeof(value), generation)
+        return value
+
+    def _discard(self, predicate):
+        with self._lock:
+            self._generation += 1
+            for key in [key for key, (value, _) in self._entries.items() if predicate(key, value)]:
+                self.current_bytes -= self._entries.pop(key)[1]
+
+    def get_versions(self, refbook_id):
+        """
+        Возвращает версии справочника (VersionInfo), отсортированные по start_date.
+        """
+        stamp = self.shared.stamp(refbook_id)
+        key = ('versions', refbook_id, stamp)
+        versions, generation = self._get(key)
+        if versions is None:
+            shared_key = self.shared.key('versions', refbook_id, stamp)
+            versions = self.shared.get(shared_key)
+            if versions is None:
+                with primary_reads():
+                    versions = tuple(VersionInfo(*item) for item in ReferenceVersion.objects.filter(
+                        reference_id=refbook_id
+                    ).order_by('start_date').values_list(*VERSION_INFO_FIELDS))
+                if versions:
+                    self.shared.set(shared_key, versions)
+            if versions:
+                self._set(key, versions, _sizeof_versions(versions), generation)
+        return versions
+
+    def get_versions_many(self, refbook_ids):
+        """
+        Возвращает версии нескольких справочников в виде словаря id справочника → tuple[VersionInfo].
+        Справочники, которых нет в кэше, загружаются из базы одним запросом.
+        """
+        refbook_ids = list(dict.fromkeys(refbook_ids))
+        stamps = self.shared.stamps(refbook_ids)
+        result = {}
+        generations = {}
+        for refbook_id in refbook_ids:
+            versions, generations[refbook_id] = self._get(('versions', refbook_id, stamps[refbook_id]))
+            if versions is not None:
+                result[refbook_id] = versions
+
+        missing = {self.shared.key('versions', refbook_id, stamps[refbook_id]): refbook_id
+                   for refbook_id in refbook_ids if refbook_id not in result}
+        from_shared = {missing[key]: versions for key, versions in self.shared.get_many(list(missing)).items()}
+
+        loaded = {refbook_id: [] for refbook_id in missing.values() if refbook_id not in from_shared}
+        if loaded:
+            with primary_reads():
+                for reference_id, *item in ReferenceVersion.objects.filter(
+                    reference_id__in=loaded
+                ).order_by('reference_id', 'start_date').values_list('reference_id', *VERSION_INFO_FIELDS):
+                    loaded[reference_id].append(VersionInfo(*item))
+            loaded = {refbook_id: tuple(versions) for refbook_id, versions in loaded.items()}
+            self.shared.set_many({self.shared.key('versions', refbook_id, stamps[refbook_id]): versions
+                                  for refbook_id, versions in loaded.items() if versions})
+
+        for refbook_id, versions in {**from_shared, **loaded}.items():
+            if versions:
+                self._set(('versions', refbook_id, stamps[refbook_id]), versions,
+                          _sizeof_versions(versions), generations[refbook_id])
+            result[refbook_id] = versions
+        return result
+
+    def bulk_resolve(self, refbook_ids, date):
+        """
+        Определяет версии нескольких справочников, действующие на дату date.
+
+        :returns:
+            dict: id справочника → VersionInfo или None, если версии на эту дату нет
+        """
+        return {refbook_id: find_version_on_date(versions, date)
+                for refbook_id, versions in self.get_versions_many(refbook_ids).items()}
+
+    def _chain(self, refbook_id, version_id):
+        # Родительская версия не меняется после создания версии, поэтому цепочку можно определить по любому
+        # списку версий справочника в памяти процесса, в котором есть версия; обращение к нему не учитывается
+        # в счётчиках и порядке вытеснения. Если такого списка нет, цепочка читается из базы
+        with self._lock:
+            found = next((versions for key, (versions, _) in self._entries.items()
+                          if key[:2] == ('versions', refbook_id) and any(item.id == version_id for item in versions)),
+                         None)
+        return ReferenceVersion.objects.chain(version_id, found)
+
+    def _load_elements(self, refbook_id, version_id):
+        with primary_reads():
+            chain = self._chain(refbook_id, version_id)
+            return dict(ReferenceElement.objects.in_chain(chain).order_by('id').values_list('code', 'value'))
+
+    def get_elements(self, refbook_id, version_id):
+        """
+        Возвращает элементы версии справочника в виде словаря код → значение.
+        """
+        key = ('elements', refbook_id, version_id, self.shared.stamp(refbook_id))
+        return self._fetch(key, partial(self._load_elements, refbook_id, version_id), _sizeof_elements)
+
+    def _load_index(self, refbook_id, version_id):
+        def rows(chain):
+            size = 0
+            for code, value in ReferenceElement.objects.in_chain(chain).values_list(
+                'code', 'value'
+            ).iterator(chunk_size=INDEX_CHUNK_SIZE):
+                size += len(code) + len(value) + INDEX_ROW_OVERHEAD
+                if size > self.max_bytes:
+                    raise _IndexTooLarge
+                yield code, value
+
+        try:
+            with primary_reads():
+                chain = self._chain(refbook_id, version_id)
+                index = ElementIndex.build(rows(chain))
+        except _IndexTooLarge:
+            return ElementLookup(version_id, chain)
+        return index if index.nbytes <= self.max_bytes else ElementLookup(version_id, chain)
+
+    def get_index(self, refbook_id, version_id):
+        """
+        Возвращает компактный индекс элементов версии справочника (ElementIndex) для проверки элементов.
+        Индекс строится при первом обращении потоком строк из базы, без словаря элементов.
+
+        Если индекс не помещается в max_bytes, построение прекращается и в кэше сохраняется ElementLookup,
+        который проверяет элементы запросами к базе, — индекс не строится заново при каждом запросе.
+        """
+        key = ('index', refbook_id, version_id, self.shared.stamp(refbook_id))
+        return self._fetch(key, partial(self._load_index, refbook_id, version_id), attrgetter('nbytes'))
+
+    async def _afetch(self, key, loader, sizeof):
+        """
+        Асинхронный вариант _fetch. Попадание в память процесса не требует потока; при включённом общем кэше
+        он читается в потоках пула, ожидание чужой загрузки не занимает поток, и только загрузка из базы
+        выполняется в потоке, общем для синхронного кода (этого требует ORM Django).
+        """
+        if not self.shared.enabled:
+            value = self._get(key, count_miss=False)[0]
+            if value is None:
+                value = await sync_to_async(self._fetch)(key, loader, sizeof)
+            return value
+        value, generation = self._get(key)
+        if value is None:
+            value = await self.shared.aget_or_build(self.shared.key(*key), sync_to_async(loader))
+            self._set(key, value, sizeof(value), generation)
+        return value
+
+    async def aget_versions(self, refbook_id):
+        """
+        Асинхронный вариант get_versions: при попадании в кэш отвечает, не занимая поток,
+        общий для синхронного кода, при промахе выполняет загрузку из базы в этом потоке.
+        """
+        stamp = await self.shared.astamp(refbook_id)
+        key = ('versions', refbook_id, stamp)
+        versions, generation = self._get(key, count_miss=False)
+        if versions is None and self.shared.enabled:
+            versions = await self.shared.aget(self.shared.key(*key))
+            if versions:
+                self._set(key, versions, _sizeof_versions(versions), generation)
+        if versions is None:
+            versions = await sync_to_async(self.get_versions)(refbook_id)
+        return versions
+
+    async def aget_elements(self, refbook_id, version_id):
+        """
+        Асинхронный вариант get_elements.
+        """
+        key = ('elements', refbook_id, version_id, await self.shared.astamp(refbook_id))
+        return await self._afetch(key, partial(self._load_elements, refbook_id, version_id), _sizeof_elements)
+
+    async def aget_index(self, refbook_id, version_id):
+        """
+        Асинхронный вариант get_index.
+        """
+        key = ('index', refbook_id, version_id, await self.shared.astamp(refbook_id))
+        return await self._afetch(key, partial(self._load_index, refbook_id, version_id), attrgetter('nbytes'))
+
+    def get_refbook_list(self, date, loader):
+        """
+        Возвращает сериализованный список справочников на дату из общего кэша,
+        при промахе вычисляет его функцией loader и сохраняет.
+        """
+        # Дата приходит из запроса как есть, поэтому в ключ попадает её хэш
+        date_key = hashlib.md5(date.encode()).hexdigest() if date is not None else 'all'
+        shared_key = self.shared.key('refbooks', date_key, self.shared.stamp('*'))
+        refbooks = self.shared.get(shared_key)
+        if refbooks is None:
+            with primary_reads():
+                refbooks = loader()
+            self.shared.set(shared_key, refbooks)
+        return refbooks
+
+    def invalidate_refbook(self, refbook_id):
+        """
+        Удаляет из кэша все записи справочника.
+        """
+        self.shared.bump(refbook_id)
+        self.shared.bump('*')
+        self._discard(lambda key, value: key[1] == refbook_id)
+
+    def invalidate_version(self, version_id, refbook_id=None):
+        """
+        Удаляет из кэша версию справочника: её элементы и списки версий, в которых она присутствует.
+        Если передан refbook_id, записи справочника становятся недействительными и в общем кэше,
+        а из памяти процесса удаляются элементы всех версий справочника: производные версии
+        наследуют элементы родительской (reference.versioning).
+        """
+        if refbook_id is not None:
+            self.shared.bump(refbook_id)
+
+        def predicate(key, value):
+            if key[0] in ('elements', 'index'):
+                return key[2] == version_id or key[1] == refbook_id
+            return any(item.id == version_id for item in value)
+        self._discard(predicate)
+
+    def clear(self):
+        self._discard(lambda key, value: True)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+def invalidate_on_commit(method, *args):
+    """
+    Инвалидирует кэш сразу и повторно после фиксации транзакции,
+    чтобы данные, прочитанные параллельным запросом до фиксации, не остались в кэше.
+    """
+    method(*args)
+    transaction.on_commit(lambda: method(*args))
+
+
+element_cache = VersionElementCache(getattr(settings, 'REFERENCE_ELEMENT_CACHE_MAX_BYTES', 64 * 1024 * 1024))
@@ -0,0 +1,135 @@
+"""
+Журнал изменений справочников (ReferenceChange) для синхронизации локальных копий: клиент получает
+только изменения после своего курсора (GET refbooks/<id>/changes/?since=<курсор>), а не все элементы.
+
+Журнал пополняется сигналами моделей (reference.signals) и публикацией версии как набора изменений
+(reference.versioning). Каждое изменение содержит version_id — идентификатор версии, по которому клиент
+находит локальную копию версии и после смены её номера. Порядок применения изменений клиентом:
+    - версия insert без parent — загрузить элементы версии целиком (elements/?version=...&stream=1):
+      элементы загруженной из файла версии в журнал не пишутся, чтобы журнал рос с числом изменений,
+      а не с размером справочника;
+    - версия insert с parent — скопировать локальную копию родительской версии, следующие записи
+      журнала содержат её отличия от родительской;
+    - версия update — новые номер и дата начала действия версии version_id,
+      версия delete — удалить версию со всеми элементами;
+    - элемент insert или update — записать код и значение, элемент delete — удалить код.
+insert и update применяются как запись по коду, поэтому повторное применение записей безопасно.
+Чтобы начать синхронизацию, клиент запрашивает текущий курсор (без since), затем загружает элементы.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, QuerySet
+
+from .models import Reference, ReferenceChange
+
+SYNC_DEFAULT_LIMIT = 1000
+SYNC_MAX_LIMIT = getattr(settings, 'REFERENCE_SYNC_MAX_LIMIT', 10000)
+
+_CHANGE_FIELDS = ('id', 'operation', 'version_id', 'version', 'code', 'value', 'start_date', 'parent')
+
+
+def version_change(refbook_version, operation):
+    """
+    Возвращает запись журнала об изменении версии справочника.
+    """
+    parent = refbook_version.parent.version if refbook_version.parent_id else None
+    return ReferenceChange(version_id=refbook_version.id, version=refbook_version.version, operation=operation,
+                           start_date=refbook_version.start_date, parent=parent)
+
+
+def element_change(version_id, version, operation, code, value=None):
+    """
+    Возвращает запись журнала об изменении элемента версии справочника.
+    """
+    return ReferenceChange(version_id=version_id, version=version, operation=operation, code=code, value=value)
+
+
+def deleted_with(origin, model):
+    """
+    Проверяет, что удаление началось с объекта или набора объектов модели model или одной из моделей
+    кортежа model (аргумент origin сигналов удаления). Так каскадное удаление не пишет в журнал
+    запись для каждого элемента.
+    """
+    if isinstance(origin, QuerySet):
+        return issubclass(origin.model, model)
+    return isinstance(origin, model)
+
+
+def _lock_refbook(refbook_id):
+    """
+    Блокирует строку справочника (SELECT ... FOR UPDATE) до конца транзакции — один раз за транзакцию:
+    о взятой блокировке помнит отложенная функция транзакции, которую Django удаляет при откате.
+    """
+    connection = transaction.get_connection()
+    if any(getattr(item[1], 'changelog_refbook_id', None) == refbook_id for item in connection.run_on_commit):
+        return
+    list(Reference.objects.select_for_update().filter(pk=refbook_id).values_list('pk'))
+
+    def locked():
+        pass
+
+    locked.changelog_refbook_id = refbook_id
+    transaction.on_commit(locked)
+
+
+def record(refbook_id, changes):
+    """
+    Записывает изменения справочника в журнал.
+
+    Запись выполняется под блокировкой строки справочника (SELECT ... FOR UPDATE) до конца транзакции:
+    транзакции, изменяющие один справочник, получают номера изменений в порядке фиксации,
+    поэтому клиент не пропустит изменение, зафиксированное позже изменения с бо́льшим номером.
+    Внутри транзакции блокировка берётся один раз, а запись не создаёт точку сохранения.
+
+    :argument:
+        refbook_id (int): идентификатор справочника
+        changes (iterable[ReferenceChange]): записи журнала без справочника
+    """
+    changes = list(changes)
+    if not changes:
+        return
+    for change in changes:
+        change.reference_id = refbook_id
+    with transaction.atomic(savepoint=False):
+        _lock_refbook(refbook_id)
+        ReferenceChange.objects.bulk_create(changes, batch_size=1000)
+
+
+def latest_cursor(refbook_id):
+    """
+    Возвращает номер последнего изменения справочника или 0, если изменений нет.
+    """
+    return ReferenceChange.objects.filter(reference_id=refbook_id).aggregate(cursor=Max('id'))['cursor'] or 0
+
+
+def changes_since(refbook_id, since, limit=SYNC_DEFAULT_LIMIT):
+    """
+    Возвращает изменения справочника после курсора since.
+
+    :argument:
+        refbook_id (int): идентификатор справочника
+        since (int): курсор — номер последнего изменения, уже полученного клиентом
+        limit (int): максимальное число изменений
+
+    :returns:
+        (изменения, новый курсор, есть ли ещё изменения); изменение — словарь
+        {"seq", "type": "version" или "element", "op", "version_id", "version", ...} без пустых полей
+    """
+    rows = list(ReferenceChange.objects.filter(reference_id=refbook_id, id__gt=since).order_by('id').values_list(
+        *_CHANGE_FIELDS)[:limit + 1])
+    more = len(rows) > limit
+    rows = rows[:limit]
+    changes = []
+    for seq, operation, version_id, version, code, value, start_date, parent in rows:
+        if code is None:
+            change = {'seq': seq, 'type': 'version', 'op': operation, 'version_id': version_id, 'version': version,
+                      'start_date': start_date}
+            if parent is not None:
+                change['parent'] = parent
+        else:
+            change = {'seq': seq, 'type': 'element', 'op': operation, 'version_id': version_id, 'version': version,
+                      'code': code}
+            if value is not None:
+                change['value'] = value
+        changes.append(change)
+    return changes, rows[-1][0] if rows else since, more
@@ -0,0 +1,59 @@
+import hashlib
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+# Время кэширования ответов для URL с явно указанной версией и для текущей версии
+VERSIONED_MAX_AGE = getattr(settings, 'REFERENCE_VERSIONED_MAX_AGE', 24 * 60 * 60)
+CURRENT_MAX_AGE = getattr(settings, 'REFERENCE_CURRENT_MAX_AGE', 60)
+
+
+def version_etag(request, refbook_version):
+    """
+    Возвращает сильный ETag ответа для версии справочника.
+
+    ETag строится из идентификатора и ревизии версии (ReferenceVersion.revision увеличивается
+    при каждом изменении её элементов) и параметров запроса, от которых зависит представление,
+    включая выбранный при согласовании формат ответа (JSON, msgpack). Асинхронные представления
+    (reference.async_views) отвечают только в JSON.
+    """
+    renderer = getattr(request, 'accepted_renderer', None)
+    media_type = renderer.media_type if renderer is not None else 'application/json'
+    params = urlencode(sorted(request.GET.lists()), doseq=True)
+    digest = hashlib.md5(f'{media_type} {request.path}?{params}'.encode()).hexdigest()[:16]
+    return f'"{refbook_version.id}-{refbook_version.revision}-{digest}"'
+
+
+def _last_modified(refbook_version):
+    return int(refbook_version.updated_at.timestamp())
+
+
+def not_modified_response(request, refbook_version, versioned):
+    """
+    Обрабатывает If-None-Match и If-Modified-Since.
+
+    :returns:
+        ответ 304 с заголовками кэширования, если у клиента актуальная копия, иначе None
+    """
+    response = get_conditional_response(
+        request, etag=version_etag(request, refbook_version), last_modified=_last_modified(refbook_version)
+    )
+    if response is not None:
+        set_cache_headers(response, request, refbook_version, versioned)
+    return response
+
+
+def set_cache_headers(response, request, refbook_version, versioned):
+    """
+    Устанавливает ETag, Last-Modified и Cache-Control ответа для версии справочника.
+    Ответы для явно указанной версии кэшируются надолго, для текущей версии — коротко,
+    так как текущая версия меняется с наступлением даты начала действия следующей.
+    Формат ответа зависит от заголовка Accept, поэтому он добавляется в Vary.
+    """
+    response['ETag'] = version_etag(request, refbook_version)
+    response['Last-Modified'] = http_date(_last_modified(refbook_version))
+    patch_cache_control(response, public=True, max_age=VERSIONED_MAX_AGE if versioned else CURRENT_MAX_AGE)
+    patch_vary_headers(response, ('Accept',))
+    return response
@@ -0,0 +1,177 @@
+import csv
+import json
+import re
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+
+from .models import ReferenceVersion, ReferenceElement
+
+IMPORT_BATCH_SIZE = getattr(settings, 'REFERENCE_IMPORT_BATCH_SIZE', 5000)
+IMPORT_FORMATS = ('csv', 'json', 'ndjson')
+
+CODE_MAX_LENGTH = ReferenceElement._meta.get_field('code').max_length
+VALUE_MAX_LENGTH = ReferenceElement._meta.get_field('value').max_length
+
+ImportResult = namedtuple('ImportResult', ['version', 'count', 'seconds'])
+
+
+class RefbookImportError(ValueError):
+    """
+    Ошибка в импортируемых данных справочника.
+    """
+
+
+def _element(row, position):
+    """
+    Проверяет элемент из входного файла и возвращает пару (код, значение).
+    """
+    if not isinstance(row, dict) or row.get('code') is None or row.get('value') is None:
+        raise RefbookImportError(f'Element {position}: "code" and "value" are required')
+    code, value = str(row['code']), str(row['value'])
+    if not code:
+        raise RefbookImportError(f'Element {position}: "code" must not be empty')
+    if len(code) > CODE_MAX_LENGTH:
+        raise RefbookImportError(f'Element {position}: "code" is longer than {CODE_MAX_LENGTH} characters')
+    if len(value) > VALUE_MAX_LENGTH:
+        raise RefbookImportError(f'Element {position}: "value" is longer than {VALUE_MAX_LENGTH} characters')
+    return code, value
+
+
+def iter_csv(stream):
+    """
+    Читает элементы из CSV с заголовком, содержащим колонки code и value.
+    """
+    for position, row in enumerate(csv.DictReader(stream), start=1):
+        yield _element(row, position)
+
+
+def iter_ndjson(stream):
+    """
+    Читает элементы из NDJSON: по одному объекту {"code", "value"} на строку.
+    """
+    position = 0
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        position += 1
+        try:
+            row = json.loads(line)
+        except ValueError as error:
+            raise RefbookImportError(f'Element {position}: invalid JSON ({error})')
+        yield _element(row, position)
+
+
+_JSON_ELEMENTS_PREFIX = re.compile(r'\s*(\{\s*"elements"\s*:\s*)?\[')
+
+
+def iter_json(stream, chunk_size=64 * 1024):
+    """
+    Потоково читает элементы из JSON-массива [{...}, ...] или документа {"elements": [...]}
+    (формат ответа refbooks/<id>/elements/), не загружая весь файл в память.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    eof = False
+
+    def read():
+        nonlocal buffer, eof
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            eof = True
+        buffer += chunk
+
+    while not eof and '[' not in buffer:
+        read()
+    match = _JSON_ELEMENTS_PREFIX.match(buffer)
+    if match is None:
+        raise RefbookImportError('Expected a JSON array of elements or {"elements": [...]}')
+    position = match.end()
+
+    count = 0
+    while True:
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+            if position < len(buffer) or eof:
+                break
+            read()
+        if position >= len(buffer):
+            raise RefbookImportError('Unexpected end of JSON document')
+        if buffer[position] == ']':
+            return
+        try:
+            row, position = decoder.raw_decode(buffer, position)
+        except ValueError as error:
+            if eof:
+                raise RefbookImportError(f'Element {count + 1}: invalid JSON ({error})')
+            read()
+            continue
+        count += 1
+        yield _element(row, count)
+        # Отбрасываем уже разобранную часть буфера
+        if position > chunk_size:
+            buffer = buffer[position:]
+            position = 0
+
+
+def iter_rows(stream, import_format):
+    """
+    Возвращает итератор пар (код, значение) из текстового потока в указанном формате.
+    """
+    readers = {'csv': iter_csv, 'json': iter_json, 'ndjson': iter_ndjson}
+    if import_format not in readers:
+        raise RefbookImportError(f'Unsupported format "{import_format}", expected one of {", ".join(IMPORT_FORMATS)}')
+    return readers[import_format](stream)
+
+
+def guess_format(filename):
+    """
+    Определяет формат файла по расширению, либо возвращает None.
+    """
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    return extension if extension in IMPORT_FORMATS else None
+
+
+def import_version(reference, version, start_date, rows, batch_size=IMPORT_BATCH_SIZE, progress=None):
+    """
+    Создаёт версию справочника и её элементы пакетами через bulk_create в одной транзакции.
+
+    :argument:
+        reference (Reference): справочник
+        version (str): номер новой версии
+        start_date (date): дата начала действия версии
+        rows (iterable): пары (код, значение)
+        batch_size (int): число элементов в одном bulk_create
+        progress (callable, optional): вызывается после каждого пакета с аргументами (count, seconds)
+
+    :returns:
+        ImportResult(version, count, seconds)
+    Raises: RefbookImportError:
+        если данные некорректны или нарушают уникальность версии или кода элемента
+    """
+    started = time.monotonic()
+    count = 0
+    try:
+        with transaction.atomic():
+            refbook_version = ReferenceVersion.objects.create(
+                reference=reference, version=version, start_date=start_date
+            )
+            batch = []
+            for code, value in rows:
+                batch.append(ReferenceElement(version=refbook_version, code=code, value=value))
+                if len(batch) >= batch_size:
+                    ReferenceElement.objects.bulk_create(batch)
+                    count += len(batch)
+                    batch = []
+                    if progress is not None:
+                        progress(count, time.monotonic() - started)
+            if batch:
+                ReferenceElement.objects.bulk_create(batch)
+                count += len(batch)
+    except IntegrityError as error:
+        raise RefbookImportError(f'Version or element codes are not unique ({error})')
+    return ImportResult(refbook_version, count, time.monotonic() - started)
@@ -0,0 +1,141 @@
+"""
+Компактный индекс элементов версии справочника только для чтения.
+
+Вместо словаря код → значение из объектов str (около 150 байт накладных расходов на элемент)
+коды и значения хранятся в виде UTF-8 в общих буферах bytes, а поиск выполняется по хэш-таблице
+с открытой адресацией в array: ответ на проверку элемента — O(1) с точным сравнением кода и значения.
+Одинаковые значения хранятся один раз.
+"""
+import zlib
+from array import array
+
+# Максимальная заполненность хэш-таблицы
+LOAD_FACTOR = 0.66
+
+
+def _compact(offsets, size):
+    """
+    Переводит смещения в 32-битный массив, если размер буфера это позволяет.
+    """
+    return array('I', offsets) if size < 2 ** 32 else offsets
+
+
+def _table_size(count):
+    size = 1
+    while size * LOAD_FACTOR < count:
+        size *= 2
+    return size
+
+
+class ElementIndex:
+    """
+    Индекс элементов версии справочника.
+
+    Fields:
+        codes (bytes): коды элементов подряд в UTF-8
+        code_offsets (array): начало кода i в codes, code_offsets[i + 1] — его конец
+        value_ids (array): номер значения элемента i среди различных значений
+        values (bytes): различные значения подряд в UTF-8
+        value_offsets (array): границы значений в values
+        slots (array): хэш-таблица, номер элемента + 1 или 0 для пустой ячейки
+    Methods:
+        build(rows): строит индекс по парам (код, значение)
+        get(code): значение элемента с кодом code или None
+        contains(code, value): есть ли элемент с кодом code и значением value
+        contains_many(pairs): contains для каждой пары (код, значение)
+    """
+    __slots__ = ('codes', 'code_offsets', 'value_ids', 'values', 'value_offsets', 'slots')
+
+    def __init__(self, codes, code_offsets, value_ids, values, value_offsets, slots):
+        self.codes = codes
+        self.code_offsets = code_offsets
+        self.value_ids = value_ids
+        self.values = values
+        self.value_offsets = value_offsets
+        self.slots = slots
+
+    @classmethod
+    def build(cls, rows):
+        """
+        Строит индекс по итерируемому объекту пар (код, значение).
+        При повторе кода действует последнее значение, как в словаре.
+        """
+        codes = bytearray()
+        code_offsets = array('Q', [0])
+        values = bytearray()
+        value_offsets = array('Q', [0])
+        value_numbers = {}
+        value_ids = array('I')
+        for code, value in rows:
+            codes += code.encode()
+            code_offsets.append(len(codes))
+            number = value_numbers.get(value)
+            if number is None:
+                number = value_numbers[value] = len(value_numbers)
+                values += value.encode()
+                value_offsets.append(len(values))
+            value_ids.append(number)
+        del value_numbers
+
+        count = len(value_ids)
+        code_offsets = _compact(code_offsets, len(codes))
+        value_offsets = _compact(value_offsets, len(values))
+        size = _table_size(count)
+        mask = size - 1
+        slots = array('I', bytes(4 * size)) if count < 2 ** 32 - 1 else array('Q', bytes(8 * size))
+        codes = bytes(codes)
+        for position in range(count):
+            key = codes[code_offsets[position]:code_offsets[position + 1]]
+            slot = zlib.crc32(key) & mask
+            while slots[slot]:
+                other = slots[slot] - 1
+                if codes[code_offsets[other]:code_offsets[other + 1]] == key:
+                    break
+                slot = (slot + 1) & mask
+            slots[slot] = position + 1
+
+        return cls(codes, code_offsets, value_ids, bytes(values), value_offsets, slots)
+
+    def _find(self, key):
+        slots, codes, offsets = self.slots, self.codes, self.code_offsets
+        mask = len(slots) - 1
+        slot = zlib.crc32(key) & mask
+        while True:
+            position = slots[slot]
+            if not position:
+                return None
+            position -= 1
+            if codes[offsets[position]:offsets[position + 1]] == key:
+                return position
+            slot = (slot + 1) & mask
+
+    def _value(self, position):
+        number = self.value_ids[position]
+        return self.values[self.value_offsets[number]:self.value_offsets[number + 1]]
+
+    def get(self, code):
+        position = self._find(code.encode())
+        if position is None:
+            return None
+        return self._value(position).decode()
+
+    def contains(self, code, value):
+        if code is None or value is None:
+            return False
+        position = self._find(code.encode())
+        return position is not None and self._value(position) == value.encode()
+
+    def contains_many(self, pairs):
+        return [self.contains(code, value) for code, value in pairs]
+
+    def __len__(self):
+        # Повторные коды при построении заменяют элемент в таблице, поэтому считаем занятые ячейки
+        return len(self.slots) - self.slots.count(0)
+
+    @property
+    def nbytes(self):
+        """
+        Приблизительный объём памяти индекса в байтах.
+        """
+        arrays = (self.code_offsets, self.value_ids, self.value_offsets, self.slots)
+        return len(self.codes) + len(self.values) + sum(item.itemsize * len(item) for item in arrays)
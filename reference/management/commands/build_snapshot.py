@@ -0,0 +1,47 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from reference.models import Reference, ReferenceVersion
+from reference.snapshots import SUFFIX, build_snapshot, remove_snapshot, snapshot_dir
+
+
+class Command(BaseCommand):
+    help = 'Записывает снимки версий справочников в файлы для чтения через mmap (REFERENCE_SNAPSHOT_DIR)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--refbook', help='Код справочника, по умолчанию все справочники')
+        parser.add_argument('--directory', help='Каталог снимков, по умолчанию REFERENCE_SNAPSHOT_DIR')
+        parser.add_argument('--prune', action='store_true', help='Удалить снимки версий, которых больше нет')
+
+    def handle(self, *args, **options):
+        directory = options['directory'] or snapshot_dir()
+        if not directory:
+            raise CommandError('Snapshot directory is not configured, set REFERENCE_SNAPSHOT_DIR or use --directory')
+
+        versions = ReferenceVersion.objects.order_by('id')
+        if options['refbook']:
+            reference = Reference.objects.filter(code=options['refbook']).first()
+            if reference is None:
+                raise CommandError(f'Reference book "{options["refbook"]}" does not exist')
+            versions = versions.filter(reference=reference)
+
+        started = time.monotonic()
+        version_ids = list(versions.values_list('id', flat=True))
+        for version_id in version_ids:
+            path = build_snapshot(version_id, directory)
+            if path is not None:
+                self.stdout.write(f'{path}: {os.path.getsize(path)} bytes')
+
+        if options['prune']:
+            existing = set(ReferenceVersion.objects.values_list('id', flat=True))
+            for name in os.listdir(directory):
+                stem = name[:-len(SUFFIX)]
+                if name.endswith(SUFFIX) and stem.isdigit() and int(stem) not in existing:
+                    remove_snapshot(int(stem), directory)
+                    self.stdout.write(f'Removed {name}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Built {len(version_ids)} snapshots in {time.monotonic() - started:.2f} s'
+        ))
@@ -0,0 +1,51 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from reference.importers import (IMPORT_BATCH_SIZE, IMPORT_FORMATS, RefbookImportError, guess_format,
+                                 import_version, iter_rows)
+from reference.models import Reference
+
+
+class Command(BaseCommand):
+    help = 'Импортирует новую версию справочника из файла CSV, JSON или NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Путь к файлу с элементами (колонки или поля code и value)')
+        parser.add_argument('--refbook', required=True, help='Код справочника')
+        parser.add_argument('--refbook-version', required=True, help='Номер новой версии')
+        parser.add_argument('--start-date', required=True, type=datetime.date.fromisoformat,
+                            help='Дата начала действия версии в формате yyyy-mm-dd')
+        parser.add_argument('--format', choices=IMPORT_FORMATS, help='Формат файла, по умолчанию по расширению')
+        parser.add_argument('--name', help='Наименование справочника, если его нужно создать')
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE,
+                            help='Число элементов в одном bulk_create')
+
+    def handle(self, *args, **options):
+        import_format = options['format'] or guess_format(options['path'])
+        if import_format is None:
+            raise CommandError('Cannot guess the file format, use --format')
+
+        reference = Reference.objects.filter(code=options['refbook']).first()
+        if reference is None:
+            if not options['name']:
+                raise CommandError(f'Reference book "{options["refbook"]}" does not exist, use --name to create it')
+            reference = Reference.objects.create(code=options['refbook'], name=options['name'])
+
+        def progress(count, seconds):
+            self.stdout.write(f'{count} elements, {count / seconds:.0f} rows/sec')
+
+        try:
+            with open(options['path'], encoding='utf-8', newline='') as stream:
+                result = import_version(
+                    reference, options['refbook_version'], options['start_date'],
+                    iter_rows(stream, import_format), batch_size=options['batch_size'], progress=progress,
+                )
+        except (OSError, RefbookImportError) as error:
+            raise CommandError(str(error))
+
+        rate = result.count / result.seconds if result.seconds else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {result.count} elements into {reference.code} {result.version.version} '
+            f'in {result.seconds:.2f} s ({rate:.0f} rows/sec)'
+        ))
@@ -0,0 +1,24 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+
+from reference.models import Reference
+
+
+class Command(BaseCommand):
+    help = ('Сдвигает текущие версии справочников, у которых наступила дата смены версии '
+            '(запускается по расписанию, например ежедневно после полуночи)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', type=datetime.date.fromisoformat,
+                            help='Дата, на которую определяются текущие версии, в формате yyyy-mm-dd')
+        parser.add_argument('--all', action='store_true',
+                            help='Пересчитать все справочники, а не только те, у которых наступила дата смены')
+
+    def handle(self, *args, **options):
+        today = options['date'] or datetime.date.today()
+        refbooks = Reference.objects.all()
+        if not options['all']:
+            refbooks = refbooks.filter(next_switch_date__lte=today)
+        count = refbooks.refresh_current_versions(today)
+        self.stdout.write(self.style.SUCCESS(f'Refreshed current versions of {count} reference books'))
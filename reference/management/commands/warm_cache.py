@@ -0,0 +1,34 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand
+
+from reference.cache import element_cache
+from reference.snapshots import snapshot_dir
+from reference.warmup import WARMUP_DAYS_AHEAD, warm_upcoming
+
+
+class Command(BaseCommand):
+    help = ('Заранее строит снимки и заполняет общий кэш для версий справочников, которые скоро станут текущими '
+            '(запускается по расписанию, например ежедневно вечером)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=WARMUP_DAYS_AHEAD,
+                            help='Загрузить версии, которые станут текущими в ближайшие дни')
+        parser.add_argument('--date', type=datetime.date.fromisoformat,
+                            help='Дата отсчёта в формате yyyy-mm-dd, по умолчанию сегодня')
+        parser.add_argument('--current', action='store_true', help='Загрузить и текущие версии')
+
+    def handle(self, *args, **options):
+        if snapshot_dir() is None and not element_cache.shared.enabled:
+            self.stdout.write(self.style.WARNING(
+                'Neither REFERENCE_SNAPSHOT_DIR nor REFERENCE_CACHE_URL is configured: '
+                'only the memory of this process is warmed, use REFERENCE_WARMUP_INTERVAL in server processes'
+            ))
+        started = time.monotonic()
+        versions = warm_upcoming(options['days'], options['date'], options['current'])
+        for refbook_id, refbook_version in versions:
+            self.stdout.write(f'{refbook_id}: {refbook_version.version} from {refbook_version.start_date}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Warmed {len(versions)} versions in {time.monotonic() - started:.2f} s'
+        ))
@@ -0,0 +1,235 @@
+"""
+Метрики запросов в памяти процесса и их выдача в текстовом формате Prometheus.
+
+SQL-запросы учитываются обёрткой execute_wrapper, которая устанавливается на каждое соединение
+с базой данных (сигнал connection_created) и пишет в статистику текущего запроса через contextvar,
+поэтому запросы учитываются и для асинхронных представлений, выполняющих ORM в другом потоке.
+"""
+import contextvars
+import re
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+
+# Границы корзин гистограмм
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 500)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+SLOW_REQUEST_SECONDS = getattr(settings, 'REFERENCE_SLOW_REQUEST_MS', 1000) / 1000
+# Число самых долгих отпечатков SQL-запросов в журнале медленных запросов
+SLOW_REQUEST_TOP_QUERIES = 5
+
+_current = contextvars.ContextVar('reference_request_stats', default=None)
+
+
+class Histogram:
+    """
+    Потокобезопасная гистограмма с фиксированными границами корзин и метками.
+
+    Fields:
+        name (str): имя метрики
+        help (str): описание метрики
+        buckets (tuple): верхние границы корзин по возрастанию
+    Methods:
+        observe(labels, value): добавляет наблюдение для набора меток (кортеж пар имя-значение)
+        collect(): строки в текстовом формате Prometheus
+    """
+
+    def __init__(self, name, help, buckets):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, labels, value):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(self.buckets), 0, 0.0]
+            counts = series[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            series[1] += 1
+            series[2] += value
+
+    def collect(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = sorted((labels, [list(item[0]), item[1], item[2]]) for labels, item in self._series.items())
+        for labels, (counts, count, total) in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{_labels(labels, le=_number(bound))} {cumulative}')
+            lines.append(f'{self.name}_bucket{_labels(labels, le="+Inf")} {count}')
+            lines.append(f'{self.name}_sum{_labels(labels)} {_number(total)}')
+            lines.append(f'{self.name}_count{_labels(labels)} {count}')
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(labels, **extra):
+    items = list(labels) + list(extra.items())
+    if not items:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in items) + '}'
+
+
+REQUEST_DURATION = Histogram(
+    'reference_request_duration_seconds', 'Request latency in seconds.', DURATION_BUCKETS)
+REQUEST_QUERIES = Histogram(
+    'reference_request_db_queries', 'Number of SQL queries per request.', QUERY_COUNT_BUCKETS)
+REQUEST_DB_DURATION = Histogram(
+    'reference_request_db_duration_seconds', 'Total SQL execution time per request in seconds.', DURATION_BUCKETS)
+REQUEST_RENDER_DURATION = Histogram(
+    'reference_request_render_duration_seconds', 'Response serialization (rendering) time in seconds.',
+    DURATION_BUCKETS)
+RESPONSE_SIZE = Histogram(
+    'reference_response_size_bytes', 'Response body size in bytes (streaming responses are not counted).',
+    SIZE_BUCKETS)
+
+HISTOGRAMS = (REQUEST_DURATION, REQUEST_QUERIES, REQUEST_DB_DURATION, REQUEST_RENDER_DURATION, RESPONSE_SIZE)
+
+
+class RequestStats:
+    """
+    Статистика одного запроса.
+
+    Fields:
+        queries (int): число SQL-запросов
+        db_seconds (float): суммарное время SQL-запросов
+        render_seconds (float): время сериализации ответа
+        statements (dict): текст SQL-запроса → [число, суммарное время]
+    """
+    __slots__ = ('queries', 'db_seconds', 'render_seconds', 'statements')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.render_seconds = 0.0
+        self.statements = defaultdict(lambda: [0, 0.0])
+
+    def top_queries(self, limit=SLOW_REQUEST_TOP_QUERIES):
+        """
+        Возвращает самые долгие отпечатки запросов: [(отпечаток, число, суммарное время)].
+        Отпечатки вычисляются только здесь, чтобы не тратить время на каждый запрос.
+        """
+        fingerprints = defaultdict(lambda: [0, 0.0])
+        for sql, (count, seconds) in self.statements.items():
+            item = fingerprints[fingerprint(sql)]
+            item[0] += count
+            item[1] += seconds
+        items = sorted(fingerprints.items(), key=lambda item: item[1][1], reverse=True)
+        return [(sql, count, seconds) for sql, (count, seconds) in items[:limit]]
+
+
+def start_request():
+    """
+    Начинает сбор статистики текущего запроса, возвращает (статистика, токен для finish_request).
+    """
+    stats = RequestStats()
+    return stats, _current.set(stats)
+
+
+def finish_request(token):
+    _current.reset(token)
+
+
+def current_request():
+    """
+    Возвращает статистику текущего запроса или None вне запроса.
+    """
+    return _current.get()
+
+
+_IN_LIST = re.compile(r'\(\s*%s(\s*,\s*%s)+\s*\)')
+_NUMBER = re.compile(r'\b\d+\b')
+_STRING = re.compile(r"'(?:[^']|'')*'")
+
+
+def fingerprint(sql):
+    """
+    Нормализует SQL-запрос: заменяет литералы на ? и списки параметров IN (...) на (...),
+    чтобы запросы, отличающиеся только значениями, давали один отпечаток.
+    """
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    return _IN_LIST.sub('(...)', sql)
+
+
+def query_wrapper(execute, sql, params, many, context):
+    """
+    Обёртка execute_wrapper: учитывает время и отпечаток запроса в статистике текущего HTTP-запроса.
+    Вне HTTP-запроса (команды, миграции) лишь вызывает execute.
+    """
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - started
+        stats.queries += 1
+        stats.db_seconds += duration
+        item = stats.statements[sql]
+        item[0] += 1
+        item[1] += duration
+
+
+def install_query_wrapper(connection):
+    if query_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(query_wrapper)
+
+
+def observe(view, method, status, seconds, stats, size):
+    labels = (('view', view), ('method', method), ('status', str(status)))
+    REQUEST_DURATION.observe(labels, seconds)
+    REQUEST_QUERIES.observe(labels, stats.queries)
+    REQUEST_DB_DURATION.observe(labels, stats.db_seconds)
+    REQUEST_RENDER_DURATION.observe(labels, stats.render_seconds)
+    if size is not None:
+        RESPONSE_SIZE.observe(labels, size)
+
+
+def render_metrics():
+    """
+    Возвращает метрики запросов и счётчики кэша элементов в текстовом формате Prometheus.
+    """
+    from .cache import element_cache
+
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.collect())
+    for name, value in element_cache.stats().items():
+        if value is None:
+            continue
+        if name in ('hits', 'misses', 'evictions'):
+            metric, kind = f'reference_element_cache_{name}_total', 'counter'
+        else:
+            metric, kind = f'reference_element_cache_{name}', 'gauge'
+        lines.append(f'# TYPE {metric} {kind}')
+        lines.append(f'{metric} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+def clear():
+    for histogram in HISTOGRAMS:
+        histogram.clear()
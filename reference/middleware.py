@@ -0,0 +1,155 @@
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+from django.utils.regex_helper import _lazy_re_compile
+
+from . import metrics
+from .routers import replica_reads
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger('reference.metrics')
+
+# Ответы короче этого размера (байт) не сжимаются: выигрыш меньше затрат на сжатие
+COMPRESS_MIN_BYTES = getattr(settings, 'REFERENCE_COMPRESS_MIN_BYTES', 1024)
+# Уровень сжатия brotli: 11 (максимальный) слишком медленный для динамических ответов
+BROTLI_QUALITY = getattr(settings, 'REFERENCE_BROTLI_QUALITY', 5)
+
+re_accepts_brotli = _lazy_re_compile(r'\bbr\b')
+
+
+class RequestMetricsMiddleware:
+    """
+    Собирает метрики каждого запроса: время ответа, число и время SQL-запросов,
+    время сериализации ответа и его размер, — в гистограммы reference.metrics по имени представления.
+    Запросы дольше REFERENCE_SLOW_REQUEST_MS пишутся в журнал reference.metrics
+    вместе с отпечатками самых долгих SQL-запросов.
+
+    Должен стоять первым в MIDDLEWARE, чтобы учитывать время остальных промежуточных слоёв.
+    Работает как с синхронными, так и с асинхронными представлениями.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        # Соединения, открытые до загрузки middleware; новые получают обёртку по сигналу connection_created
+        for connection in connections.all(initialized_only=True):
+            metrics.install_query_wrapper(connection)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats, token = metrics.start_request()
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.finish_request(token)
+        self.record(request, response, stats, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        stats, token = metrics.start_request()
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.finish_request(token)
+        self.record(request, response, stats, time.perf_counter() - started)
+        return response
+
+    def process_template_response(self, request, response):
+        # Ответы DRF сериализуются при render() после выхода из представления: засекаем его время
+        stats = metrics.current_request()
+        if stats is not None:
+            started = time.perf_counter()
+
+            def rendered(response):
+                stats.render_seconds += time.perf_counter() - started
+
+            response.add_post_render_callback(rendered)
+        return response
+
+    def record(self, request, response, stats, seconds):
+        match = request.resolver_match
+        view = match.view_name if match is not None else '<unmatched>'
+        size = None if response.streaming else len(response.content)
+        metrics.observe(view, request.method, response.status_code, seconds, stats, size)
+        if seconds >= metrics.SLOW_REQUEST_SECONDS:
+            logger.warning(
+                'Slow request %s %s: %.3fs, %d queries in %.3fs, render %.3fs, %s bytes; top queries: %s',
+                request.method, request.get_full_path(), seconds, stats.queries, stats.db_seconds,
+                stats.render_seconds, size if size is not None else 'streaming',
+                '; '.join(f'[{count}x {total:.3f}s] {sql}' for sql, count, total in stats.top_queries()),
+            )
+
+
+class ReplicaReadsMiddleware:
+    """
+    Разрешает чтение моделей reference с реплик (reference.routers) для запросов только для чтения:
+    GET, HEAD и OPTIONS вне административной панели. Админка и все изменяющие запросы
+    работают с основной базой. Работает как с синхронными, так и с асинхронными представлениями.
+    """
+    sync_capable = True
+    async_capable = True
+    safe_methods = ('GET', 'HEAD', 'OPTIONS')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def read_only(self, request):
+        return request.method in self.safe_methods and not request.path_info.startswith('/admin/')
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with replica_reads(self.read_only(request)):
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        with replica_reads(self.read_only(request)):
+            return await self.get_response(request)
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """
+    Сжимает ответы не короче REFERENCE_COMPRESS_MIN_BYTES (большие списки элементов):
+    brotli, если клиент принимает его (Accept-Encoding: br) и установлен пакет brotli, иначе gzip.
+    Потоковые ответы сжимаются gzip, кроме потока событий (text/event-stream): сжатие задерживало бы события.
+    Сильный ETag сжатого ответа становится слабым, поэтому условные запросы (If-None-Match) продолжают работать.
+    """
+    min_length = COMPRESS_MIN_BYTES
+
+    def process_response(self, request, response):
+        if response.get('Content-Type', '').startswith('text/event-stream'):
+            return response
+        if not response.streaming and len(response.content) < self.min_length:
+            return response
+        accepts_brotli = re_accepts_brotli.search(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if brotli is None or response.streaming or response.has_header('Content-Encoding') or not accepts_brotli:
+            return super().process_response(request, response)
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        compressed = brotli.compress(response.content, quality=BROTLI_QUALITY)
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response.headers['Content-Length'] = str(len(compressed))
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = 'br'
+        return response
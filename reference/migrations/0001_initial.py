@@ -0,0 +1,56 @@
+# Generated by Django 4.2 on 2026-10-18 16:13
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Reference',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=100, unique=True, verbose_name='Уникальный код справочника')),
+                ('name', models.CharField(max_length=300, verbose_name='Наименование справочника')),
+                ('description', models.TextField(verbose_name='Описание справочника')),
+            ],
+            options={
+                'verbose_name': 'Справочник',
+                'verbose_name_plural': 'Справочники',
+            },
+        ),
+        migrations.CreateModel(
+            name='ReferenceVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.CharField(max_length=50, verbose_name='Версия справочника')),
+                ('start_date', models.DateField(verbose_name='Дата начала действия версии')),
+                ('reference', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='reference.reference', verbose_name='Внешний ключ на справочник')),
+            ],
+            options={
+                'verbose_name': 'Версия справочника',
+                'verbose_name_plural': 'Версии справочников',
+                'unique_together': {('reference', 'start_date')},
+            },
+        ),
+        migrations.CreateModel(
+            name='ReferenceElement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=100, verbose_name='Код элемента справочника')),
+                ('value', models.CharField(max_length=300, verbose_name='Значение элемента справочника')),
+                ('version', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='reference.referenceversion', verbose_name='Внешний ключ на версию справочника')),
+            ],
+            options={
+                'verbose_name': 'Элемент справочника',
+                'verbose_name_plural': 'Элементы справочника',
+                'unique_together': {('version', 'code')},
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2 on 2026-10-18 16:20
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reference', '0002_referenceversion_parent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='referenceversion',
+            name='revision',
+            field=models.PositiveIntegerField(default=1, editable=False, verbose_name='Ревизия версии'),
+        ),
+        migrations.AddField(
+            model_name='referenceversion',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, verbose_name='Время последнего изменения'),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,71 @@
+from django.db import migrations
+
+# Полнотекстовый индекс значений элементов для поиска (reference.search).
+# SQLite: внешняя таблица FTS5 над reference_referenceelement, поддерживаемая триггерами,
+# поэтому индекс обновляется при любой записи элементов, включая bulk_create и INSERT ... SELECT.
+# PostgreSQL: триграммный GIN-индекс по UPPER(value), который используется поиском icontains.
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE reference_element_fts USING fts5(
+        value,
+        content='reference_referenceelement', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER reference_element_fts_insert AFTER INSERT ON reference_referenceelement BEGIN
+        INSERT INTO reference_element_fts (rowid, value) VALUES (new.id, new.value);
+    END
+    """,
+    """
+    CREATE TRIGGER reference_element_fts_delete AFTER DELETE ON reference_referenceelement BEGIN
+        INSERT INTO reference_element_fts (reference_element_fts, rowid, value) VALUES ('delete', old.id, old.value);
+    END
+    """,
+    """
+    CREATE TRIGGER reference_element_fts_update AFTER UPDATE OF value ON reference_referenceelement BEGIN
+        INSERT INTO reference_element_fts (reference_element_fts, rowid, value) VALUES ('delete', old.id, old.value);
+        INSERT INTO reference_element_fts (rowid, value) VALUES (new.id, new.value);
+    END
+    """,
+    "INSERT INTO reference_element_fts (reference_element_fts) VALUES ('rebuild')",
+]
+
+SQLITE_BACKWARD = [
+    'DROP TRIGGER IF EXISTS reference_element_fts_insert',
+    'DROP TRIGGER IF EXISTS reference_element_fts_delete',
+    'DROP TRIGGER IF EXISTS reference_element_fts_update',
+    'DROP TABLE IF EXISTS reference_element_fts',
+]
+
+POSTGRESQL_FORWARD = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX reference_element_value_trgm ON reference_referenceelement '
+    'USING gin (UPPER(value) gin_trgm_ops)',
+]
+
+POSTGRESQL_BACKWARD = [
+    'DROP INDEX IF EXISTS reference_element_value_trgm',
+]
+
+
+def run(statements):
+    def operation(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, ()):
+            schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reference', '0003_referenceversion_revision'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run({'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRESQL_FORWARD}),
+            run({'sqlite': SQLITE_BACKWARD, 'postgresql': POSTGRESQL_BACKWARD}),
+        ),
+    ]
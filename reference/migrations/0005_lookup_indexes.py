@@ -0,0 +1,21 @@
+# Generated by Django 4.2 on 2026-10-18 16:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reference', '0004_element_search'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='referenceversion',
+            unique_together={('reference', 'version'), ('reference', 'start_date')},
+        ),
+        migrations.AddIndex(
+            model_name='referenceelement',
+            index=models.Index(fields=['version', 'code', 'value'], name='reference_element_lookup'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2 on 2026-10-18 16:41
+
+from django.db import migrations, models
+import datetime
+import django.db.models.deletion
+
+
+def fill_current_versions(apps, schema_editor):
+    # Тот же расчёт, что и ReferenceQuerySet.refresh_current_versions (в миграции менеджер модели недоступен)
+    Reference = apps.get_model('reference', 'Reference')
+    ReferenceVersion = apps.get_model('reference', 'ReferenceVersion')
+    today = datetime.date.today()
+    versions = ReferenceVersion.objects.filter(reference=models.OuterRef('pk'))
+    Reference.objects.update(
+        current_version=models.Subquery(versions.filter(start_date__lte=today).order_by('-start_date').values('pk')[:1]),
+        next_switch_date=models.Subquery(versions.filter(start_date__gt=today).order_by('start_date').values('start_date')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reference', '0005_lookup_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reference',
+            name='current_version',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='reference.referenceversion', verbose_name='Текущая версия'),
+        ),
+        migrations.AddField(
+            model_name='reference',
+            name='next_switch_date',
+            field=models.DateField(blank=True, editable=False, null=True, verbose_name='Дата смены текущей версии'),
+        ),
+        migrations.RunPython(fill_current_versions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2 on 2026-10-18 16:49
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reference', '0006_reference_current_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReferenceChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version_id', models.BigIntegerField(verbose_name='Идентификатор версии справочника')),
+                ('version', models.CharField(max_length=50, verbose_name='Версия справочника')),
+                ('operation', models.CharField(choices=[('insert', 'Добавление'), ('update', 'Изменение'), ('delete', 'Удаление')], max_length=10, verbose_name='Операция')),
+                ('code', models.CharField(blank=True, max_length=100, null=True, verbose_name='Код элемента справочника')),
+                ('value', models.CharField(blank=True, max_length=300, null=True, verbose_name='Значение элемента справочника')),
+                ('start_date', models.DateField(blank=True, null=True, verbose_name='Дата начала действия версии')),
+                ('parent', models.CharField(blank=True, max_length=50, null=True, verbose_name='Родительская версия')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Время изменения')),
+                ('reference', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='changes', to='reference.reference', verbose_name='Внешний ключ на справочник')),
+            ],
+            options={
+                'verbose_name': 'Изменение справочника',
+                'verbose_name_plural': 'Журнал изменений справочников',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='referencechange',
+            index=models.Index(fields=['reference', 'id'], name='reference_change_cursor'),
+        ),
+    ]
@@ -0,0 +1,99 @@
+# Generated by Django 4.2 on 2026-10-18 17:44
+
+from django.db import migrations, models
+
+# Производные версии хранят только отличия от родительской версии (reference.versioning).
+# До этой миграции они хранили полный набор элементов: коды родительской версии, которых нет в производной,
+# отмечаются удалёнными, после чего совпадающие с родительской версией элементы удаляются.
+MARK_REMOVED = """
+    INSERT INTO reference_referenceelement (version_id, code, value, removed)
+    SELECT v.id, p.code, '', %s
+    FROM reference_referenceversion v
+    JOIN reference_referenceelement p ON p.version_id = v.parent_id
+    WHERE NOT EXISTS (
+        SELECT 1 FROM reference_referenceelement c WHERE c.version_id = v.id AND c.code = p.code
+    )
+"""
+
+DELETE_INHERITED = """
+    DELETE FROM reference_referenceelement
+    WHERE removed = %s AND EXISTS (
+        SELECT 1 FROM reference_referenceversion v
+        JOIN reference_referenceelement p ON p.version_id = v.parent_id AND p.removed = %s
+        WHERE v.id = reference_referenceelement.version_id
+          AND p.code = reference_referenceelement.code AND p.value = reference_referenceelement.value
+    )
+"""
+
+# Обратное преобразование: производные версии снова получают полный набор элементов.
+# За проход версия получает элементы родительской версии, поэтому проходы повторяются по длине цепочки версий
+COPY_INHERITED = """
+    INSERT INTO reference_referenceelement (version_id, code, value, removed)
+    SELECT v.id, p.code, p.value, %s
+    FROM reference_referenceversion v
+    JOIN reference_referenceelement p ON p.version_id = v.parent_id AND p.removed = %s
+    WHERE NOT EXISTS (
+        SELECT 1 FROM reference_referenceelement c WHERE c.version_id = v.id AND c.code = p.code
+    )
+"""
+
+
+def removed_field():
+    field = models.BooleanField(default=False, editable=False, verbose_name='Удалён из родительской версии')
+    field.set_attributes_from_name('removed')
+    return field
+
+
+def add_removed(apps, schema_editor):
+    # SQLite добавляет поле со значением по умолчанию пересозданием таблицы, которое удалило бы
+    # триггеры полнотекстового индекса (0004_element_search), поэтому столбец добавляется ALTER TABLE
+    model = apps.get_model('reference', 'ReferenceElement')
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('ALTER TABLE reference_referenceelement ADD COLUMN "removed" bool NOT NULL DEFAULT 0')
+    else:
+        schema_editor.add_field(model, removed_field())
+
+
+def drop_removed(apps, schema_editor):
+    model = apps.get_model('reference', 'ReferenceElement')
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('ALTER TABLE reference_referenceelement DROP COLUMN "removed"')
+    else:
+        schema_editor.remove_field(model, removed_field())
+
+
+def store_deltas(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(MARK_REMOVED, [True])
+        cursor.execute(DELETE_INHERITED, [False, False])
+
+
+def store_full_versions(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        while True:
+            cursor.execute(COPY_INHERITED, [False, False])
+            if not cursor.rowcount:
+                break
+        cursor.execute('DELETE FROM reference_referenceelement WHERE removed = %s', [True])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reference', '0007_change_log'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddField(
+                    model_name='referenceelement',
+                    name='removed',
+                    field=models.BooleanField(default=False, editable=False,
+                                              verbose_name='Удалён из родительской версии'),
+                ),
+            ],
+            database_operations=[migrations.RunPython(add_removed, drop_removed)],
+        ),
+        migrations.RunPython(store_deltas, store_full_versions),
+    ]
@@ -1,7 +1,138 @@
 import datetime
 
+from django.core.exceptions import ValidationError
 from django.db import models
 
+from . import notifications
+
+
+class ReferenceQuerySet(models.QuerySet):
+    """
+    Набор справочников.
+
+    Methods:
+        - refresh_current_versions: пересчитывает текущую версию и дату её смены у справочников набора
+    """
+
+    def refresh_current_versions(self, today=None):
+        """
+        Пересчитывает current_version и next_switch_date одним запросом UPDATE с подзапросами по версиям.
+        Сигналы не отправляются, поэтому метод можно вызывать из обработчиков сигналов версий.
+        О версиях, ставших текущими, после фиксации транзакции публикуется событие current.
+
+        :argument:
+            today (date, optional): дата, на которую определяется текущая версия, по умолчанию сегодня
+
+        :returns:
+            число обновлённых справочников
+        """
+        today = today or datetime.date.today()
+        previous = dict(self.values_list('pk', 'current_version_id'))
+        if not previous:
+            return 0
+        versions = ReferenceVersion.objects.filter(reference=models.OuterRef('pk'))
+        count = Reference.objects.filter(pk__in=previous).update(
+            current_version=models.Subquery(
+                versions.filter(start_date__lte=today).order_by('-start_date').values('pk')[:1]
+            ),
+            next_switch_date=models.Subquery(
+                versions.filter(start_date__gt=today).order_by('start_date').values('start_date')[:1]
+            ),
+        )
+        # Уведомления подписчиков о версиях, ставших текущими (reference.notifications)
+        switched = Reference.objects.filter(pk__in=previous, current_version__isnull=False).values_list(
+            'pk', 'code', 'current_version_id', 'current_version__version', 'current_version__start_date')
+        notifications.publish_on_commit(
+            notifications.version_event(notifications.CURRENT, pk, code, version, start_date)
+            for pk, code, version_id, version, start_date in switched if previous[pk] != version_id
+        )
+        return count
+
+
+class ReferenceVersionQuerySet(models.QuerySet):
+    """
+    Набор версий справочника.
+
+    Methods:
+        - chain: идентификаторы версии и её родительских версий (reference.versioning)
+        - descendants: идентификаторы версий, созданных от версии прямо или через другие производные версии
+    """
+
+    def _links(self, version_id, versions):
+        if versions is None:
+            versions = self.filter(reference__referenceversion=version_id).only('id', 'parent_id')
+        return {item.id: item.parent_id for item in versions}
+
+    def chain(self, version_id, versions=None):
+        """
+        Возвращает идентификаторы версии и её родительских версий, начиная с самой версии.
+
+        :argument:
+            version_id (int): идентификатор версии
+            versions (iterable, optional): версии справочника с атрибутами id и parent_id (например, VersionInfo
+                из кэша), по умолчанию загружаются из базы одним запросом
+
+        :returns:
+            list[int]
+        """
+        if version_id is None:
+            return [None]
+        parents = self._links(version_id, versions)
+        chain = [version_id]
+        while parents.get(chain[-1]) is not None and parents[chain[-1]] not in chain:
+            chain.append(parents[chain[-1]])
+        return chain
+
+    def descendants(self, version_id, versions=None):
+        """
+        Возвращает идентификаторы версий, элементы которых наследуются от версии version_id.
+        """
+        parents = self._links(version_id, versions)
+        found = []
+        pending = [version_id]
+        while pending:
+            parent = pending.pop()
+            for item, item_parent in parents.items():
+                if item_parent == parent and item != version_id and item not in found:
+                    found.append(item)
+                    pending.append(item)
+        return found
+
+
+class ReferenceElementQuerySet(models.QuerySet):
+    """
+    Набор элементов справочника.
+
+    Methods:
+        - in_chain: элементы версии с учётом элементов её родительских версий
+        - in_version: то же по идентификатору версии
+    """
+
+    def in_chain(self, chain):
+        """
+        Возвращает элементы версии chain[0], собранные по цепочке версий chain (см. ReferenceVersionQuerySet.chain).
+        Производная версия хранит только отличия от родительской: элемент берётся из ближайшей версии цепочки,
+        в которой есть его код, а отметки удаления (removed) скрывают коды родительских версий.
+        Для версии без родительской это простой фильтр по версии.
+        """
+        if len(chain) == 1:
+            return self.filter(version_id=chain[0])
+        condition = models.Q(version_id=chain[0])
+        for depth in range(1, len(chain)):
+            overridden = ReferenceElement.objects.filter(version_id__in=chain[:depth], code=models.OuterRef('code'))
+            condition |= models.Q(version_id=chain[depth]) & ~models.Exists(overridden)
+        return self.filter(condition, removed=False)
+
+    def in_version(self, version_id, versions=None):
+        """
+        Возвращает элементы версии version_id с учётом родительских версий.
+
+        :argument:
+            version_id (int): идентификатор версии
+            versions (iterable, optional): версии справочника с атрибутами id и parent_id, см. ReferenceVersionQuerySet.chain
+        """
+        return self.in_chain(ReferenceVersion.objects.chain(version_id, versions))
+
 
 class Reference(models.Model):
     """
@@ -11,14 +142,25 @@ class Reference(models.Model):
         - code (CharField): уникальный код справочника
         - name (CharField): наименование справочника
         - description (TextField): описание справочника
+        - current_version (ForeignKey): версия, действующая на текущую дату (денормализация, см. refresh_current_version)
+        - next_switch_date (DateField): дата начала действия следующей версии, когда current_version нужно сменить
 
     Методы:
         - __str__: возвращает наименование справочника
         - get_current_version: возвращает текущую версию справочника
+        - refresh_current_version: пересчитывает current_version и next_switch_date
+        - get_version_on_date: возвращает версию справочника, действующую на указанную дату
     """
     code = models.CharField(max_length=100, unique=True, verbose_name='Уникальный код справочника')
     name = models.CharField(max_length=300, verbose_name='Наименование справочника')
     description = models.TextField(verbose_name='Описание справочника')
+    current_version = models.ForeignKey('ReferenceVersion', null=True, blank=True, editable=False,
+                                        on_delete=models.SET_NULL, related_name='+',
+                                        verbose_name='Текущая версия')
+    next_switch_date = models.DateField(null=True, blank=True, editable=False,
+                                        verbose_name='Дата смены текущей версии')
+
+    objects = ReferenceQuerySet.as_manager()
 
     def __str__(self):
         return f'{self.name} {self.code}'
@@ -26,18 +168,48 @@ class Reference(models.Model):
     def get_current_version(self):
         """
         Возвращает текущую версию справочника.
+        Указатель current_version поддерживается при сохранении версий (reference.signals) и сдвигается
+        командой refresh_current_versions; если дата смены версии уже наступила, он пересчитывается здесь же.
+        Если указатель загружен через select_related('current_version'), версия берётся из него без запросов
+        к базе, иначе — из кэша версий (reference.cache).
 
         :returns:
             - версия справочника (ReferenceVersion), если версия существует и её дата начала действия меньше или равна текущей дате
             - None, если версия не существует или её дата начала действия больше текущей даты
         """
-        versions = ReferenceVersion.objects.filter(
-            reference=self, start_date__lte=datetime.date.today()
-        ).order_by('-start_date')
-        if versions.exists():
-            return versions.first()
-        else:
+        today = datetime.date.today()
+        if self.next_switch_date is not None and self.next_switch_date <= today:
+            self.refresh_current_version(today)
+        elif Reference.current_version.is_cached(self):
+            return self.current_version
+        return self.get_version_on_date(today)
+
+    def refresh_current_version(self, today=None):
+        """
+        Пересчитывает current_version и next_switch_date справочника в базе и в данном объекте.
+        """
+        Reference.objects.filter(pk=self.pk).refresh_current_versions(today)
+        self.refresh_from_db(fields=['current_version', 'next_switch_date'])
+
+    def get_version_on_date(self, date):
+        """
+        Возвращает версию справочника, действующую на указанную дату.
+        Версии справочника берутся из кэша (reference.cache), поэтому при попадании запросов к базе нет.
+
+        :argument:
+            date (date): дата, на которую нужно определить версию
+
+        :returns:
+            - версия справочника (ReferenceVersion) с наибольшей датой начала действия, не превышающей date
+            - None, если такой версии нет
+        """
+        from .cache import element_cache, find_version_on_date
+
+        found = find_version_on_date(element_cache.get_versions(self.pk), date)
+        if found is None:
             return None
+        return ReferenceVersion(id=found.id, reference=self, version=found.version, start_date=found.start_date,
+                                parent_id=found.parent_id, revision=found.revision, updated_at=found.updated_at)
 
     class Meta:
         verbose_name = 'Справочник'
@@ -52,25 +224,56 @@ class ReferenceVersion(models.Model):
         - reference (ForeignKey): ссылка на справочник
         - version (CharField): версия справочника
         - start_date (DateField): дата начала действия версии
+        - parent (ForeignKey): версия, от которой создана данная версия как набор изменений (см. reference.versioning);
+          элементы родительской версии, не изменённые и не удалённые в данной, принадлежат и ей
+        - revision (PositiveIntegerField): счётчик изменений версии, увеличивается при каждом изменении её элементов
+          только запросом UPDATE с F('revision') + 1 (reference.signals) и не записывается обычным save()
+        - updated_at (DateTimeField): время последнего изменения версии или её элементов
 
     Meta:
-        - unique_together: уникальность записей по комбинации полей reference и start_date
+        - unique_together: уникальность записей по комбинациям полей reference и start_date, reference и version.
+          Индекс (reference, start_date) используется и для выбора версии на дату в обоих направлениях сортировки
 
     Методы:
         - __str__: возвращает версию справочника
+        - save: сохраняет версию, не перезаписывая ревизию у существующей записи
+        - clean: проверяет, что родительская версия относится к тому же справочнику
     """
     reference = models.ForeignKey(Reference, on_delete=models.CASCADE, verbose_name='Внешний ключ на справочник')
     version = models.CharField(max_length=50, verbose_name='Версия справочника')
     start_date = models.DateField(verbose_name='Дата начала действия версии')
+    parent = models.ForeignKey('self', null=True, blank=True, on_delete=models.SET_NULL, related_name='children',
+                               verbose_name='Родительская версия')
+    revision = models.PositiveIntegerField(default=1, editable=False, verbose_name='Ревизия версии')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Время последнего изменения')
+
+    objects = ReferenceVersionQuerySet.as_manager()
 
     class Meta:
-        unique_together = ('reference', 'start_date')
+        unique_together = (('reference', 'start_date'), ('reference', 'version'))
         verbose_name = 'Версия справочника'
         verbose_name_plural = 'Версии справочников'
 
     def __str__(self):
         return self.version
 
+    def save(self, *args, update_fields=None, **kwargs):
+        """
+        Сохраняет версию справочника. У существующей записи ревизия исключается из обновляемых полей,
+        чтобы сохранение устаревшего объекта не вернуло счётчику прежнее значение.
+        """
+        if not self._state.adding and not kwargs.get('force_insert'):
+            if update_fields is None:
+                deferred = self.get_deferred_fields()
+                update_fields = [field.name for field in self._meta.concrete_fields
+                                 if not field.primary_key and field.attname not in deferred]
+            update_fields = [name for name in update_fields if name != 'revision']
+        super().save(*args, update_fields=update_fields, **kwargs)
+
+    def clean(self):
+        if self.parent_id is not None and self.parent.reference_id != self.reference_id:
+            raise ValidationError({'parent': 'Родительская версия должна относиться к тому же справочнику'})
+
 
 class ReferenceElement(models.Model):
     """
@@ -80,22 +283,86 @@ class ReferenceElement(models.Model):
         - version (ForeignKey): ссылка на версию справочника
         - code (CharField): код элемента справочника
         - value (CharField): значение элемента справочника
+        - removed (BooleanField): отметка удаления кода родительской версии в производной версии;
+          такие записи есть только у версий с родительской и в элементы версии не входят
+
+    Элементы производной версии собираются по цепочке родительских версий (ReferenceElementQuerySet.in_version):
+    запросы элементов версии должны использовать in_version, а не фильтр по version.
 
     Meta:
         - unique_together: уникальность записей по комбинации полей version и code
+        - indexes: покрывающий индекс (version, code, value) для проверки элементов и построения индекса версии
+          без чтения таблицы
 
     Методы:
         - __str__: возвращает код элемента справочника
+        - from_db: запоминает код, с которым элемент загружен из базы (для журнала изменений, reference.signals)
     """
     version = models.ForeignKey(ReferenceVersion, on_delete=models.CASCADE,
                                 verbose_name='Внешний ключ на версию справочника')
     code = models.CharField(max_length=100, verbose_name='Код элемента справочника')
     value = models.CharField(max_length=300, verbose_name='Значение элемента справочника')
+    removed = models.BooleanField(default=False, editable=False, verbose_name='Удалён из родительской версии')
+
+    objects = ReferenceElementQuerySet.as_manager()
 
     class Meta:
         unique_together = ('version', 'code')
+        indexes = [models.Index(fields=['version', 'code', 'value'], name='reference_element_lookup')]
         verbose_name = 'Элемент справочника'
         verbose_name_plural = 'Элементы справочника'
 
     def __str__(self):
         return self.code
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'code' in instance.__dict__:
+            instance._loaded_code = instance.code
+        return instance
+
+
+class ReferenceChange(models.Model):
+    """
+    Запись журнала изменений справочника (только добавление), по которому клиенты синхронизируют
+    локальные копии справочников (reference.changelog). Идентификатор записи — монотонно растущий
+    номер изменения, который служит курсором синхронизации.
+
+    Fields:
+        - reference (ForeignKey): ссылка на справочник
+        - version_id (BigIntegerField): идентификатор версии (без внешнего ключа: записи об удалённых версиях сохраняются)
+        - version (CharField): номер версии
+        - operation (CharField): insert, update или delete
+        - code (CharField): код элемента; пусто для изменений самой версии
+        - value (CharField): значение элемента после изменения
+        - start_date (DateField): дата начала действия версии (для изменений версии)
+        - parent (CharField): номер родительской версии, если версия создана как набор изменений
+        - created_at (DateTimeField): время изменения
+
+    Meta:
+        - indexes: индекс (reference, id) для выборки изменений справочника после курсора
+    """
+    INSERT = 'insert'
+    UPDATE = 'update'
+    DELETE = 'delete'
+    OPERATIONS = [(INSERT, 'Добавление'), (UPDATE, 'Изменение'), (DELETE, 'Удаление')]
+
+    reference = models.ForeignKey(Reference, on_delete=models.CASCADE, related_name='changes',
+                                  db_index=False, verbose_name='Внешний ключ на справочник')
+    version_id = models.BigIntegerField(verbose_name='Идентификатор версии справочника')
+    version = models.CharField(max_length=50, verbose_name='Версия справочника')
+    operation = models.CharField(max_length=10, choices=OPERATIONS, verbose_name='Операция')
+    code = models.CharField(max_length=100, null=True, blank=True, verbose_name='Код элемента справочника')
+    value = models.CharField(max_length=300, null=True, blank=True, verbose_name='Значение элемента справочника')
+    start_date = models.DateField(null=True, blank=True, verbose_name='Дата начала действия версии')
+    parent = models.CharField(max_length=50, null=True, blank=True, verbose_name='Родительская версия')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Время изменения')
+
+    class Meta:
+        indexes = [models.Index(fields=['reference', 'id'], name='reference_change_cursor')]
+        verbose_name = 'Изменение справочника'
+        verbose_name_plural = 'Журнал изменений справочников'
+
+    def __str__(self):
+        return f'{self.operation} {self.version} {self.code or ""}'.strip()
@@ -0,0 +1,191 @@
+"""
+Уведомления о публикации версий справочников и о том, что версия стала текущей.
+
+События публикуются после фиксации транзакции и доставляются подписчикам асинхронных представлений
+(reference.async_views: поток Server-Sent Events и long polling) через брокер из настройки REFERENCE_EVENTS_URL:
+    не задана (memory://)    — в памяти процесса: для одного процесса (runserver, uvicorn без --workers) и тестов;
+                               события других процессов, например команды refresh_current_versions, не видны
+    file:///var/tmp/ref.events — файл событий, общий для всех процессов одного хоста
+
+Событие: {"seq", "event": "published" или "current", "refbook_id", "refbook", "version", "start_date"}.
+seq — курсор: клиент передаёт последний полученный seq, чтобы не пропустить события между подключениями.
+Курсор, которого брокер не выдавал (например, из файла событий до его пересоздания), не теряет события:
+брокер отдаёт события, начиная с ближайшего известного ему места.
+"""
+import asyncio
+import fcntl
+import json
+import os
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.db import transaction
+
+PUBLISHED = 'published'
+CURRENT = 'current'
+
+# Число последних событий, которые хранит брокер в памяти процесса
+MEMORY_BROKER_SIZE = 1000
+
+
+class InProcessBroker:
+    """
+    Брокер событий в памяти процесса. Публикация возможна из любого потока,
+    ожидание — из любой петли событий.
+
+    Номера событий начинаются с текущего времени в микросекундах, поэтому после перезапуска процесса
+    они больше выданных до перезапуска: курсор клиента не пропускает новые события.
+    Курсор больше текущего (выдан другим процессом) считается устаревшим — отдаются все хранимые события.
+    """
+
+    def __init__(self, size=MEMORY_BROKER_SIZE):
+        self._events = deque(maxlen=size)
+        self._seq = time.time_ns() // 1000
+        self._lock = threading.Lock()
+        self._waiters = set()
+
+    def publish(self, event):
+        with self._lock:
+            self._seq += 1
+            self._events.append({'seq': self._seq, **event})
+            waiters = list(self._waiters)
+        for loop, flag in waiters:
+            try:
+                loop.call_soon_threadsafe(flag.set)
+            except RuntimeError:
+                # Петля событий подписчика уже закрыта
+                pass
+
+    def cursor(self):
+        return self._seq
+
+    def events_after(self, since):
+        with self._lock:
+            if since > self._seq:
+                since = 0
+            return [event for event in self._events if event['seq'] > since]
+
+    async def wait(self, since, timeout):
+        """
+        Ждёт события после курсора since не дольше timeout секунд.
+
+        :returns:
+            список событий, пустой по истечении timeout
+        """
+        flag = asyncio.Event()
+        waiter = (asyncio.get_running_loop(), flag)
+        with self._lock:
+            self._waiters.add(waiter)
+        try:
+            # Проверка после регистрации: событие, опубликованное между ними, не потеряется
+            events = self.events_after(since)
+            if not events:
+                try:
+                    await asyncio.wait_for(flag.wait(), timeout)
+                except asyncio.TimeoutError:
+                    return []
+                events = self.events_after(since)
+            return events
+        finally:
+            with self._lock:
+                self._waiters.discard(waiter)
+
+
+class FileBroker:
+    """
+    Брокер событий в файле, общем для процессов одного хоста. События дописываются строками JSON
+    под блокировкой файла; курсор события — смещение конца его строки в файле.
+    Подписчики проверяют размер файла раз в poll_interval секунд.
+
+    Курсор приходит от клиента: смещение внутри строки сдвигается к началу следующей строки,
+    а смещение за концом файла (файл пересоздан) — к началу файла.
+    """
+    poll_interval = 0.5
+
+    def __init__(self, path):
+        self.path = path
+
+    def publish(self, event):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        line = (json.dumps(event, ensure_ascii=False, separators=(',', ':')) + '\n').encode()
+        with open(self.path, 'ab') as stream:
+            fcntl.flock(stream, fcntl.LOCK_EX)
+            try:
+                stream.write(line)
+                stream.flush()
+            finally:
+                fcntl.flock(stream, fcntl.LOCK_UN)
+
+    def cursor(self):
+        try:
+            return os.path.getsize(self.path)
+        except FileNotFoundError:
+            return 0
+
+    def events_after(self, since):
+        try:
+            with open(self.path, 'rb') as stream:
+                if since > os.fstat(stream.fileno()).st_size:
+                    since = 0
+                # Байт перед курсором показывает, начинается ли с курсора строка
+                start = max(since - 1, 0)
+                stream.seek(start)
+                data = stream.read()
+        except FileNotFoundError:
+            return []
+        if since:
+            line_start = data.find(b'\n') + 1
+            if not line_start:
+                return []
+            data = data[line_start:]
+            since = start + line_start
+        events = []
+        offset = since
+        # Последняя строка может быть ещё не дописана: берутся только завершённые
+        for line in data.splitlines(keepends=True):
+            if not line.endswith(b'\n'):
+                break
+            offset += len(line)
+            events.append({'seq': offset, **json.loads(line)})
+        return events
+
+    async def wait(self, since, timeout):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            if self.cursor() != since:
+                events = self.events_after(since)
+                if events:
+                    return events
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return []
+            await asyncio.sleep(min(self.poll_interval, remaining))
+
+
+def create_broker(url=None):
+    """
+    Создаёт брокер событий по URL (см. описание модуля).
+    """
+    if url and url.startswith('file://'):
+        return FileBroker(url[len('file://'):])
+    return InProcessBroker()
+
+
+broker = create_broker(getattr(settings, 'REFERENCE_EVENTS_URL', None))
+
+
+def version_event(event, refbook_id, refbook_code, version, start_date):
+    return {'event': event, 'refbook_id': refbook_id, 'refbook': refbook_code, 'version': version,
+            'start_date': start_date.isoformat()}
+
+
+def publish_on_commit(events):
+    """
+    Публикует события после фиксации текущей транзакции (при откате они не публикуются).
+    """
+    events = list(events)
+    if events:
+        transaction.on_commit(lambda: [broker.publish(event) for event in events])
@@ -0,0 +1,43 @@
+from collections import OrderedDict
+
+from django.conf import settings
+from rest_framework.pagination import CursorPagination, LimitOffsetPagination
+from rest_framework.response import Response
+
+
+class RefBookPagination(LimitOffsetPagination):
+    """
+    Пагинация списка справочников по параметрам limit и offset.
+    Включается только если в запросе передан limit, иначе список возвращается целиком.
+    """
+    max_limit = 1000
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('count', self.count),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('refbooks', data),
+        ]))
+
+
+class ElementCursorPagination(CursorPagination):
+    """
+    Keyset-пагинация элементов версии справочника по коду.
+
+    Код уникален в пределах версии (unique_together version, code), поэтому страница
+    выбирается условием code > <последний код> по индексу (version_id, code) без OFFSET,
+    и глубокие страницы стоят столько же, сколько первая. Курсор непрозрачен для клиента.
+    Включается, если в запросе передан cursor или limit.
+    """
+    ordering = 'code'
+    page_size = getattr(settings, 'REFERENCE_ELEMENTS_PAGE_SIZE', 1000)
+    page_size_query_param = 'limit'
+    max_page_size = getattr(settings, 'REFERENCE_ELEMENTS_MAX_PAGE_SIZE', 10000)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('elements', data),
+        ]))
@@ -0,0 +1,84 @@
+"""
+Маршрутизация запросов приложения reference между основной базой и репликами (REFERENCE_DATABASE_REPLICAS).
+
+Запись всегда идёт в основную базу. Чтение уходит на реплику только внутри replica_reads() —
+его включает ReplicaReadsMiddleware для запросов API только для чтения (GET, HEAD, OPTIONS вне админки).
+Чтение внутри транзакции и в блоке primary_reads() идёт в основную базу: так данные, которые кэшируются
+до следующей инвалидации (reference.cache), не берутся из отстающей реплики.
+
+Поэтому на реплики уходят только чтения мимо кэша: страницы элементов (cursor, limit), потоковая выдача,
+поиск, журнал изменений, сравнение версий и проверки элементов версий, индекс которых не помещается в кэш.
+Потоковый ответ читается после выхода из ReplicaReadsMiddleware, когда чтение с реплик уже выключено,
+поэтому reference.streaming выбирает базу (QuerySet.using) до возврата ответа.
+Заполнение кэша — версии, элементы, индексы версий и список справочников — всегда читает основную базу;
+при тёплом кэше таких чтений мало, но при холодном (перезапуск, смена текущей версии) вся их нагрузка
+приходится на основную базу, а не на реплики.
+"""
+import contextlib
+import contextvars
+import random
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+_replica_reads = contextvars.ContextVar('reference_replica_reads', default=False)
+
+
+def replicas():
+    """
+    Псевдонимы баз данных реплик из настройки REFERENCE_DATABASE_REPLICAS.
+    """
+    return getattr(settings, 'REFERENCE_DATABASE_REPLICAS', ())
+
+
+@contextlib.contextmanager
+def replica_reads(enabled=True):
+    """
+    Разрешает (или запрещает при enabled=False) чтение моделей reference с реплик в блоке with.
+    """
+    token = _replica_reads.set(enabled)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def primary_reads():
+    """
+    Читает из основной базы в блоке with, даже если чтение с реплик разрешено.
+    """
+    return replica_reads(False)
+
+
+class ReplicaRouter:
+    """
+    Маршрутизатор баз данных для моделей приложения reference; модели других приложений
+    он не трогает. Без настроенных реплик все запросы идут в основную базу.
+    """
+    app_label = 'reference'
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label != self.app_label or not _replica_reads.get():
+            return None
+        aliases = replicas()
+        if not aliases or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return random.choice(aliases)
+
+    def db_for_write(self, model, **hints):
+        # Объект, прочитанный с реплики, сохраняется в основную базу, а не туда, откуда он прочитан
+        if model._meta.app_label == self.app_label:
+            return DEFAULT_DB_ALIAS
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики содержат те же данные, что и основная база
+        if obj1._meta.app_label == self.app_label and obj2._meta.app_label == self.app_label:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схема реплик приходит вместе с репликацией
+        if db in replicas():
+            return False
+        return None
@@ -0,0 +1,109 @@
+"""
+Поиск элементов версии справочника по префиксу кода и по словам значения.
+
+Префикс кода ищется диапазоном code >= prefix AND code < prefix + U+10FFFF, который использует
+уникальный индекс (version_id, code). Слова значения ищутся по полнотекстовому индексу
+из миграции 0004_element_search: FTS5 в SQLite (с ранжированием bm25), триграммный индекс
+в PostgreSQL (с ранжированием по сходству слов). Последнее слово запроса ищется как префикс,
+что подходит для автодополнения.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .cache import element_cache
+from .models import ReferenceVersion, ReferenceElement
+
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_MAX_LIMIT = getattr(settings, 'REFERENCE_SEARCH_MAX_LIMIT', 100)
+
+_WORD = re.compile(r'\w+')
+_MAX_CODE_CHAR = '\U0010ffff'
+
+# Фильтры версии и кода применяются в том же запросе, что и MATCH, до ранжирования и LIMIT:
+# иначе совпадения других версий вытеснили бы элементы запрошенной версии
+_SQLITE_SEARCH = (
+    'SELECT e.code, e.value FROM reference_element_fts'
+    ' JOIN reference_referenceelement e ON e.id = reference_element_fts.rowid'
+    ' WHERE reference_element_fts MATCH %s AND {version_filter}{code_filter}'
+    ' ORDER BY reference_element_fts.rank, e.code LIMIT %s'
+)
+
+
+def search_words(query):
+    """
+    Разбивает поисковый запрос на слова.
+    """
+    return _WORD.findall(query or '')
+
+
+def _fts_match(words):
+    # Слова состоят только из букв и цифр, поэтому их можно заключить в кавычки без экранирования
+    return ' '.join([f'"{word}"' for word in words[:-1]] + [f'"{words[-1]}"*'])
+
+
+def value_filter(words):
+    """
+    Возвращает условие на элементы всех версий, значение которых содержит слова words (последнее — как префикс),
+    использующее полнотекстовый индекс. Используется поиском в административной панели.
+    """
+    if connection.vendor == 'sqlite':
+        return Q(id__in=RawSQL('SELECT rowid FROM reference_element_fts WHERE reference_element_fts MATCH %s',
+                               [_fts_match(words)]))
+    condition = Q()
+    for word in words:
+        condition &= Q(value__icontains=word)
+    return condition
+
+
+def search_elements(refbook_id, version_id, query=None, code_prefix=None, limit=SEARCH_DEFAULT_LIMIT):
+    """
+    Ищет элементы версии справочника.
+
+    В SQLite индекс FTS5 общий для всех версий: совпадения соединяются с элементами запрошенной версии
+    и только затем ранжируются по bm25 и ограничиваются limit. Для производной версии это элементы,
+    собранные по цепочке родительских версий (ReferenceElementQuerySet.in_chain).
+
+    :argument:
+        refbook_id (int): идентификатор справочника
+        version_id (int): идентификатор версии
+        query (str, optional): слова, которые должны встречаться в значении (последнее — как префикс)
+        code_prefix (str, optional): префикс кода
+        limit (int): максимальное число результатов
+
+    :returns:
+        список пар (код, значение): по релевантности, если задан query, иначе по коду
+    """
+    words = search_words(query)
+    if query and not words:
+        return []
+    code_range = (code_prefix, code_prefix + _MAX_CODE_CHAR) if code_prefix else None
+    chain = ReferenceVersion.objects.chain(version_id, element_cache.get_versions(refbook_id))
+    elements = ReferenceElement.objects.in_chain(chain)
+
+    if words and connection.vendor == 'sqlite':
+        if len(chain) == 1:
+            version_filter, version_params = 'e.version_id = %s', [version_id]
+        else:
+            sql, version_params = elements.values('id').query.sql_with_params()
+            version_filter = f'e.id IN ({sql})'
+        code_filter = ' AND e.code >= %s AND e.code < %s' if code_range else ''
+        with connection.cursor() as cursor:
+            cursor.execute(_SQLITE_SEARCH.format(version_filter=version_filter, code_filter=code_filter),
+                           [_fts_match(words), *version_params, *(code_range or ()), limit])
+            return cursor.fetchall()
+
+    queryset = elements
+    if code_range:
+        queryset = queryset.filter(code__gte=code_range[0], code__lt=code_range[1])
+    for word in words:
+        queryset = queryset.filter(value__icontains=word)
+    if words and connection.vendor == 'postgresql':
+        from django.contrib.postgres.search import TrigramWordSimilarity
+        queryset = queryset.annotate(rank=TrigramWordSimilarity(' '.join(words), 'value')).order_by('-rank', 'code')
+    else:
+        queryset = queryset.order_by('code')
+    return list(queryset.values_list('code', 'value')[:limit])
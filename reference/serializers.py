@@ -1,4 +1,9 @@
 from rest_framework import serializers
+from rest_framework.fields import empty
+from rest_framework.settings import api_settings
+from .changelog import SYNC_DEFAULT_LIMIT, SYNC_MAX_LIMIT
+from .importers import IMPORT_FORMATS
+from .search import SEARCH_DEFAULT_LIMIT, SEARCH_MAX_LIMIT
 from .models import Reference, ReferenceVersion, ReferenceElement
 
 
@@ -49,3 +54,139 @@ class ReferenceVersionSerializer(serializers.ModelSerializer):
     class Meta:
         model = ReferenceVersion
         fields = ['id', 'reference', 'version', 'start_date', 'elements']
+
+
+class CheckElementSerializer(serializers.Serializer):
+    """
+    Сериализатор пары код/значение для проверки элемента справочника
+    """
+    code = serializers.CharField(max_length=100)
+    value = serializers.CharField(max_length=300, allow_blank=True)
+
+
+class BulkCheckElementsSerializer(serializers.Serializer):
+    """
+    Сериализатор запроса пакетной проверки элементов справочника.
+    Версию можно указать либо явно (version), либо датой (date).
+    Если не указано ни то, ни другое, используется текущая версия.
+    """
+    elements = CheckElementSerializer(many=True, allow_empty=False)
+    version = serializers.CharField(max_length=50, required=False)
+    date = serializers.DateField(required=False)
+
+    def validate_elements(self, elements):
+        max_items = self.context.get('max_items')
+        if max_items is not None and len(elements) > max_items:
+            raise serializers.ValidationError(f'Ensure this field has no more than {max_items} elements.')
+        return elements
+
+    def validate(self, attrs):
+        if 'version' in attrs and 'date' in attrs:
+            raise serializers.ValidationError('Specify either version or date, not both.')
+        return attrs
+
+
+class RefbookImportSerializer(serializers.Serializer):
+    """
+    Сериализатор запроса загрузки новой версии справочника из файла
+    """
+    file = serializers.FileField()
+    version = serializers.CharField(max_length=50)
+    start_date = serializers.DateField()
+    format = serializers.ChoiceField(choices=IMPORT_FORMATS, required=False)
+
+
+class DeriveVersionSerializer(serializers.Serializer):
+    """
+    Сериализатор запроса публикации новой версии справочника как набора изменений
+    относительно родительской версии
+    """
+    parent_version = serializers.CharField(max_length=50)
+    version = serializers.CharField(max_length=50)
+    start_date = serializers.DateField()
+    added = CheckElementSerializer(many=True, required=False)
+    changed = CheckElementSerializer(many=True, required=False)
+    removed = serializers.ListField(child=serializers.CharField(max_length=100), required=False)
+
+
+class ElementSearchSerializer(serializers.Serializer):
+    """
+    Сериализатор параметров поиска элементов справочника.
+    Должен быть указан хотя бы один из параметров q и code.
+    """
+    q = serializers.CharField(max_length=300, required=False)
+    code = serializers.CharField(max_length=100, required=False)
+    version = serializers.CharField(max_length=50, required=False)
+    limit = serializers.IntegerField(min_value=1, max_value=SEARCH_MAX_LIMIT, default=SEARCH_DEFAULT_LIMIT)
+
+    def validate(self, attrs):
+        if not attrs.get('q') and not attrs.get('code'):
+            raise serializers.ValidationError('Specify q or code.')
+        return attrs
+
+
+class ChangesQuerySerializer(serializers.Serializer):
+    """
+    Сериализатор параметров запроса изменений справочника после курсора.
+    """
+    since = serializers.IntegerField(min_value=0, required=False)
+    limit = serializers.IntegerField(min_value=1, max_value=SYNC_MAX_LIMIT, default=SYNC_DEFAULT_LIMIT)
+
+
+class ValidateElementSerializer(CheckElementSerializer):
+    """
+    Сериализатор поля документа: код справочника и пара код/значение элемента
+    """
+    refbook_code = serializers.CharField(max_length=100)
+
+
+class FlatObjectListField(serializers.ListField):
+    """
+    Список объектов, все поля которых — строки (CharField сериализатора child).
+    Каждое значение проверяется run_validation соответствующего поля, но без вызова вложенного
+    сериализатора для каждого объекта, что в разы быстрее на длинных списках; результат и ошибки
+    те же, что у вложенного сериализатора.
+    """
+
+    def to_internal_value(self, data):
+        if not isinstance(data, list):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and not data:
+            self.fail('empty')
+        fields = self.child.fields
+        invalid = self.child.error_messages['invalid']
+        result = []
+        errors = {}
+        for position, item in enumerate(data):
+            if not isinstance(item, dict):
+                errors[position] = {api_settings.NON_FIELD_ERRORS_KEY: [invalid.format(datatype=type(item).__name__)]}
+                continue
+            validated = {}
+            item_errors = {}
+            for name, field in fields.items():
+                # run_validation поля: обрезка пробелов, null, blank, max_length и сообщения из error_messages
+                try:
+                    validated[name] = field.run_validation(item.get(name, empty))
+                except serializers.ValidationError as exc:
+                    item_errors[name] = exc.detail
+            if item_errors:
+                errors[position] = item_errors
+            result.append(validated)
+        if errors:
+            raise serializers.ValidationError(errors)
+        return result
+
+
+class ValidateDocumentSerializer(serializers.Serializer):
+    """
+    Сериализатор запроса проверки документа по нескольким справочникам.
+    Версии всех справочников определяются на дату date, по умолчанию на текущую дату.
+    """
+    elements = FlatObjectListField(child=ValidateElementSerializer(), allow_empty=False)
+    date = serializers.DateField(required=False)
+
+    def validate_elements(self, elements):
+        max_items = self.context.get('max_items')
+        if max_items is not None and len(elements) > max_items:
+            raise serializers.ValidationError(f'Ensure this field has no more than {max_items} elements.')
+        return elements
@@ -0,0 +1,142 @@
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import changelog, metrics, notifications, snapshots, versioning
+from .cache import element_cache, invalidate_on_commit
+from .models import Reference, ReferenceChange, ReferenceVersion, ReferenceElement
+
+
+@receiver([post_save, post_delete], sender=Reference)
+def invalidate_reference(sender, instance, **kwargs):
+    invalidate_on_commit(element_cache.invalidate_refbook, instance.pk)
+
+
+@receiver(post_save, sender=ReferenceVersion)
+def notify_version_published(sender, instance, created, raw, **kwargs):
+    # Подключён раньше invalidate_reference_version: событие published приходит до события current
+    if created and not raw:
+        notifications.publish_on_commit([notifications.version_event(
+            notifications.PUBLISHED, instance.reference_id, instance.reference.code,
+            instance.version, instance.start_date)])
+
+
+@receiver(pre_delete, sender=ReferenceVersion)
+def materialize_version_children(sender, instance, origin, **kwargs):
+    # Производные версии хранят только отличия от удаляемой версии: перед удалением они получают
+    # унаследованные элементы. При удалении справочника удаляются и производные версии
+    if not changelog.deleted_with(origin, Reference):
+        versioning.materialize_children(instance)
+
+
+@receiver([post_save, post_delete], sender=ReferenceVersion)
+def invalidate_reference_version(sender, instance, **kwargs):
+    # Новая версия, изменение даты начала или удаление версии может сменить текущую версию справочника
+    Reference.objects.filter(pk=instance.reference_id).refresh_current_versions()
+    invalidate_on_commit(element_cache.invalidate_refbook, instance.reference_id)
+    invalidate_on_commit(element_cache.invalidate_version, instance.pk)
+    if kwargs['signal'] is post_delete:
+        snapshots.schedule_remove(instance.pk)
+    else:
+        snapshots.schedule_rebuild(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=ReferenceVersion)
+def log_reference_version(sender, instance, **kwargs):
+    if kwargs['signal'] is post_delete:
+        # Версия удаляется вместе со справочником — записи журнала удаляются тоже
+        if not changelog.deleted_with(kwargs['origin'], Reference):
+            changelog.record(instance.reference_id, [changelog.version_change(instance, ReferenceChange.DELETE)])
+    elif not kwargs['raw']:
+        operation = ReferenceChange.INSERT if kwargs['created'] else ReferenceChange.UPDATE
+        changelog.record(instance.reference_id, [changelog.version_change(instance, operation)])
+
+
+@receiver(pre_save, sender=ReferenceElement)
+def remember_element_code(sender, instance, raw, update_fields, **kwargs):
+    # Для журнала изменений: при смене кода элемента прежний код записывается как удалённый.
+    # Код из базы известен, если элемент загружен из неё (ReferenceElement.from_db) или уже сохранялся
+    if instance._state.adding or raw:
+        return
+    if hasattr(instance, '_loaded_code'):
+        instance._saved_code = instance._loaded_code
+    elif update_fields is not None and 'code' not in update_fields:
+        instance._saved_code = instance.code
+    else:
+        instance._saved_code = ReferenceElement.objects.filter(pk=instance.pk).values_list('code', flat=True).first()
+
+
+@receiver([post_save, post_delete], sender=ReferenceElement)
+def invalidate_reference_element(sender, instance, **kwargs):
+    # При удалении версии или справочника кэш, ревизию, снимок и журнал обрабатывают сигналы версии
+    if kwargs['signal'] is post_delete and changelog.deleted_with(kwargs['origin'], (ReferenceVersion, Reference)):
+        return
+    if ReferenceElement.version.is_cached(instance):
+        refbook_id, version = instance.version.reference_id, instance.version.version
+    else:
+        refbook_id, version = ReferenceVersion.objects.filter(
+            pk=instance.version_id
+        ).values_list('reference_id', 'version').first() or (None, None)
+    if refbook_id is not None:
+        schedule_version_change(refbook_id, instance.version_id)
+        snapshots.schedule_rebuild(instance.version_id)
+        log_element_change(refbook_id, version, instance, kwargs)
+
+
+def schedule_version_change(refbook_id, version_id):
+    """
+    Изменение элементов меняет содержимое версии: кэш версии инвалидируется сразу, а после фиксации
+    транзакции увеличивается ревизия версии (используется в ETag) и кэш инвалидируется повторно.
+    Несколько изменений элементов одной версии в транзакции приводят к одному увеличению ревизии.
+    Версии, созданные от изменённой (reference.versioning), наследуют её элементы: их ревизия увеличивается
+    тем же запросом, а снимки перестраиваются.
+    """
+    element_cache.invalidate_version(version_id, refbook_id)
+    # Отложенные функции транзакции (при откате Django удаляет их сам)
+    if any(getattr(item[1], 'revision_version_id', None) == version_id
+           for item in transaction.get_connection().run_on_commit):
+        return
+
+    def changed():
+        changed.revision_version_id = None
+        descendants = ReferenceVersion.objects.descendants(version_id)
+        ReferenceVersion.objects.filter(pk__in=[version_id, *descendants]).update(
+            revision=F('revision') + 1, updated_at=timezone.now())
+        element_cache.invalidate_version(version_id, refbook_id)
+        for descendant in descendants:
+            snapshots.schedule_rebuild(descendant)
+
+    changed.revision_version_id = version_id
+    transaction.on_commit(changed)
+
+
+def log_element_change(refbook_id, version, instance, kwargs):
+    if kwargs['signal'] is post_delete:
+        # При удалении версии или справочника достаточно записи об удалении версии
+        if changelog.deleted_with(kwargs['origin'], ReferenceElement):
+            changelog.record(refbook_id, [changelog.element_change(
+                instance.version_id, version, ReferenceChange.DELETE, instance.code)])
+        return
+    if kwargs['raw']:
+        return
+    changes = []
+    saved_code = getattr(instance, '_saved_code', None)
+    update_fields = kwargs['update_fields']
+    instance._loaded_code = saved_code if update_fields is not None and 'code' not in update_fields else instance.code
+    if kwargs['created'] or saved_code is None:
+        operation = ReferenceChange.INSERT
+    elif saved_code != instance.code:
+        changes.append(changelog.element_change(instance.version_id, version, ReferenceChange.DELETE, saved_code))
+        operation = ReferenceChange.INSERT
+    else:
+        operation = ReferenceChange.UPDATE
+    changes.append(changelog.element_change(instance.version_id, version, operation, instance.code, instance.value))
+    changelog.record(refbook_id, changes)
+
+
+@receiver(connection_created)
+def install_query_metrics(sender, connection, **kwargs):
+    metrics.install_query_wrapper(connection)
@@ -0,0 +1,307 @@
+"""
+Снимки опубликованных версий справочников в неизменяемых двоичных файлах.
+
+Снимок версии — файл <REFERENCE_SNAPSHOT_DIR>/<id версии>.snap, который процессы открывают через mmap:
+все воркеры разделяют одни и те же страницы в кэше ОС, открытие не требует загрузки данных,
+а чтение элементов и их проверка не обращаются к ORM. Формат файла:
+
+    заголовок HEADER: сигнатура, порядок байтов, id версии, ревизия, число элементов,
+                      размеры буферов кодов и значений
+    code_offsets:  uint64[count + 1] — границы кодов в буфере кодов
+    value_offsets: uint64[count + 1] — границы значений в буфере значений
+    order:         uint64[count]     — номера элементов в порядке возрастания кода (UTF-8)
+    буфер кодов и буфер значений в UTF-8
+
+Элементы записаны в порядке id, как их отдаёт API, а поиск по коду — двоичный по массиву order.
+Снимок действителен, пока его ревизия совпадает с ReferenceVersion.revision; после изменения версии
+снимок перестраивается после фиксации транзакции и атомарно заменяется (os.replace).
+"""
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import threading
+from array import array
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .cache import element_cache
+from .models import ReferenceVersion, ReferenceElement
+
+HEADER = struct.Struct('<6s2sQQQQQ')
+MAGIC = b'RSNAP1'
+BYTEORDER = b'LE' if sys.byteorder == 'little' else b'BE'
+SUFFIX = '.snap'
+
+
+def snapshot_dir():
+    """
+    Каталог снимков из настройки REFERENCE_SNAPSHOT_DIR или None, если снимки отключены.
+    """
+    return getattr(settings, 'REFERENCE_SNAPSHOT_DIR', None)
+
+
+def snapshot_path(version_id, directory=None):
+    return os.path.join(directory or snapshot_dir(), f'{version_id}{SUFFIX}')
+
+
+class SnapshotError(ValueError):
+    """
+    Файл снимка повреждён или записан в другом формате.
+    """
+
+
+class VersionSnapshot:
+    """
+    Снимок версии справочника, открытый через mmap. Предоставляет тот же интерфейс проверки,
+    что и reference.index.ElementIndex.
+
+    Fields:
+        version_id (int): идентификатор версии
+        revision (int): ревизия версии, для которой построен снимок
+    Methods:
+        get(code): значение элемента с кодом code или None
+        contains(code, value): есть ли элемент с кодом code и значением value
+        contains_many(pairs): contains для каждой пары (код, значение)
+        items(): пары (код, значение) в порядке id элементов
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as stream:
+            self._mmap = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._mmap) < HEADER.size:
+            raise SnapshotError(f'{path}: file is too short')
+        magic, byteorder, self.version_id, self.revision, self.count, codes_size, values_size = \
+            HEADER.unpack_from(self._mmap)
+        if magic != MAGIC or byteorder != BYTEORDER:
+            raise SnapshotError(f'{path}: not a snapshot file for this platform')
+
+        view = memoryview(self._mmap)
+        position = HEADER.size
+        arrays = []
+        for length in (self.count + 1, self.count + 1, self.count):
+            arrays.append(view[position:position + 8 * length].cast('Q'))
+            position += 8 * length
+        self._code_offsets, self._value_offsets, self._order = arrays
+        self._codes_start = position
+        self._values_start = position + codes_size
+        if self._values_start + values_size != len(self._mmap):
+            raise SnapshotError(f'{path}: unexpected file size')
+
+    def _code(self, position):
+        start = self._codes_start
+        return self._mmap[start + self._code_offsets[position]:start + self._code_offsets[position + 1]]
+
+    def _value(self, position):
+        start = self._values_start
+        return self._mmap[start + self._value_offsets[position]:start + self._value_offsets[position + 1]]
+
+    def _find(self, key):
+        order = self._order
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self._code(order[middle]) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.count and self._code(order[low]) == key:
+            return order[low]
+        return None
+
+    def get(self, code):
+        position = self._find(code.encode())
+        return None if position is None else self._value(position).decode()
+
+    def contains(self, code, value):
+        if code is None or value is None:
+            return False
+        position = self._find(code.encode())
+        return position is not None and self._value(position) == value.encode()
+
+    def contains_many(self, pairs):
+        return [self.contains(code, value) for code, value in pairs]
+
+    def items(self):
+        for position in range(self.count):
+            yield self._code(position).decode(), self._value(position).decode()
+
+    def __len__(self):
+        return self.count
+
+
+def write_snapshot(version_id, revision, rows, directory=None):
+    """
+    Записывает снимок версии справочника во временный файл и атомарно заменяет им прежний.
+
+    :argument:
+        version_id (int): идентификатор версии
+        revision (int): ревизия версии
+        rows (iterable): пары (код, значение) в порядке id элементов
+        directory (str, optional): каталог снимков, по умолчанию REFERENCE_SNAPSHOT_DIR
+
+    :returns:
+        путь к файлу снимка
+    """
+    directory = directory or snapshot_dir()
+    os.makedirs(directory, exist_ok=True)
+    codes, values = [], []
+    for code, value in rows:
+        codes.append(code.encode())
+        values.append(value.encode())
+    order = array('Q', sorted(range(len(codes)), key=codes.__getitem__))
+
+    def offsets(items):
+        result = array('Q', [0])
+        total = 0
+        for item in items:
+            total += len(item)
+            result.append(total)
+        return result
+
+    code_offsets, value_offsets = offsets(codes), offsets(values)
+    fd, temporary = tempfile.mkstemp(prefix=f'.{version_id}-', suffix=SUFFIX, dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as stream:
+            stream.write(HEADER.pack(MAGIC, BYTEORDER, version_id, revision, len(codes),
+                                     code_offsets[-1], value_offsets[-1]))
+            stream.write(code_offsets.tobytes())
+            stream.write(value_offsets.tobytes())
+            stream.write(order.tobytes())
+            stream.writelines(codes)
+            stream.writelines(values)
+            stream.flush()
+            os.fsync(stream.fileno())
+        os.replace(temporary, snapshot_path(version_id, directory))
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+    return snapshot_path(version_id, directory)
+
+
+def build_snapshot(version_id, directory=None):
+    """
+    Строит снимок версии справочника по данным из базы.
+    В снимок производной версии входят и элементы, унаследованные от родительских версий.
+
+    :returns:
+        путь к файлу снимка или None, если версии нет
+    """
+    with transaction.atomic():
+        revision = ReferenceVersion.objects.filter(pk=version_id).values_list('revision', flat=True).first()
+        if revision is None:
+            return None
+        rows = ReferenceElement.objects.in_version(version_id).order_by('id').values_list(
+            'code', 'value').iterator(chunk_size=5000)
+        return write_snapshot(version_id, revision, rows, directory)
+
+
+def remove_snapshot(version_id, directory=None):
+    try:
+        os.remove(snapshot_path(version_id, directory))
+    except FileNotFoundError:
+        pass
+
+
+class SnapshotRegistry:
+    """
+    Открытые снимки в памяти процесса. Файл снимка переоткрывается, если он был заменён
+    (изменились inode, размер или время изменения).
+    """
+
+    def __init__(self):
+        self._snapshots = {}
+        self._lock = threading.Lock()
+
+    def open(self, version_id, revision):
+        """
+        Возвращает снимок версии с ревизией revision или None, если снимка нет или он устарел.
+        """
+        directory = snapshot_dir()
+        if directory is None:
+            return None
+        path = snapshot_path(version_id, directory)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        key = (path, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        entry = self._snapshots.get(version_id)
+        if entry is None or entry[0] != key:
+            try:
+                entry = (key, VersionSnapshot(path))
+            except (OSError, ValueError):
+                return None
+            with self._lock:
+                self._snapshots[version_id] = entry
+        snapshot = entry[1]
+        return snapshot if snapshot.revision == revision else None
+
+    def clear(self):
+        with self._lock:
+            self._snapshots.clear()
+
+
+snapshots = SnapshotRegistry()
+
+
+def element_index(refbook_id, refbook_version):
+    """
+    Возвращает объект для проверки элементов версии: снимок, если он актуален,
+    иначе компактный индекс из кэша элементов.
+    """
+    snapshot = snapshots.open(refbook_version.id, refbook_version.revision)
+    if snapshot is not None:
+        return snapshot
+    return element_cache.get_index(refbook_id, refbook_version.id)
+
+
+async def aelement_index(refbook_id, refbook_version):
+    """
+    Асинхронный вариант element_index.
+    """
+    snapshot = snapshots.open(refbook_version.id, refbook_version.revision)
+    if snapshot is not None:
+        return snapshot
+    return await element_cache.aget_index(refbook_id, refbook_version.id)
+
+
+def element_items(refbook_id, refbook_version):
+    """
+    Возвращает пары (код, значение) элементов версии в порядке id: из снимка, если он актуален,
+    иначе из кэша элементов.
+    """
+    snapshot = snapshots.open(refbook_version.id, refbook_version.revision)
+    if snapshot is not None:
+        return snapshot.items()
+    return element_cache.get_elements(refbook_id, refbook_version.id).items()
+
+
+def schedule_rebuild(version_id):
+    """
+    Перестраивает снимок версии после фиксации текущей транзакции.
+    Несколько изменений одной версии в транзакции приводят к одной перестройке.
+    """
+    if snapshot_dir() is None:
+        return
+    # Отложенные функции транзакции (при откате Django удаляет их сам)
+    if any(getattr(item[1], 'snapshot_version_id', None) == version_id for item in connection.run_on_commit):
+        return
+
+    def rebuild():
+        build_snapshot(version_id)
+
+    rebuild.snapshot_version_id = version_id
+    transaction.on_commit(rebuild)
+
+
+def schedule_remove(version_id):
+    """
+    Удаляет снимок версии после фиксации текущей транзакции.
+    """
+    if snapshot_dir() is not None:
+        directory = snapshot_dir()
+        transaction.on_commit(lambda: remove_snapshot(version_id, directory))
@@ -0,0 +1,174 @@
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import router
+from django.http import StreamingHttpResponse
+from rest_framework.fields import BooleanField
+
+from .models import ReferenceVersion, ReferenceElement
+
+STREAM_CHUNK_SIZE = getattr(settings, 'REFERENCE_STREAM_CHUNK_SIZE', 2000)
+
+JSON_CONTENT_TYPE = 'application/json; charset=utf-8'
+NDJSON_CONTENT_TYPE = 'application/x-ndjson; charset=utf-8'
+
+
+def stream_format(value):
+    """
+    Разбирает параметр stream запроса элементов.
+
+    :argument:
+        value (str or None): значение параметра: ndjson, логическое «да» (1, true, yes, on)
+            или «нет» (0, false, no, off, пустая строка)
+
+    :returns:
+        'ndjson', 'json' или None, если элементы не нужно отдавать потоком
+
+    Raises: ValueError:
+    В случае значения, которое не является ни ndjson, ни логическим.
+    """
+    if value is None or value == '':
+        return None
+    if value == 'ndjson':
+        return 'ndjson'
+    if value in BooleanField.TRUE_VALUES:
+        return 'json'
+    if value in BooleanField.FALSE_VALUES:
+        return None
+    raise ValueError(value)
+
+
+def _dumps(code, value):
+    return json.dumps({'code': code, 'value': value}, ensure_ascii=False, separators=(',', ':'))
+
+
+class ElementsEncoder:
+    """
+    Кодирует поток пар (код, значение) в JSON-документ {"elements": [...]} или в NDJSON
+    частями по chunk_size элементов. Используется синхронными и асинхронными генераторами.
+    """
+
+    def __init__(self, ndjson=False, chunk_size=STREAM_CHUNK_SIZE):
+        self.ndjson = ndjson
+        self.chunk_size = chunk_size
+        self.buffer = []
+        self.separator = ''
+
+    def start(self):
+        return '' if self.ndjson else '{"elements":['
+
+    def feed(self, code, value):
+        """
+        Добавляет элемент, возвращает очередную часть ответа или None, если буфер ещё не заполнен.
+        """
+        if self.ndjson:
+            self.buffer.append(_dumps(code, value) + '\n')
+        else:
+            self.buffer.append(self.separator + _dumps(code, value))
+            self.separator = ','
+        if len(self.buffer) >= self.chunk_size:
+            return self.flush()
+        return None
+
+    def flush(self):
+        chunk = ''.join(self.buffer)
+        self.buffer = []
+        return chunk
+
+    def finish(self):
+        return self.flush() + ('' if self.ndjson else ']}')
+
+
+def iter_element_rows(version_id, chunk_size=STREAM_CHUNK_SIZE, versions=None):
+    """
+    Итерирует пары (код, значение) элементов версии справочника серверным курсором,
+    не создавая экземпляров моделей и не загружая всю версию в память.
+    Элементы производной версии собираются по цепочке родительских версий; versions — версии справочника
+    (VersionInfo из кэша), по которым определяется цепочка, иначе она читается из базы.
+
+    Потоковый ответ читается уже после выхода из ReplicaReadsMiddleware, поэтому база для чтения
+    (реплика, reference.routers) выбирается при вызове, а не при первом чтении.
+    """
+    if version_id is None:
+        return iter(())
+    using = router.db_for_read(ReferenceElement)
+    return ReferenceElement.objects.using(using).in_version(version_id, versions).order_by('id').values_list(
+        'code', 'value').iterator(chunk_size=chunk_size)
+
+
+async def aiter_element_rows(version_id, chunk_size=STREAM_CHUNK_SIZE, versions=None, using=None):
+    """
+    Асинхронный вариант iter_element_rows на асинхронном ORM.
+    Элементы читаются порциями по chunk_size с условием id > <последний id>,
+    поэтому каждая порция — короткий запрос по индексу, а память не зависит от размера версии.
+    Тело генератора выполняется при чтении ответа, поэтому базу для чтения (using) выбирает вызывающий код.
+    """
+    if version_id is None:
+        return
+    if versions is None:
+        chain = await sync_to_async(ReferenceVersion.objects.using(using).chain)(version_id)
+    else:
+        chain = ReferenceVersion.objects.chain(version_id, versions)
+    queryset = ReferenceElement.objects.using(using).in_chain(chain).order_by('id')
+    last_id = 0
+    while True:
+        rows = [row async for row in queryset.filter(id__gt=last_id).values_list('id', 'code', 'value')[:chunk_size]]
+        for _, code, value in rows:
+            yield code, value
+        if len(rows) < chunk_size:
+            break
+        last_id = rows[-1][0]
+
+
+def _iter_encoded(rows, encoder):
+    yield encoder.start()
+    for code, value in rows:
+        chunk = encoder.feed(code, value)
+        if chunk is not None:
+            yield chunk
+    yield encoder.finish()
+
+
+async def _aiter_encoded(rows, encoder):
+    yield encoder.start()
+    async for code, value in rows:
+        chunk = encoder.feed(code, value)
+        if chunk is not None:
+            yield chunk
+    yield encoder.finish()
+
+
+def iter_json(rows, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Формирует документ {"elements": [...]} по частям, по chunk_size элементов в каждой.
+    """
+    return _iter_encoded(rows, ElementsEncoder(chunk_size=chunk_size))
+
+
+def iter_ndjson(rows, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Формирует NDJSON: по одному объекту {"code", "value"} на строку.
+    """
+    return _iter_encoded(rows, ElementsEncoder(ndjson=True, chunk_size=chunk_size))
+
+
+def stream_elements(version_id, ndjson=False, rows=None, versions=None):
+    """
+    Возвращает потоковый ответ с элементами версии справочника в формате JSON или NDJSON.
+    Потребление памяти не зависит от размера версии.
+    Если передан rows (например, элементы снимка версии), элементы берутся из него, а не из базы.
+    """
+    if rows is None:
+        rows = iter_element_rows(version_id, versions=versions)
+    content = _iter_encoded(rows, ElementsEncoder(ndjson=ndjson))
+    return StreamingHttpResponse(content, content_type=NDJSON_CONTENT_TYPE if ndjson else JSON_CONTENT_TYPE)
+
+
+def astream_elements(version_id, ndjson=False, versions=None):
+    """
+    Асинхронный вариант stream_elements для ASGI: элементы читаются асинхронным итератором ORM.
+    """
+    rows = aiter_element_rows(version_id, versions=versions, using=router.db_for_read(ReferenceElement))
+    content = _aiter_encoded(rows, ElementsEncoder(ndjson=ndjson))
+    return StreamingHttpResponse(content, content_type=NDJSON_CONTENT_TYPE if ndjson else JSON_CONTENT_TYPE)
@@ -0,0 +1,122 @@
+from datetime import date
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from reference.cache import element_cache
+from reference.models import Reference, ReferenceVersion, ReferenceElement
+
+
+class AdminTestCase(TestCase):
+
+    def setUp(self):
+        element_cache.clear()
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'admin'))
+        self.refbook = self.create_refbook('ICD-10')
+        self.version = ReferenceVersion.objects.get(reference=self.refbook, version='2.0')
+        ReferenceElement.objects.bulk_create(
+            ReferenceElement(version=self.version, code=f'J{number:03}', value=f'Острый синусит {number}')
+            for number in range(50)
+        )
+        ReferenceElement.objects.create(version=self.version, code='K00', value='Нарушения развития зубов')
+
+    def create_refbook(self, code):
+        refbook = Reference.objects.create(code=code, name=code)
+        ReferenceVersion.objects.create(reference=refbook, version='1.0', start_date=date(2022, 1, 1))
+        ReferenceVersion.objects.create(reference=refbook, version='2.0', start_date=date(2023, 1, 1))
+        ReferenceVersion.objects.create(reference=refbook, version='3.0', start_date=date(2099, 1, 1))
+        return refbook
+
+    def count_queries(self, url, params=None):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries), response
+
+    def test_refbook_list_queries_do_not_grow_with_rows(self):
+        url = reverse('admin:reference_reference_changelist')
+        queries, response = self.count_queries(url)
+        self.assertContains(response, '<td class="field-current_version_number">2.0</td>', html=True)
+        for number in range(5):
+            self.create_refbook(f'REF-{number}')
+        self.assertEqual(self.count_queries(url)[0], queries)
+
+    def test_refbook_list_switches_version_after_switch_date(self):
+        refbook = self.create_refbook('SWITCH')
+        Reference.objects.filter(pk=refbook.pk).update(
+            current_version=refbook.referenceversion_set.get(version='1.0'), next_switch_date=date(2023, 1, 1))
+        _, response = self.count_queries(reverse('admin:reference_reference_changelist'), {'q': 'SWITCH'})
+        self.assertContains(response, '<td class="field-current_version_number">2.0</td>', html=True)
+        refbook.refresh_from_db()
+        self.assertEqual(refbook.next_switch_date, date(2099, 1, 1))
+
+    def test_version_page_links_to_elements(self):
+        url = reverse('admin:reference_referenceversion_change', args=[self.version.pk])
+        _, response = self.count_queries(url)
+        self.assertNotContains(response, 'J000')
+        self.assertContains(response, '51 элементов')
+        self.assertContains(response, f'?version={self.version.pk}')
+
+    def test_elements_filtered_by_version(self):
+        url = reverse('admin:reference_referenceelement_changelist')
+        _, response = self.count_queries(url, {'version': self.version.pk})
+        self.assertEqual(response.context['cl'].result_count, 51)
+        # Фильтр предлагает только версии справочника выбранной версии
+        version_filter = [spec for spec in response.context['cl'].filter_specs if spec.parameter_name == 'version'][0]
+        self.assertEqual([title for _, title in version_filter.lookup_choices],
+                         ['3.0 (2099-01-01)', '2.0 (2023-01-01)', '1.0 (2022-01-01)'])
+
+    def refbook_filter(self, response):
+        return [spec for spec in response.context['cl'].filter_specs
+                if spec.parameter_name == 'version__reference__id__exact'][0]
+
+    def test_refbook_filter_lists_only_matching_refbooks(self):
+        other = self.create_refbook('OTHER')
+        url = reverse('admin:reference_referenceelement_changelist')
+        _, response = self.count_queries(url)
+        self.assertEqual(self.refbook_filter(response).lookup_choices, [])
+        self.assertContains(response, 'name="version__reference__id__exact"')
+        _, response = self.count_queries(url, {'version__reference__id__exact': self.refbook.pk})
+        self.assertEqual(response.context['cl'].result_count, 51)
+        self.assertEqual(self.refbook_filter(response).lookup_choices, [(str(self.refbook.pk), 'ICD-10 ICD-10')])
+        _, response = self.count_queries(url, {'version__reference__id__exact': 'oth'})
+        self.assertEqual(self.refbook_filter(response).lookup_choices, [(str(other.pk), 'OTHER OTHER')])
+        self.assertEqual(response.context['cl'].result_count, 0)
+        _, response = self.count_queries(reverse('admin:reference_referenceversion_changelist'),
+                                         {'reference__id__exact': other.pk})
+        self.assertEqual(response.context['cl'].result_count, 3)
+
+    def test_elements_list_queries_do_not_grow_with_rows(self):
+        url = reverse('admin:reference_referenceelement_changelist')
+        queries, _ = self.count_queries(url)
+        other = self.create_refbook('OTHER')
+        ReferenceElement.objects.create(version=other.referenceversion_set.first(), code='A', value='a')
+        self.assertEqual(self.count_queries(url)[0], queries)
+
+    def test_element_search(self):
+        url = reverse('admin:reference_referenceelement_changelist')
+        _, response = self.count_queries(url, {'q': 'K00'})
+        self.assertEqual([element.code for element in response.context['cl'].result_list], ['K00'])
+        _, response = self.count_queries(url, {'q': 'Острый синус', 'version': self.version.pk})
+        self.assertEqual(response.context['cl'].result_count, 50)
+        _, response = self.count_queries(url, {'q': 'развития зуб'})
+        self.assertEqual([element.code for element in response.context['cl'].result_list], ['K00'])
+
+    def test_import_version(self):
+        url = reverse('admin:reference_reference_import', args=[self.refbook.pk])
+        self.assertEqual(self.client.get(url).status_code, 200)
+        upload = SimpleUploadedFile('elements.csv', 'code,value\nA00,Холера\nA01,Тиф\n'.encode())
+        response = self.client.post(url, {'file': upload, 'version': '4.0', 'start_date': '2100-01-01'})
+        version = ReferenceVersion.objects.get(reference=self.refbook, version='4.0')
+        self.assertRedirects(response, reverse('admin:reference_referenceversion_change', args=[version.pk]))
+        self.assertEqual(dict(version.referenceelement_set.values_list('code', 'value')),
+                         {'A00': 'Холера', 'A01': 'Тиф'})
+
+    def test_import_errors_are_shown_in_form(self):
+        url = reverse('admin:reference_reference_import', args=[self.refbook.pk])
+        upload = SimpleUploadedFile('elements.csv', 'code,value\nA00,Холера\n'.encode())
+        response = self.client.post(url, {'file': upload, 'version': '2.0', 'start_date': '2100-01-01'})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'not unique')
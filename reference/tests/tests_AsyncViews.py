@@ -0,0 +1,80 @@
+import json
+from datetime import date
+from django.test import TestCase
+from django.urls import reverse
+from reference.cache import element_cache
+from reference.models import Reference, ReferenceVersion, ReferenceElement
+
+
+class AsyncViewsTestCase(TestCase):
+
+    def setUp(self):
+        element_cache.clear()
+        self.refbook = Reference.objects.create(code='ICD-10', name='ICD-10')
+        self.version1 = ReferenceVersion.objects.create(reference=self.refbook, version='1.0',
+                                                        start_date=date(2022, 1, 1))
+        self.version2 = ReferenceVersion.objects.create(reference=self.refbook, version='2.0',
+                                                        start_date=date(2023, 1, 1))
+        ReferenceElement.objects.create(version=self.version1, code='J00', value='старое')
+        ReferenceElement.objects.create(version=self.version2, code='J00', value='новое')
+        Reference.objects.create(code='EMPTY', name='Without versions')
+
+    async def test_refbook_list(self):
+        response = await self.async_client.get(reverse('reference:async-refbook-list'), {'date': '2022-06-30'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'refbooks': [{'id': self.refbook.id, 'code': 'ICD-10', 'name': 'ICD-10'}]})
+
+    async def test_elements_current_version(self):
+        url = reverse('reference:async_refbook_elements_list', args=[self.refbook.id])
+        response = await self.async_client.get(url)
+        self.assertEqual(response.json(), {'elements': [{'code': 'J00', 'value': 'новое'}]})
+        self.assertIn('ETag', response)
+
+    async def test_elements_stream(self):
+        url = reverse('reference:async_refbook_elements_list', args=[self.refbook.id])
+        response = await self.async_client.get(url, {'version': '1.0', 'stream': '1'})
+        content = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(json.loads(content), {'elements': [{'code': 'J00', 'value': 'старое'}]})
+
+    async def test_elements_stream_is_boolean(self):
+        url = reverse('reference:async_refbook_elements_list', args=[self.refbook.id])
+        response = await self.async_client.get(url, {'version': '1.0', 'stream': 'false'})
+        self.assertFalse(response.streaming)
+        self.assertEqual(response.json(), {'elements': [{'code': 'J00', 'value': 'старое'}]})
+        response = await self.async_client.get(url, {'stream': 'maybe'})
+        self.assertEqual(response.status_code, 400)
+
+    async def test_elements_not_modified(self):
+        url = reverse('reference:async_refbook_elements_list', args=[self.refbook.id])
+        etag = (await self.async_client.get(url, {'version': '1.0'}))['ETag']
+        response = await self.async_client.get(url, {'version': '1.0'}, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+
+    async def test_elements_unknown_refbook(self):
+        url = reverse('reference:async_refbook_elements_list', args=[1000])
+        response = await self.async_client.get(url)
+        self.assertEqual(response.status_code, 404)
+
+    async def test_check_element(self):
+        url = reverse('reference:async_check_refbook_element', args=[self.refbook.id])
+        response = await self.async_client.get(url, {'code': 'J00', 'value': 'старое', 'version': '1.0'})
+        self.assertEqual(response.json(), {'exists': True})
+        response = await self.async_client.get(url, {'code': 'J00', 'value': 'старое'})
+        self.assertEqual(response.json(), {'exists': False})
+
+    async def test_check_element_answers_from_memory(self):
+        url = reverse('reference:async_check_refbook_element', args=[self.refbook.id])
+        await self.async_client.get(url, {'code': 'J00', 'value': 'новое'})
+        hits = element_cache.stats()['hits']
+        response = await self.async_client.get(url, {'code': 'J00', 'value': 'новое'})
+        self.assertEqual(response.json(), {'exists': True})
+        self.assertEqual(element_cache.stats()['hits'], hits + 2)
+
+    async def test_check_element_without_index_in_memory(self):
+        # Индекс версии не помещается в кэш — проверка выполняется запросом к базе
+        max_bytes, element_cache.max_bytes = element_cache.max_bytes, 10
+        self.addCleanup(setattr, element_cache, 'max_bytes', max_bytes)
+        url = reverse('reference:async_check_refbook_element', args=[self.refbook.id])
+        for _ in range(2):
+            response = await self.async_client.get(url, {'code': 'J00', 'value': 'новое'})
+            self.assertEqual(response.json(), {'exists': True})
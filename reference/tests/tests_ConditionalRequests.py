@@ -0,0 +1,107 @@
+from datetime import date
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from reference.cache import element_cache
+from reference.conditional import CURRENT_MAX_AGE, VERSIONED_MAX_AGE
+from reference.models import Reference, ReferenceVersion, ReferenceElement
+
+
+class ConditionalRequestsTestCase(APITestCase):
+
+    def setUp(self):
+        element_cache.clear()
+        self.refbook = Reference.objects.create(code='ICD-10', name='ICD-10')
+        self.version = ReferenceVersion.objects.create(reference=self.refbook, version='1.0',
+                                                       start_date=date(2022, 1, 1))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.element = ReferenceElement.objects.create(version=self.version, code='J00', value='a')
+        self.url = reverse('reference:refbook_elements_list', kwargs={'id': self.refbook.id})
+
+    def test_etag_and_cache_control_for_versioned_url(self):
+        response = self.client.get(self.url, {'version': '1.0'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['ETag'].startswith('"'))
+        self.assertIn('Last-Modified', response)
+        self.assertIn(f'max-age={VERSIONED_MAX_AGE}', response['Cache-Control'])
+
+    def test_current_version_url_gets_short_ttl(self):
+        response = self.client.get(self.url)
+        self.assertIn(f'max-age={CURRENT_MAX_AGE}', response['Cache-Control'])
+
+    def test_if_none_match_returns_304_without_reading_elements(self):
+        etag = self.client.get(self.url, {'version': '1.0'})['ETag']
+        element_cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, {'version': '1.0'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+        self.assertFalse(any('reference_referenceelement' in query['sql'] for query in queries))
+
+    def test_if_modified_since_returns_304(self):
+        last_modified = self.client.get(self.url, {'version': '1.0'})['Last-Modified']
+        response = self.client.get(self.url, {'version': '1.0'}, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_element_change_changes_etag(self):
+        etag = self.client.get(self.url, {'version': '1.0'})['ETag']
+        self.element.value = 'b'
+        # Ревизия версии увеличивается после фиксации транзакции
+        with self.captureOnCommitCallbacks(execute=True):
+            self.element.save()
+        response = self.client.get(self.url, {'version': '1.0'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.data['elements'], [{'code': 'J00', 'value': 'b'}])
+
+    def test_etag_depends_on_representation(self):
+        full = self.client.get(self.url, {'version': '1.0'})['ETag']
+        page = self.client.get(self.url, {'version': '1.0', 'limit': 1})['ETag']
+        self.assertNotEqual(full, page)
+
+    def test_etag_depends_on_media_type(self):
+        json_etag = self.client.get(self.url, {'version': '1.0'}, HTTP_ACCEPT='application/json')['ETag']
+        response = self.client.get(self.url, {'version': '1.0'}, HTTP_ACCEPT='application/msgpack',
+                                   HTTP_IF_NONE_MATCH=json_etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        self.assertNotEqual(response['ETag'], json_etag)
+        self.assertIn('Accept', response['Vary'])
+
+    def test_check_element_is_conditional(self):
+        url = reverse('reference:check_refbook_element', args=[self.refbook.id])
+        data = {'code': 'J00', 'value': 'a', 'version': '1.0'}
+        etag = self.client.get(url, data)['ETag']
+        response = self.client.get(url, data, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_revision_increases_once_per_transaction(self):
+        self.version.refresh_from_db()
+        revision = self.version.revision
+        with self.captureOnCommitCallbacks(execute=True):
+            for code in ['A00', 'A01', 'A02']:
+                ReferenceElement.objects.create(version=self.version, code=code, value=code)
+        self.version.refresh_from_db()
+        self.assertEqual(self.version.revision, revision + 1)
+
+    def test_stale_version_save_keeps_revision(self):
+        stale = ReferenceVersion.objects.get(pk=self.version.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            ReferenceElement.objects.create(version=self.version, code='C00', value='c')
+        self.version.refresh_from_db()
+        stale.version = '1.1'
+        stale.save()
+        stale.refresh_from_db()
+        self.assertEqual(stale.version, '1.1')
+        self.assertEqual(stale.revision, self.version.revision)
+
+    def test_version_delete_skips_element_signals(self):
+        ReferenceElement.objects.bulk_create(
+            ReferenceElement(version=self.version, code=f'B{number:03}', value='b') for number in range(500)
+        )
+        with CaptureQueriesContext(connection) as queries:
+            self.version.delete()
+        self.assertFalse([query for query in queries if 'SET "revision"' in query['sql']])
+        self.assertLess(len(queries), 30)
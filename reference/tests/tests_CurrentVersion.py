@@ -0,0 +1,73 @@
+import io
+from datetime import date, timedelta
+from django.core.management import call_command
+from django.test import TestCase
+from reference.cache import element_cache
+from reference.models import Reference, ReferenceVersion
+
+
+class CurrentVersionPointerTestCase(TestCase):
+
+    def setUp(self):
+        element_cache.clear()
+        self.today = date.today()
+        self.refbook = Reference.objects.create(code='ICD-10', name='ICD-10')
+        self.version1 = ReferenceVersion.objects.create(reference=self.refbook, version='1.0',
+                                                        start_date=self.today - timedelta(days=30))
+
+    def load(self):
+        return Reference.objects.select_related('current_version').get(pk=self.refbook.pk)
+
+    def test_pointer_is_maintained_on_version_save(self):
+        refbook = self.load()
+        self.assertEqual(refbook.current_version_id, self.version1.id)
+        self.assertIsNone(refbook.next_switch_date)
+
+        version2 = ReferenceVersion.objects.create(reference=self.refbook, version='2.0',
+                                                   start_date=self.today - timedelta(days=1))
+        future = ReferenceVersion.objects.create(reference=self.refbook, version='3.0',
+                                                 start_date=self.today + timedelta(days=10))
+        refbook = self.load()
+        self.assertEqual(refbook.current_version_id, version2.id)
+        self.assertEqual(refbook.next_switch_date, future.start_date)
+
+        version2.delete()
+        self.assertEqual(self.load().current_version_id, self.version1.id)
+
+    def test_select_related_costs_no_queries(self):
+        refbooks = list(Reference.objects.select_related('current_version'))
+        with self.assertNumQueries(0):
+            self.assertEqual([refbook.get_current_version().version for refbook in refbooks], ['1.0'])
+
+    def test_refbook_without_current_version(self):
+        Reference.objects.create(code='empty', name='Empty')
+        refbook = Reference.objects.select_related('current_version').get(code='empty')
+        with self.assertNumQueries(0):
+            self.assertIsNone(refbook.get_current_version())
+
+    def test_lazy_switch_when_date_passes(self):
+        version2 = ReferenceVersion.objects.create(reference=self.refbook, version='2.0',
+                                                   start_date=self.today + timedelta(days=5))
+        # Дата смены наступила, но команда по расписанию ещё не запускалась
+        ReferenceVersion.objects.filter(pk=version2.pk).update(start_date=self.today)
+        Reference.objects.filter(pk=self.refbook.pk).update(next_switch_date=self.today)
+        element_cache.clear()
+
+        refbook = self.load()
+        self.assertEqual(refbook.get_current_version().id, version2.id)
+        refbook = self.load()
+        self.assertEqual(refbook.current_version_id, version2.id)
+        self.assertIsNone(refbook.next_switch_date)
+
+    def test_refresh_command(self):
+        version2 = ReferenceVersion.objects.create(reference=self.refbook, version='2.0',
+                                                   start_date=self.today + timedelta(days=5))
+        out = io.StringIO()
+        call_command('refresh_current_versions', date=self.today, stdout=out)
+        self.assertIn('Refreshed current versions of 0 reference books', out.getvalue())
+
+        call_command('refresh_current_versions', date=version2.start_date, stdout=out)
+        self.assertIn('Refreshed current versions of 1 reference books', out.getvalue())
+        refbook = self.load()
+        self.assertEqual(refbook.current_version_id, version2.id)
+        self.assertIsNone(refbook.next_switch_date)
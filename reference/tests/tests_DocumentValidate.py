@@ -0,0 +1,96 @@
+from datetime import date
+from django.urls import reverse
+from rest_framework import serializers, status
+from rest_framework.test import APITestCase
+from reference.cache import element_cache
+from reference.models import Reference, ReferenceVersion, ReferenceElement
+from reference.serializers import FlatObjectListField, ValidateElementSerializer
+
+
+class DocumentValidateTestCase(APITestCase):
+
+    def setUp(self):
+        element_cache.clear()
+        self.url = reverse('reference:validate_document')
+        icd = Reference.objects.create(code='ICD-10', name='ICD-10')
+        old = ReferenceVersion.objects.create(reference=icd, version='1.0', start_date=date(2022, 1, 1))
+        new = ReferenceVersion.objects.create(reference=icd, version='2.0', start_date=date(2023, 1, 1))
+        ReferenceElement.objects.create(version=old, code='J00', value='old value')
+        ReferenceElement.objects.create(version=new, code='J00', value='new value')
+        sex = Reference.objects.create(code='SEX', name='Sex')
+        sex_version = ReferenceVersion.objects.create(reference=sex, version='1', start_date=date(2020, 1, 1))
+        ReferenceElement.objects.create(version=sex_version, code='M', value='Male')
+        ReferenceElement.objects.create(version=sex_version, code='F', value='Female')
+        Reference.objects.create(code='EMPTY', name='Without versions')
+
+    def test_report(self):
+        """
+        Every field is checked against the version of its refbook effective at the document date.
+        """
+        response = self.client.post(self.url, {'date': '2022-06-01', 'elements': [
+            {'refbook_code': 'ICD-10', 'code': 'J00', 'value': 'old value'},
+            {'refbook_code': 'SEX', 'code': 'F', 'value': 'Female'},
+            {'refbook_code': 'SEX', 'code': 'M', 'value': 'Female'},
+        ]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['valid'], False)
+        self.assertEqual(response.data['versions'], {'ICD-10': '1.0', 'SEX': '1'})
+        self.assertEqual([result['exists'] for result in response.data['results']], [True, True, False])
+        self.assertEqual(response.data['results'][0], {'refbook_code': 'ICD-10', 'code': 'J00',
+                                                       'value': 'old value', 'version': '1.0', 'exists': True})
+
+    def test_current_date_by_default(self):
+        response = self.client.post(self.url, {'elements': [
+            {'refbook_code': 'ICD-10', 'code': 'J00', 'value': 'new value'},
+        ]}, format='json')
+        self.assertEqual(response.data['valid'], True)
+        self.assertEqual(response.data['date'], date.today())
+
+    def test_unknown_refbook_and_missing_version(self):
+        response = self.client.post(self.url, {'date': '2021-01-01', 'elements': [
+            {'refbook_code': 'NOPE', 'code': 'A', 'value': 'a'},
+            {'refbook_code': 'EMPTY', 'code': 'A', 'value': 'a'},
+            {'refbook_code': 'ICD-10', 'code': 'J00', 'value': 'old value'},
+        ]}, format='json')
+        self.assertEqual([result.get('error') for result in response.data['results']],
+                         ['Reference book not found', 'No version found for the date', 'No version found for the date'])
+        self.assertEqual(response.data['valid'], False)
+
+    def test_validation_errors(self):
+        response = self.client.post(self.url, {'elements': []}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(self.url, {'elements': [{'code': 'A', 'value': 'a'}]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_whitespace_is_trimmed_like_check_elements(self):
+        element = {'code': ' J00 ', 'value': 'new value '}
+        check = self.client.post(reverse('reference:bulk_check_refbook_elements_by_code', args=['ICD-10']),
+                                 {'elements': [element]}, format='json')
+        validate = self.client.post(self.url, {'elements': [dict(element, refbook_code='ICD-10')]}, format='json')
+        self.assertEqual(check.data['results'][0]['exists'], True)
+        self.assertEqual(validate.data['results'][0]['exists'], True)
+
+    def test_errors_match_nested_serializer(self):
+        data = [
+            {'refbook_code': 'ICD-10', 'code': None, 'value': 'a'},
+            {'refbook_code': 'x' * 101, 'code': '  ', 'value': ['a']},
+            'not an object',
+        ]
+        errors = []
+        for field in (FlatObjectListField(child=ValidateElementSerializer()),
+                      serializers.ListField(child=ValidateElementSerializer())):
+            with self.assertRaises(serializers.ValidationError) as raised:
+                field.run_validation(data)
+            errors.append(raised.exception.detail)
+        self.assertEqual(errors[0], errors[1])
+
+    def test_single_pass(self):
+        """
+        A warm 100-field document costs one query: refbook codes; versions and elements come from the cache.
+        """
+        elements = [{'refbook_code': 'SEX' if i % 2 else 'ICD-10', 'code': 'M' if i % 2 else 'J00',
+                     'value': 'Male' if i % 2 else 'new value'} for i in range(100)]
+        self.client.post(self.url, {'elements': elements}, format='json')
+        with self.assertNumQueries(1):
+            response = self.client.post(self.url, {'elements': elements}, format='json')
+        self.assertTrue(response.data['valid'])
@@ -0,0 +1,84 @@
+from datetime import date
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from reference.cache import ElementLookup, VersionElementCache, element_cache
+from reference.models import Reference, ReferenceVersion, ReferenceElement
+
+
+class VersionElementCacheTestCase(TestCase):
+
+    def setUp(self):
+        self.refbook = Reference.objects.create(code='ref1', name='Reference 1')
+        self.version1 = ReferenceVersion.objects.create(reference=self.refbook, version='1.0',
+                                                        start_date=date(2022, 1, 1))
+        self.version2 = ReferenceVersion.objects.create(reference=self.refbook, version='2.0',
+                                                        start_date=date(2023, 1, 1))
+        ReferenceElement.objects.create(version=self.version1, code='A', value='a' * 1000)
+        ReferenceElement.objects.create(version=self.version2, code='B', value='b' * 1000)
+
+    def test_hit_and_miss_counters(self):
+        cache = VersionElementCache(max_bytes=1024 * 1024)
+        self.assertEqual(cache.get_elements(self.refbook.id, self.version1.id), {'A': 'a' * 1000})
+        with self.assertNumQueries(0):
+            cache.get_elements(self.refbook.id, self.version1.id)
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+
+    def test_lru_eviction_respects_memory_budget(self):
+        cache = VersionElementCache(max_bytes=2000)
+        cache.get_elements(self.refbook.id, self.version1.id)
+        cache.get_elements(self.refbook.id, self.version2.id)
+        stats = cache.stats()
+        self.assertEqual(stats['entries'], 1)
+        self.assertEqual(stats['evictions'], 1)
+        self.assertLessEqual(stats['bytes'], 2000)
+        with self.assertNumQueries(0):
+            cache.get_elements(self.refbook.id, self.version2.id)
+
+    def test_index_over_budget_falls_back_to_database(self):
+        cache = VersionElementCache(max_bytes=500)
+        index = cache.get_index(self.refbook.id, self.version1.id)
+        self.assertIsInstance(index, ElementLookup)
+        # Проверка запросом к базе, индекс не строится заново
+        with self.assertNumQueries(1):
+            self.assertIs(cache.get_index(self.refbook.id, self.version1.id), index)
+            self.assertTrue(index.contains('A', 'a' * 1000))
+        with self.assertNumQueries(1):
+            self.assertEqual(index.contains_many([('A', 'a' * 1000), ('A', 'b'), ('B', 'b' * 1000), (None, 'a')]),
+                             [True, False, False, False])
+
+    def test_element_change_invalidates_version(self):
+        element_cache.clear()
+        element_cache.get_elements(self.refbook.id, self.version1.id)
+        ReferenceElement.objects.create(version=self.version1, code='C', value='c')
+        self.assertEqual(element_cache.get_elements(self.refbook.id, self.version1.id)['C'], 'c')
+
+    def test_version_change_invalidates_versions(self):
+        element_cache.clear()
+        self.assertEqual(len(element_cache.get_versions(self.refbook.id)), 2)
+        self.version2.delete()
+        self.assertEqual(len(element_cache.get_versions(self.refbook.id)), 1)
+
+
+class CachedCheckElementTestCase(APITestCase):
+
+    def setUp(self):
+        element_cache.clear()
+        self.refbook = Reference.objects.create(code='ref1', name='Reference 1')
+        version = ReferenceVersion.objects.create(reference=self.refbook, version='1.0',
+                                                  start_date=date(2022, 1, 1))
+        ReferenceElement.objects.create(version=version, code='J00', value='()')
+
+    def test_check_element_answers_from_cache_without_sql(self):
+        url = reverse('reference:check_refbook_element', args=[self.refbook.id])
+        data = {'code': 'J00', 'value': '()'}
+        self.client.get(url, data=data)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, data=data)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['exists'], True)
+        self.assertEqual(len(queries), 0)
@@ -0,0 +1,80 @@
+import pickle
+from datetime import date
+from django.test import TestCase
+from reference.cache import VersionElementCache
+from reference.index import ElementIndex
+from reference.models import Reference, ReferenceVersion, ReferenceElement
+
+
+class ElementIndexTestCase(TestCase):
+
+    def test_lookup(self):
+        """
+        The index answers exact code/value membership, including non-ASCII and empty values.
+        """
+        index = ElementIndex.build([('J00', 'Острый назофарингит'), ('J01', 'Синусит'), ('E', '')])
+        self.assertEqual(len(index), 3)
+        self.assertTrue(index.contains('J00', 'Острый назофарингит'))
+        self.assertTrue(index.contains('E', ''))
+        self.assertFalse(index.contains('J00', 'Острый'))
+        self.assertFalse(index.contains('J0', 'Синусит'))
+        self.assertFalse(index.contains('J02', ''))
+        self.assertFalse(index.contains(None, 'Синусит'))
+        self.assertEqual(index.get('J01'), 'Синусит')
+        self.assertIsNone(index.get('J02'))
+
+    def test_empty(self):
+        index = ElementIndex.build([])
+        self.assertEqual(len(index), 0)
+        self.assertFalse(index.contains('A', 'a'))
+
+    def test_matches_dict(self):
+        """
+        On a larger set with shared values the index agrees with a dict, and values are stored once.
+        """
+        elements = {f'C{i}': f'value {i % 10}' for i in range(5000)}
+        index = ElementIndex.build(elements.items())
+        self.assertEqual(len(index), len(elements))
+        for code, value in elements.items():
+            self.assertTrue(index.contains(code, value))
+            self.assertFalse(index.contains(code, value + '!'))
+        self.assertEqual(len(index.value_offsets), 11)
+
+    def test_duplicate_code_keeps_last_value(self):
+        index = ElementIndex.build([('A', 'old'), ('B', 'b'), ('A', 'new')])
+        self.assertEqual(len(index), 2)
+        self.assertEqual(index.get('A'), 'new')
+
+    def test_pickle(self):
+        """
+        The index survives pickling, as done by the shared cache.
+        """
+        index = pickle.loads(pickle.dumps(ElementIndex.build([('A', 'a'), ('B', 'b')])))
+        self.assertTrue(index.contains('B', 'b'))
+
+
+class CachedElementIndexTestCase(TestCase):
+
+    def setUp(self):
+        self.refbook = Reference.objects.create(code='ref1', name='Reference 1')
+        self.version = ReferenceVersion.objects.create(reference=self.refbook, version='1.0',
+                                                       start_date=date(2022, 1, 1))
+        ReferenceElement.objects.create(version=self.version, code='A', value='a')
+
+    def test_built_lazily_and_cached(self):
+        cache = VersionElementCache(max_bytes=1024 * 1024)
+        self.assertEqual(cache.stats()['entries'], 0)
+        # Версий справочника нет в кэше: цепочка родительских версий читается из базы
+        with self.assertNumQueries(2):
+            index = cache.get_index(self.refbook.id, self.version.id)
+        self.assertTrue(index.contains('A', 'a'))
+        with self.assertNumQueries(0):
+            self.assertIs(cache.get_index(self.refbook.id, self.version.id), index)
+        self.assertEqual(cache.stats()['bytes'], index.nbytes)
+
+    def test_invalidate_version(self):
+        cache = VersionElementCache(max_bytes=1024 * 1024)
+        cache.get_index(self.refbook.id, self.version.id)
+        cache.invalidate_version(self.version.id)
+        ReferenceElement.objects.create(version=self.version, code='B', value='b')
+        self.assertTrue(cache.get_index(self.refbook.id, self.version.id).contains('B', 'b'))
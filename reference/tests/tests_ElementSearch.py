@@ -0,0 +1,104 @@
+from datetime import date
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from reference.cache import element_cache
+from reference.models import Reference, ReferenceVersion, ReferenceElement
+from reference.search import search_elements
+from reference.versioning import derive_version
+
+
+class ElementSearchTestCase(APITestCase):
+
+    def setUp(self):
+        element_cache.clear()
+        self.refbook = Reference.objects.create(code='ICD-10', name='ICD-10')
+        self.version1 = ReferenceVersion.objects.create(reference=self.refbook, version='1.0',
+                                                        start_date=date(2022, 1, 1))
+        self.version2 = ReferenceVersion.objects.create(reference=self.refbook, version='2.0',
+                                                        start_date=date(2023, 1, 1))
+        ReferenceElement.objects.bulk_create([
+            ReferenceElement(version=self.version1, code='J12', value='Viral pneumonia'),
+            ReferenceElement(version=self.version2, code='J00', value='Acute nasopharyngitis'),
+            ReferenceElement(version=self.version2, code='J01', value='Acute sinusitis'),
+            ReferenceElement(version=self.version2, code='J12', value='Viral pneumonia, not elsewhere classified'),
+            ReferenceElement(version=self.version2, code='J18', value='Pneumonia, organism unspecified'),
+            ReferenceElement(version=self.version2, code='A15', value='Туберкулёз органов дыхания'),
+        ])
+        self.url = reverse('reference:search_refbook_elements', args=[self.refbook.id])
+
+    def test_code_prefix(self):
+        response = self.client.get(self.url, {'code': 'J0'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'version': '2.0', 'elements': [
+            {'code': 'J00', 'value': 'Acute nasopharyngitis'}, {'code': 'J01', 'value': 'Acute sinusitis'}]})
+
+    def test_value_words_are_ranked_and_limited_to_version(self):
+        """
+        Value search is case-insensitive, restricted to the requested version and ranked by relevance.
+        """
+        response = self.client.get(self.url, {'q': 'PNEUMONIA'})
+        self.assertEqual([element['code'] for element in response.data['elements']], ['J18', 'J12'])
+        response = self.client.get(self.url, {'q': 'pneumonia', 'version': '1.0'})
+        self.assertEqual(response.data['elements'], [{'code': 'J12', 'value': 'Viral pneumonia'}])
+
+    def test_last_word_is_prefix(self):
+        response = self.client.get(self.url, {'q': 'acute sinu'})
+        self.assertEqual([element['code'] for element in response.data['elements']], ['J01'])
+        response = self.client.get(self.url, {'q': 'ТУБЕРКУЛЁЗ орган'})
+        self.assertEqual([element['code'] for element in response.data['elements']], ['A15'])
+
+    def test_version_filter_applies_before_limit(self):
+        """
+        Matches of other versions do not crowd out the requested version, even when its rows are interleaved
+        with theirs and added after them.
+        """
+        version3 = ReferenceVersion.objects.create(reference=self.refbook, version='3.0', start_date=date(2024, 1, 1))
+        ReferenceElement.objects.bulk_create(
+            ReferenceElement(version=version, code=f'P{number:03}', value='pneumonia')
+            for number in range(300) for version in [self.version2, version3]
+        )
+        ReferenceElement.objects.create(version=self.version1, code='J13', value='pneumonia acute')
+        self.assertEqual(search_elements(self.refbook.id, self.version1.id, query='pneumonia acute'),
+                         [('J13', 'pneumonia acute')])
+        self.assertEqual([code for code, _ in search_elements(self.refbook.id, self.version1.id, query='pneumonia')],
+                         ['J12', 'J13'])
+        self.assertEqual(search_elements(self.refbook.id, version3.id, query='pneumonia', code_prefix='P29', limit=3),
+                         [('P290', 'pneumonia'), ('P291', 'pneumonia'), ('P292', 'pneumonia')])
+
+    def test_code_prefix_and_words(self):
+        response = self.client.get(self.url, {'q': 'acute', 'code': 'J01'})
+        self.assertEqual([element['code'] for element in response.data['elements']], ['J01'])
+
+    def test_limit(self):
+        response = self.client.get(self.url, {'code': 'J', 'limit': 2})
+        self.assertEqual(len(response.data['elements']), 2)
+        response = self.client.get(self.url, {'code': 'J', 'limit': 1000})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_requires_query_or_code(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_unknown_version(self):
+        response = self.client.get(self.url, {'q': 'acute', 'version': '9.0'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_index_follows_changes(self):
+        """
+        The index is maintained on element updates and deletes; derived versions find elements inherited from the parent.
+        """
+        element = ReferenceElement.objects.get(version=self.version2, code='J01')
+        element.value = 'Chronic sinusitis'
+        element.save()
+        self.assertEqual(search_elements(self.refbook.id, self.version2.id, query='acute'), [('J00', 'Acute nasopharyngitis')])
+        self.assertEqual(search_elements(self.refbook.id, self.version2.id, query='chronic'), [('J01', 'Chronic sinusitis')])
+        element.delete()
+        self.assertEqual(search_elements(self.refbook.id, self.version2.id, query='sinusitis'), [])
+
+        derived = derive_version(self.version2, '3.0', date(2024, 1, 1)).version
+        self.assertEqual(search_elements(self.refbook.id, derived.id, query='nasophar'), [('J00', 'Acute nasopharyngitis')])
+
+    def test_query_syntax_is_not_interpreted(self):
+        self.assertEqual(search_elements(self.refbook.id, self.version2.id, query='"acute" OR NEAR(*'), [])
+        self.assertEqual(search_elements(self.refbook.id, self.version2.id, query='***'), [])
@@ -0,0 +1,96 @@
+from datetime import date
+from unittest import mock
+from django.contrib.auth.models import User
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from reference import metrics
+from reference.cache import element_cache
+from reference.models import Reference, ReferenceVersion, ReferenceElement
+
+
+class MetricsTestCase(APITestCase):
+
+    def setUp(self):
+        element_cache.clear()
+        metrics.clear()
+        self.refbook = Reference.objects.create(code='ICD-10', name='ICD-10')
+        self.version = ReferenceVersion.objects.create(reference=self.refbook, version='1.0',
+                                                       start_date=date(2022, 1, 1))
+        ReferenceElement.objects.create(version=self.version, code='J00', value='Acute nasopharyngitis')
+
+    def get_metrics(self):
+        response = self.client.get(reverse('reference:metrics'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        return response.content.decode()
+
+    def test_metrics_require_allowed_address_or_staff(self):
+        url = reverse('reference:metrics')
+        self.assertEqual(self.client.get(url, REMOTE_ADDR='203.0.113.5').status_code, status.HTTP_403_FORBIDDEN)
+        with self.settings(REFERENCE_METRICS_ALLOWED_IPS=['203.0.113.0/24']):
+            self.assertEqual(self.client.get(url, REMOTE_ADDR='203.0.113.5').status_code, status.HTTP_200_OK)
+        self.client.force_login(User.objects.create_user('staff', is_staff=True))
+        self.assertEqual(self.client.get(url, REMOTE_ADDR='203.0.113.5').status_code, status.HTTP_200_OK)
+
+    def test_request_histograms(self):
+        """
+        Latency, query count, DB time, render time and response size are recorded per view.
+        """
+        url = reverse('reference:refbook_elements_list', args=[self.refbook.id])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        text = self.get_metrics()
+        labels = '{view="reference:refbook_elements_list",method="GET",status="200"}'
+        for name in ('reference_request_duration_seconds', 'reference_request_db_queries',
+                     'reference_request_db_duration_seconds', 'reference_request_render_duration_seconds',
+                     'reference_response_size_bytes'):
+            self.assertIn(f'{name}_count{labels} 1', text)
+        self.assertIn(f'reference_response_size_bytes_sum{labels} {len(response.content)}', text)
+        self.assertIn('reference_element_cache_misses_total', text)
+
+    def test_query_count(self):
+        """
+        The query histogram counts SQL queries of the request: a cold request queries, a warm one does not.
+        """
+        url = reverse('reference:check_refbook_element', args=[self.refbook.id])
+        params = {'code': 'J00', 'value': 'Acute nasopharyngitis'}
+        self.client.get(url, params)
+        self.client.get(url, params)
+        labels = (('view', 'reference:check_refbook_element'), ('method', 'GET'), ('status', '200'))
+        counts, count, total = metrics.REQUEST_QUERIES._series[labels]
+        self.assertEqual(count, 2)
+        self.assertEqual(counts[0], 1)
+        self.assertGreater(total, 0)
+
+    def test_slow_request_log(self):
+        """
+        A request slower than the threshold is logged with its query fingerprints.
+        """
+        url = reverse('reference:refbook_elements_list', args=[self.refbook.id])
+        with mock.patch.object(metrics, 'SLOW_REQUEST_SECONDS', 0), \
+                self.assertLogs('reference.metrics', level='WARNING') as logs:
+            self.client.get(url, {'version': '1.0'})
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn('Slow request GET', logs.output[0])
+        self.assertIn('FROM "reference_referenceelement"', logs.output[0])
+
+    def test_fingerprint(self):
+        """
+        Queries differing only in literals and IN list length share a fingerprint.
+        """
+        self.assertEqual(
+            metrics.fingerprint('SELECT * FROM t WHERE id IN (%s, %s, %s) AND code = \'A\' LIMIT 21'),
+            metrics.fingerprint('SELECT * FROM t WHERE id IN (%s, %s) AND code = \'B\' LIMIT 10'),
+        )
+
+    async def test_async_view_queries(self):
+        """
+        Queries executed by async views in the ORM thread are counted for the request.
+        """
+        url = reverse('reference:async_check_refbook_element', args=[self.refbook.id])
+        await self.async_client.get(url, {'code': 'J00', 'value': 'Acute nasopharyngitis'})
+        labels = (('view', 'reference:async_check_refbook_element'), ('method', 'GET'), ('status', '200'))
+        _, count, total = metrics.REQUEST_QUERIES._series[labels]
+        self.assertEqual(count, 1)
+        self.assertGreater(total, 0)
@@ -0,0 +1,176 @@
+import asyncio
+import json
+import os
+import tempfile
+import threading
+from datetime import date, timedelta
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from reference import async_views, notifications
+from reference.cache import element_cache
+from reference.models import Reference, ReferenceVersion
+from reference.notifications import FileBroker, InProcessBroker
+
+
+def event(refbook_id, version='1.0'):
+    return notifications.version_event(notifications.PUBLISHED, refbook_id, 'ICD-10', version, date(2022, 1, 1))
+
+
+class BrokersTestCase(SimpleTestCase):
+
+    async def test_in_process_publish_from_thread(self):
+        broker = InProcessBroker()
+        cursor = broker.cursor()
+        waiting = asyncio.ensure_future(broker.wait(cursor, timeout=5))
+        await asyncio.sleep(0)
+        publisher = threading.Thread(target=broker.publish, args=[event(1)])
+        publisher.start()
+        events = await waiting
+        publisher.join()
+        self.assertEqual(events, [{'seq': cursor + 1, **event(1)}])
+        self.assertEqual(await broker.wait(cursor + 1, timeout=0), [])
+
+    async def test_in_process_keeps_last_events(self):
+        broker = InProcessBroker(size=2)
+        for version in ['1.0', '2.0', '3.0']:
+            broker.publish(event(1, version))
+        self.assertEqual([item['version'] for item in broker.events_after(0)], ['2.0', '3.0'])
+
+    async def test_in_process_cursor_survives_restart(self):
+        # Курсор, выданный до перезапуска процесса, меньше номеров новых событий
+        cursor = InProcessBroker().cursor() + 5
+        broker = InProcessBroker()
+        broker.publish(event(1))
+        self.assertEqual(len(broker.events_after(cursor)), 1)
+        # Курсор другого процесса больше текущего — отдаются все хранимые события
+        self.assertEqual(len(broker.events_after(broker.cursor() + 1000)), 1)
+
+    async def test_file_broker_shared_by_instances(self):
+        with tempfile.TemporaryDirectory() as directory:
+            publisher = FileBroker(os.path.join(directory, 'events'))
+            subscriber = FileBroker(publisher.path)
+            subscriber.poll_interval = 0.01
+            cursor = subscriber.cursor()
+            self.assertEqual(cursor, 0)
+            waiting = asyncio.ensure_future(subscriber.wait(cursor, timeout=5))
+            await asyncio.sleep(0.02)
+            publisher.publish(event(1))
+            publisher.publish(event(2))
+            events = await waiting
+            self.assertEqual([item['refbook_id'] for item in events], [1, 2])
+            self.assertEqual(events[-1]['seq'], subscriber.cursor())
+            self.assertEqual(await subscriber.wait(subscriber.cursor(), timeout=0), [])
+
+    async def test_file_broker_validates_cursor(self):
+        with tempfile.TemporaryDirectory() as directory:
+            broker = FileBroker(os.path.join(directory, 'events'))
+            broker.publish(event(1))
+            first = broker.cursor()
+            broker.publish(event(2))
+            # Смещение внутри строки сдвигается к началу следующей строки, за концом файла — к началу файла
+            self.assertEqual([item['refbook_id'] for item in broker.events_after(first)], [2])
+            self.assertEqual([item['refbook_id'] for item in broker.events_after(first - 3)], [2])
+            self.assertEqual([item['refbook_id'] for item in broker.events_after(3)], [2])
+            self.assertEqual(broker.events_after(broker.cursor() - 3), [])
+            self.assertEqual([item['refbook_id'] for item in broker.events_after(broker.cursor() + 100)], [1, 2])
+
+
+class NotificationsTestCase(TestCase):
+
+    def setUp(self):
+        element_cache.clear()
+        self.broker = notifications.broker = InProcessBroker()
+        self.start = self.broker.cursor()
+        self.refbook = Reference.objects.create(code='ICD-10', name='ICD-10')
+        self.poll_url = reverse('reference:async_refbook_events_poll')
+
+    def tearDown(self):
+        notifications.broker = notifications.create_broker()
+
+    def brief(self, events):
+        return [(item['event'], item['refbook'], item['version']) for item in events]
+
+    def test_version_publication(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            ReferenceVersion.objects.create(reference=self.refbook, version='1.0', start_date=date(2022, 1, 1))
+            ReferenceVersion.objects.create(reference=self.refbook, version='2.0',
+                                            start_date=date.today() + timedelta(days=10))
+        self.assertEqual(self.brief(self.broker.events_after(0)), [
+            ('published', 'ICD-10', '1.0'),
+            ('current', 'ICD-10', '1.0'),
+            ('published', 'ICD-10', '2.0'),
+        ])
+
+    def test_not_published_before_commit(self):
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            ReferenceVersion.objects.create(reference=self.refbook, version='1.0', start_date=date(2022, 1, 1))
+        self.assertEqual(self.broker.events_after(0), [])
+        for callback in callbacks:
+            callback()
+        self.assertEqual(len(self.broker.events_after(0)), 2)
+
+    def test_switch_by_command(self):
+        switch_date = date.today() + timedelta(days=10)
+        ReferenceVersion.objects.create(reference=self.refbook, version='1.0', start_date=switch_date)
+        cursor = self.broker.cursor()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('refresh_current_versions', date=switch_date, stdout=open(os.devnull, 'w'))
+        self.assertEqual(self.brief(self.broker.events_after(cursor)), [('current', 'ICD-10', '1.0')])
+
+        # Повторный пересчёт не меняет текущую версию и не публикует событий
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('refresh_current_versions', date=switch_date, all=True, stdout=open(os.devnull, 'w'))
+        self.assertEqual(len(self.broker.events_after(cursor)), 1)
+
+    async def test_poll_cursor_without_since(self):
+        self.broker.publish(event(self.refbook.id))
+        response = await self.async_client.get(self.poll_url)
+        self.assertEqual(response.json(), {'cursor': self.start + 1, 'events': []})
+
+    async def test_poll_returns_published_events(self):
+        self.broker.publish(event(self.refbook.id))
+        self.broker.publish(event(self.refbook.id + 1))
+        response = await self.async_client.get(self.poll_url, {'since': self.start, 'refbook': self.refbook.id})
+        self.assertEqual(response.json(), {'cursor': self.start + 2,
+                                           'events': [{'seq': self.start + 1, **event(self.refbook.id)}]})
+
+    async def test_poll_waits_for_event(self):
+        asyncio.get_running_loop().call_later(0.05, self.broker.publish, event(self.refbook.id))
+        response = await self.async_client.get(self.poll_url, {'since': self.start, 'timeout': 5})
+        self.assertEqual(response.json()['cursor'], self.start + 1)
+
+    async def test_poll_timeout(self):
+        self.broker.publish(event(self.refbook.id + 1))
+        response = await self.async_client.get(self.poll_url, {'since': self.start, 'timeout': 0,
+                                                               'refbook': self.refbook.id})
+        self.assertEqual(response.json(), {'cursor': self.start + 1, 'events': []})
+
+    async def test_poll_invalid_params(self):
+        for params in [{'since': -1}, {'since': 'a'}, {'refbook': 'a'}, {'since': 0, 'timeout': 'nan'}]:
+            response = await self.async_client.get(self.poll_url, params)
+            self.assertEqual(response.status_code, 400, params)
+
+    async def test_event_stream(self):
+        self.broker.publish(event(self.refbook.id))
+        response = await self.async_client.get(reverse('reference:async_refbook_events'),
+                                               headers={'Last-Event-ID': str(self.start)})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+        self.assertNotIn('Content-Encoding', response)
+        chunks = aiter(response.streaming_content)
+        self.assertEqual(await anext(chunks), b'retry: 3000\n\n')
+        frame = (await anext(chunks)).decode()
+        self.assertTrue(frame.startswith(f'id: {self.start + 1}\nevent: published\ndata: '))
+        self.assertEqual(json.loads(frame.split('data: ', 1)[1]), {'seq': self.start + 1, **event(self.refbook.id)})
+        await response.streaming_content.aclose()
+
+    async def test_event_stream_ends_after_lifetime(self):
+        lifetime, async_views.EVENTS_STREAM_LIFETIME = async_views.EVENTS_STREAM_LIFETIME, 0.05
+        self.addCleanup(setattr, async_views, 'EVENTS_STREAM_LIFETIME', lifetime)
+        self.broker.publish(event(self.refbook.id + 1))
+        response = await self.async_client.get(reverse('reference:async_refbook_events'),
+                                               {'since': self.start, 'refbook': self.refbook.id})
+        chunks = [chunk async for chunk in response.streaming_content]
+        # Последний кадр передаёт курсор после пропущенного события другого справочника
+        self.assertEqual(chunks[-1], f': keepalive\nid: {self.start + 1}\n\n'.encode())
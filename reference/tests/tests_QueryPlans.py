@@ -0,0 +1,87 @@
+from datetime import date
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Exists, OuterRef
+from django.test import TestCase
+from reference.models import Reference, ReferenceVersion, ReferenceElement
+
+
+class QueryPlansTestCase(TestCase):
+    """
+    Hot lookup queries must be served by indexes: the test fails if EXPLAIN shows a full table scan
+    (or a sort that an index should have provided).
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.refbook = Reference.objects.create(code='ICD-10', name='ICD-10')
+        cls.version1 = ReferenceVersion.objects.create(reference=cls.refbook, version='1.0',
+                                                       start_date=date(2022, 1, 1))
+        cls.version2 = ReferenceVersion.objects.create(reference=cls.refbook, version='2.0',
+                                                       start_date=date(2023, 1, 1))
+        ReferenceElement.objects.bulk_create(
+            ReferenceElement(version=version, code=f'J{number:02}', value=f'value {number}')
+            for version in (cls.version1, cls.version2) for number in range(50)
+        )
+
+    def explain(self, queryset):
+        with transaction.atomic(), connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                # На маленьких тестовых таблицах планировщик PostgreSQL всегда выбирает Seq Scan
+                cursor.execute('SET LOCAL enable_seqscan = off')
+            return queryset.explain()
+
+    def assertUsesIndex(self, queryset, ordered=False):
+        plan = self.explain(queryset)
+        if connection.vendor == 'sqlite':
+            scans = [line for line in plan.splitlines() if 'SCAN reference_' in line]
+            self.assertEqual(scans, [], plan)
+            if ordered:
+                self.assertNotIn('USE TEMP B-TREE', plan)
+        elif connection.vendor == 'postgresql':
+            self.assertNotIn('Seq Scan', plan)
+            if ordered:
+                self.assertNotIn('Sort', plan)
+        return plan
+
+    def test_element_check_by_version_code_value(self):
+        self.assertUsesIndex(ReferenceElement.objects.filter(
+            version=self.version2, code='J01', value='value 1').values('id'))
+
+    def test_element_code_lookup_and_prefix(self):
+        self.assertUsesIndex(ReferenceElement.objects.filter(version=self.version2, code='J01').values('value'))
+        self.assertUsesIndex(ReferenceElement.objects.filter(
+            version=self.version2, code__gte='J1', code__lt='J1\U0010ffff').order_by('code').values('code', 'value'),
+            ordered=True)
+
+    def test_version_elements_in_id_order(self):
+        self.assertUsesIndex(ReferenceElement.objects.filter(version=self.version2).order_by('id').values_list(
+            'code', 'value'), ordered=True)
+        self.assertUsesIndex(ReferenceElement.objects.filter(version=self.version2, id__gt=10).order_by('id').values_list(
+            'id', 'code', 'value'), ordered=True)
+
+    def test_version_index_build_reads_index_only(self):
+        plan = self.assertUsesIndex(ReferenceElement.objects.filter(version=self.version2).values_list('code', 'value'))
+        if connection.vendor == 'sqlite':
+            self.assertIn('COVERING INDEX reference_element_lookup', plan)
+
+    def test_version_by_reference_and_version(self):
+        self.assertUsesIndex(ReferenceVersion.objects.filter(reference=self.refbook, version='2.0').values('id'))
+
+    def test_version_on_date_ordered_descending(self):
+        self.assertUsesIndex(ReferenceVersion.objects.filter(
+            reference=self.refbook, start_date__lte=date(2022, 6, 1)).order_by('-start_date').values('id')[:1],
+            ordered=True)
+        self.assertUsesIndex(ReferenceVersion.objects.filter(reference=self.refbook).order_by('start_date'),
+                             ordered=True)
+
+    def test_refbooks_with_versions_on_date(self):
+        versions = ReferenceVersion.objects.filter(reference=OuterRef('pk'), start_date__lte=date(2022, 6, 1))
+        plan = self.explain(Reference.objects.filter(Exists(versions)).order_by('id'))
+        if connection.vendor == 'sqlite':
+            # Справочники перебираются целиком, но версии каждого ищутся по индексу
+            self.assertNotIn('SCAN reference_referenceversion', plan)
+            self.assertNotIn('USE TEMP B-TREE', plan)
+
+    def test_reference_version_is_unique(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            ReferenceVersion.objects.create(reference=self.refbook, version='1.0', start_date=date(2024, 1, 1))
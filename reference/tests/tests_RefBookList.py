@@ -1,4 +1,6 @@
 from datetime import date, timedelta
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
@@ -52,3 +54,43 @@ class RefBookListTests(APITestCase):
         ref_data = response.data['refbooks'][0]
         self.assertEqual(ref_data['id'], self.ref1.id)
         self.assertEqual(ref_data['code'], self.ref1.code)
+
+    def test_get_refbooks_with_date_before_all_versions(self):
+        """
+        Test GET request to RefBookList with a date before any version starts
+        """
+        url = reverse('reference:refbook-list')
+        response = self.client.get(url, {'date': '2021-12-31'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['refbooks'], [])
+
+    def test_get_refbooks_paginated(self):
+        """
+        Test GET request to RefBookList with limit and offset
+        """
+        url = reverse('reference:refbook-list')
+        response = self.client.get(url, {'limit': 1, 'offset': 1})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(len(response.data['refbooks']), 1)
+        self.assertEqual(response.data['refbooks'][0]['id'], self.ref2.id)
+        self.assertIsNone(response.data['next'])
+
+    def test_query_count_does_not_grow_with_refbooks(self):
+        """
+        Test RefBookList runs the same number of queries for any number of reference books
+        """
+        url = reverse('reference:refbook-list')
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url, {'date': '2022-06-30'})
+        initial_count = len(queries)
+
+        for i in range(20):
+            reference = Reference.objects.create(code=f'extra{i}', name=f'Extra {i}')
+            ReferenceVersion.objects.create(reference=reference, version='1.0', start_date=date(2022, 1, 1))
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {'date': '2022-06-30'})
+        self.assertEqual(len(response.data['refbooks']), 22)
+        self.assertEqual(len(queries), initial_count)
+        self.assertEqual(initial_count, 1)
@@ -0,0 +1,131 @@
+from datetime import date
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from reference.cache import element_cache
+from reference.models import Reference, ReferenceChange, ReferenceVersion, ReferenceElement
+from reference.versioning import derive_version
+
+
+class RefbookChangesTestCase(APITestCase):
+
+    def setUp(self):
+        element_cache.clear()
+        self.refbook = Reference.objects.create(code='ICD-10', name='ICD-10')
+        self.url = reverse('reference:refbook_changes', args=[self.refbook.id])
+        self.cursor = self.client.get(self.url).data['cursor']
+
+    def changes(self, since=None, **params):
+        response = self.client.get(self.url, {'since': self.cursor if since is None else since, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def brief(self, changes):
+        return [(change['type'], change['op'], change['version'], change.get('code'), change.get('value'))
+                for change in changes]
+
+    def test_cursor_without_since(self):
+        self.assertEqual(self.client.get(self.url).data, {'cursor': self.cursor, 'more': False, 'changes': []})
+        ReferenceVersion.objects.create(reference=self.refbook, version='1.0', start_date=date(2022, 1, 1))
+        self.assertGreater(self.client.get(self.url).data['cursor'], self.cursor)
+
+    def test_element_inserts_updates_and_deletes(self):
+        version = ReferenceVersion.objects.create(reference=self.refbook, version='1.0', start_date=date(2022, 1, 1))
+        element = ReferenceElement.objects.create(version=version, code='J00', value='a')
+        other = ReferenceElement.objects.create(version=version, code='J01', value='b')
+        element.value = 'a2'
+        element.save()
+        other.code = 'J02'
+        other.save()
+        element.delete()
+
+        data = self.changes()
+        self.assertFalse(data['more'])
+        self.assertEqual(data['changes'][0], {'seq': data['changes'][0]['seq'], 'type': 'version', 'op': 'insert',
+                                              'version_id': version.id, 'version': '1.0',
+                                              'start_date': date(2022, 1, 1)})
+        self.assertEqual(self.brief(data['changes'][1:]), [
+            ('element', 'insert', '1.0', 'J00', 'a'),
+            ('element', 'insert', '1.0', 'J01', 'b'),
+            ('element', 'update', '1.0', 'J00', 'a2'),
+            ('element', 'delete', '1.0', 'J01', None),
+            ('element', 'insert', '1.0', 'J02', 'b'),
+            ('element', 'delete', '1.0', 'J00', None),
+        ])
+        self.assertEqual(data['cursor'], data['changes'][-1]['seq'])
+        self.assertEqual(self.changes(since=data['cursor'])['changes'], [])
+
+    def test_version_rename_keeps_version_id(self):
+        version = ReferenceVersion.objects.create(reference=self.refbook, version='1.0', start_date=date(2022, 1, 1))
+        cursor = self.changes()['cursor']
+        version.version = '1-renamed'
+        version.save()
+        ReferenceElement.objects.create(version=version, code='A', value='a')
+        changes = self.changes(since=cursor)['changes']
+        self.assertEqual([(change['type'], change['op'], change['version_id'], change['version']) for change in changes],
+                         [('version', 'update', version.id, '1-renamed'), ('element', 'insert', version.id, '1-renamed')])
+
+    def test_element_save_queries(self):
+        """
+        Logging an element change adds no code lookup, savepoint or repeated refbook lock.
+        """
+        version = ReferenceVersion.objects.create(reference=self.refbook, version='1.0', start_date=date(2022, 1, 1))
+        ReferenceElement.objects.create(version=version, code='A', value='a')
+        element = ReferenceElement.objects.get(code='A')
+        element.value = 'a2'
+        with CaptureQueriesContext(connection) as queries:
+            element.save()
+        statements = [query['sql'] for query in queries]
+        lookups = [sql for sql in statements if sql.startswith(('SAVEPOINT', 'SELECT'))]
+        self.assertFalse([sql for sql in lookups
+                          if 'reference_referenceelement' in sql or 'FROM "reference_reference"' in sql])
+        self.assertEqual(len([sql for sql in statements if 'reference_referencechange' in sql]), 1)
+        self.assertEqual(self.brief(self.changes()['changes'])[-1], ('element', 'update', '1.0', 'A', 'a2'))
+
+    def test_paging_with_limit(self):
+        version = ReferenceVersion.objects.create(reference=self.refbook, version='1.0', start_date=date(2022, 1, 1))
+        for code in ['A', 'B', 'C']:
+            ReferenceElement.objects.create(version=version, code=code, value=code)
+        first = self.changes(limit=2)
+        self.assertTrue(first['more'])
+        second = self.changes(since=first['cursor'], limit=2)
+        self.assertFalse(second['more'])
+        self.assertEqual([change.get('code') for change in first['changes'] + second['changes']],
+                         [None, 'A', 'B', 'C'])
+
+    def test_derived_version_logs_only_the_delta(self):
+        parent = ReferenceVersion.objects.create(reference=self.refbook, version='1.0', start_date=date(2022, 1, 1))
+        ReferenceElement.objects.bulk_create(
+            ReferenceElement(version=parent, code=f'C{number:03}', value='v') for number in range(100)
+        )
+        cursor = self.changes()['cursor']
+        derive_version(parent, '2.0', date(2023, 1, 1), added=[('NEW', 'n')], changed=[('C001', 'v2')],
+                       removed=['C002'])
+        data = self.changes(since=cursor)
+        self.assertEqual(data['changes'][0]['parent'], '1.0')
+        self.assertEqual(self.brief(data['changes']), [
+            ('version', 'insert', '2.0', None, None),
+            ('element', 'delete', '2.0', 'C002', None),
+            ('element', 'update', '2.0', 'C001', 'v2'),
+            ('element', 'insert', '2.0', 'NEW', 'n'),
+        ])
+
+    def test_version_delete_is_one_change(self):
+        version = ReferenceVersion.objects.create(reference=self.refbook, version='1.0', start_date=date(2022, 1, 1))
+        ReferenceElement.objects.create(version=version, code='A', value='a')
+        cursor = self.changes()['cursor']
+        version.delete()
+        self.assertEqual(self.brief(self.changes(since=cursor)['changes']), [('version', 'delete', '1.0', None, None)])
+
+    def test_reference_delete_removes_its_log(self):
+        version = ReferenceVersion.objects.create(reference=self.refbook, version='1.0', start_date=date(2022, 1, 1))
+        ReferenceElement.objects.create(version=version, code='A', value='a')
+        self.refbook.delete()
+        self.assertFalse(ReferenceChange.objects.exists())
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.url, {'since': -1})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
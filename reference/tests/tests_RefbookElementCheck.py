@@ -2,11 +2,13 @@ from datetime import date
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
+from reference.cache import element_cache
 from reference.models import Reference, ReferenceVersion, ReferenceElement
 
 
 class RefbookElementCheckViewTestCase(APITestCase):
     def setUp(self):
+        element_cache.clear()
         start_date = date(2022, 1, 1)
         self.refbook = Reference.objects.create(name="Test Reference")
         self.version = ReferenceVersion.objects.create(reference=self.refbook,
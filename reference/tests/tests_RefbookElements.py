@@ -1,13 +1,20 @@
+import json
 from datetime import date
+from django.db import connection
+from django.test import SimpleTestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
+from reference.cache import element_cache
 from reference.models import Reference, ReferenceVersion, ReferenceElement
+from reference.streaming import iter_json, iter_ndjson
 
 
 class RefbookElementsViewTestCase(APITestCase):
 
     def setUp(self):
+        element_cache.clear()
         start_date = date(2022, 1, 1)
         self.refbook = Reference.objects.create(name='Test Refbook')
         self.version = ReferenceVersion.objects.create(
@@ -56,3 +63,102 @@ class RefbookElementsViewTestCase(APITestCase):
         url = reverse('reference:refbook_elements_list', kwargs={'id': 1000})
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_get_refbook_elements_stream_json(self):
+        """
+        Test GET request to RefbookElementsView with JSON streaming
+        """
+        url = reverse('reference:refbook_elements_list', kwargs={'id': self.refbook.id})
+        response = self.client.get(url, {'stream': '1', 'version': '1.0'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        data = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(data, {'elements': [
+            {'code': 'CODE1', 'value': 'value_1'},
+            {'code': 'CODE2', 'value': 'value_2'},
+            {'code': 'CODE3', 'value': 'value_3'},
+        ]})
+
+    def test_get_refbook_elements_stream_ndjson(self):
+        """
+        Test GET request to RefbookElementsView with NDJSON streaming
+        """
+        url = reverse('reference:refbook_elements_list', kwargs={'id': self.refbook.id})
+        response = self.client.get(url, {'stream': 'ndjson'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line)['code'] for line in lines], ['CODE1', 'CODE2', 'CODE3'])
+
+    def test_get_refbook_elements_stream_is_boolean(self):
+        """
+        Test stream=0 and stream=false return a regular response and an invalid stream returns 400
+        """
+        url = reverse('reference:refbook_elements_list', kwargs={'id': self.refbook.id})
+        for value in ['0', 'false', '']:
+            response = self.client.get(url, {'stream': value, 'version': '1.0'})
+            self.assertFalse(response.streaming, value)
+            self.assertEqual(len(response.data['elements']), 3)
+        self.assertTrue(self.client.get(url, {'stream': 'true', 'version': '1.0'}).streaming)
+        response = self.client.get(url, {'stream': 'json', 'version': '1.0'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_get_refbook_elements_stream_unknown_version(self):
+        """
+        Test JSON streaming of a nonexistent version returns an empty list
+        """
+        url = reverse('reference:refbook_elements_list', kwargs={'id': self.refbook.id})
+        response = self.client.get(url, {'stream': '1', 'version': '9.0'})
+        self.assertEqual(json.loads(b''.join(response.streaming_content)), {'elements': []})
+
+
+class StreamingJSONTestCase(SimpleTestCase):
+
+    def test_chunk_boundaries_produce_valid_json(self):
+        rows = [(f'C{i}', f'значение {i}') for i in range(5)]
+        chunks = list(iter_json(rows, chunk_size=2))
+        self.assertEqual(len(chunks), 4)
+        self.assertEqual(json.loads(''.join(chunks))['elements'][4], {'code': 'C4', 'value': 'значение 4'})
+
+    def test_empty_rows(self):
+        self.assertEqual(json.loads(''.join(iter_json([]))), {'elements': []})
+        self.assertEqual(''.join(iter_ndjson([])), '')
+
+
+class RefbookElementsPaginationTestCase(APITestCase):
+
+    def setUp(self):
+        element_cache.clear()
+        self.refbook = Reference.objects.create(name='Test Refbook')
+        version = ReferenceVersion.objects.create(reference=self.refbook, version='1.0', start_date=date(2022, 1, 1))
+        for code in ['E', 'A', 'D', 'B', 'C']:
+            ReferenceElement.objects.create(version=version, code=code, value=code.lower())
+        self.url = reverse('reference:refbook_elements_list', kwargs={'id': self.refbook.id})
+
+    def test_pages_follow_code_order(self):
+        """
+        Test following next links returns every element once ordered by code
+        """
+        codes = []
+        response = self.client.get(self.url, {'limit': 2})
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            codes.extend(element['code'] for element in response.data['elements'])
+            if response.data['next'] is None:
+                break
+            response = self.client.get(response.data['next'])
+        self.assertEqual(codes, ['A', 'B', 'C', 'D', 'E'])
+
+    def test_deep_page_costs_the_same_as_first_page(self):
+        """
+        Test the last page runs the same queries as the first one, without OFFSET
+        """
+        first = self.client.get(self.url, {'limit': 2})
+        with CaptureQueriesContext(connection) as first_queries:
+            self.client.get(self.url, {'limit': 2})
+        second = self.client.get(first.data['next'])
+        with CaptureQueriesContext(connection) as deep_queries:
+            response = self.client.get(second.data['next'])
+        self.assertEqual([element['code'] for element in response.data['elements']], ['E'])
+        self.assertEqual(len(deep_queries), len(first_queries))
+        self.assertNotIn('OFFSET', deep_queries[-1]['sql'])
@@ -0,0 +1,91 @@
+from datetime import date
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from reference.cache import element_cache
+from reference.models import Reference, ReferenceVersion, ReferenceElement
+
+
+class RefbookElementsBulkCheckViewTestCase(APITestCase):
+
+    def setUp(self):
+        element_cache.clear()
+        self.refbook = Reference.objects.create(code='ICD-10', name='Test Reference')
+        self.version1 = ReferenceVersion.objects.create(reference=self.refbook,
+                                                        version='1.0',
+                                                        start_date=date(2022, 1, 1))
+        self.version2 = ReferenceVersion.objects.create(reference=self.refbook,
+                                                        version='2.0',
+                                                        start_date=date(2023, 1, 1))
+        ReferenceElement.objects.create(version=self.version1, code='J00', value='old value')
+        ReferenceElement.objects.create(version=self.version2, code='J00', value='new value')
+        ReferenceElement.objects.create(version=self.version2, code='J01', value='j01 value')
+        self.url = reverse('reference:bulk_check_refbook_elements', args=[self.refbook.id])
+
+    def test_bulk_check_current_version(self):
+        """
+        Test results are returned in input order for the current version
+        """
+        data = {'elements': [
+            {'code': 'J01', 'value': 'j01 value'},
+            {'code': 'J00', 'value': 'old value'},
+            {'code': 'J00', 'value': 'new value'},
+            {'code': 'J99', 'value': 'missing'},
+        ]}
+        response = self.client.post(self.url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['version'], '2.0')
+        self.assertEqual([item['exists'] for item in response.data['results']], [True, False, True, False])
+        self.assertEqual(response.data['results'][0]['code'], 'J01')
+
+    def test_bulk_check_with_version(self):
+        """
+        Test bulk check against an explicitly requested version
+        """
+        data = {'version': '1.0', 'elements': [{'code': 'J00', 'value': 'old value'}]}
+        response = self.client.post(self.url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0]['exists'], True)
+
+    def test_bulk_check_with_date(self):
+        """
+        Test bulk check against the version in effect at the given date
+        """
+        data = {'date': '2022-06-30', 'elements': [{'code': 'J01', 'value': 'j01 value'}]}
+        response = self.client.post(self.url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['version'], '1.0')
+        self.assertEqual(response.data['results'][0]['exists'], False)
+
+    def test_bulk_check_by_refbook_code(self):
+        """
+        Test bulk check with the reference book addressed by its code
+        """
+        url = reverse('reference:bulk_check_refbook_elements_by_code', args=[self.refbook.code])
+        data = {'elements': [{'code': 'J01', 'value': 'j01 value'}]}
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0]['exists'], True)
+
+    def test_bulk_check_unknown_version(self):
+        data = {'version': '9.0', 'elements': [{'code': 'J00', 'value': 'old value'}]}
+        response = self.client.post(self.url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_bulk_check_version_and_date(self):
+        data = {'version': '1.0', 'date': '2022-06-30', 'elements': [{'code': 'J00', 'value': 'old value'}]}
+        response = self.client.post(self.url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_check_query_count_is_bounded(self):
+        """
+        Test the number of queries does not grow with the number of checked pairs
+        """
+        data = {'version': '2.0', 'elements': [{'code': f'C{i}', 'value': 'v'} for i in range(300)]}
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 300)
+        self.assertLessEqual(len(queries), 3)
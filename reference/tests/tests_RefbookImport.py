@@ -0,0 +1,119 @@
+import io
+import json
+import os
+import tempfile
+from datetime import date
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from reference.cache import element_cache
+from reference.importers import RefbookImportError, iter_csv, iter_json, iter_ndjson
+from reference.models import Reference, ReferenceVersion, ReferenceElement
+
+
+class ImportParsersTestCase(SimpleTestCase):
+
+    def test_csv(self):
+        stream = io.StringIO('code,value\nJ00,"a, b"\nJ01,c\n')
+        self.assertEqual(list(iter_csv(stream)), [('J00', 'a, b'), ('J01', 'c')])
+
+    def test_ndjson(self):
+        stream = io.StringIO('{"code": "J00", "value": "a"}\n\n{"code": "J01", "value": "b"}\n')
+        self.assertEqual(list(iter_ndjson(stream)), [('J00', 'a'), ('J01', 'b')])
+
+    def test_json_array_read_in_small_chunks(self):
+        elements = [{'code': f'C{i}', 'value': f'значение {i}'} for i in range(50)]
+        stream = io.StringIO(json.dumps(elements, ensure_ascii=False))
+        rows = list(iter_json(stream, chunk_size=7))
+        self.assertEqual(len(rows), 50)
+        self.assertEqual(rows[49], ('C49', 'значение 49'))
+
+    def test_json_elements_document(self):
+        stream = io.StringIO('{"elements": [{"code": "J00", "value": "a"}]}')
+        self.assertEqual(list(iter_json(stream)), [('J00', 'a')])
+
+    def test_json_empty_array(self):
+        self.assertEqual(list(iter_json(io.StringIO('[ ]'))), [])
+
+    def test_missing_value(self):
+        with self.assertRaises(RefbookImportError):
+            list(iter_ndjson(io.StringIO('{"code": "J00"}\n')))
+
+    def test_truncated_json(self):
+        with self.assertRaises(RefbookImportError):
+            list(iter_json(io.StringIO('[{"code": "J00", "value": "a"}, {"code": ')))
+
+
+class ImportRefbookCommandTestCase(TestCase):
+
+    def setUp(self):
+        self.refbook = Reference.objects.create(code='ICD-10', name='ICD-10')
+        handle, self.path = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(handle, 'w', encoding='utf-8') as stream:
+            stream.write('code,value\n')
+            for i in range(25):
+                stream.write(f'C{i:02d},value {i}\n')
+        self.addCleanup(os.remove, self.path)
+
+    def test_import_in_batches(self):
+        out = io.StringIO()
+        call_command('import_refbook', self.path, refbook='ICD-10', refbook_version='2.0',
+                     start_date=date(2024, 1, 1), batch_size=10, stdout=out)
+        version = ReferenceVersion.objects.get(reference=self.refbook, version='2.0')
+        self.assertEqual(ReferenceElement.objects.filter(version=version).count(), 25)
+        self.assertIn('rows/sec', out.getvalue())
+        self.assertIn('Imported 25 elements', out.getvalue())
+
+    def test_unknown_refbook(self):
+        with self.assertRaises(CommandError):
+            call_command('import_refbook', self.path, refbook='UNKNOWN', refbook_version='1.0',
+                         start_date=date(2024, 1, 1), stdout=io.StringIO())
+
+    def test_create_refbook(self):
+        call_command('import_refbook', self.path, refbook='NEW', refbook_version='1.0', name='New refbook',
+                     start_date=date(2024, 1, 1), stdout=io.StringIO())
+        self.assertEqual(ReferenceElement.objects.filter(version__reference__code='NEW').count(), 25)
+
+
+class RefbookImportViewTestCase(APITestCase):
+
+    def setUp(self):
+        element_cache.clear()
+        self.refbook = Reference.objects.create(code='ICD-10', name='ICD-10')
+        self.url = reverse('reference:import_refbook_version', args=[self.refbook.id])
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'admin')
+
+    def upload(self, content, name='elements.ndjson', **data):
+        data.setdefault('version', '1.0')
+        data.setdefault('start_date', '2022-01-01')
+        data['file'] = SimpleUploadedFile(name, content.encode())
+        return self.client.post(self.url, data, format='multipart')
+
+    def test_import_requires_admin(self):
+        response = self.upload('{"code": "J00", "value": "a"}\n')
+        self.assertIn(response.status_code, (status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN))
+
+    def test_import_ndjson(self):
+        self.client.force_authenticate(self.admin)
+        response = self.upload('{"code": "J00", "value": "a"}\n{"code": "J01", "value": "b"}\n')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['elements'], 2)
+        check_url = reverse('reference:check_refbook_element', args=[self.refbook.id])
+        response = self.client.get(check_url, {'code': 'J01', 'value': 'b', 'version': '1.0'})
+        self.assertEqual(response.data['exists'], True)
+
+    def test_duplicate_codes_roll_back(self):
+        self.client.force_authenticate(self.admin)
+        response = self.upload('code,value\nJ00,a\nJ00,b\n', name='elements.csv')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(ReferenceVersion.objects.filter(reference=self.refbook).exists())
+
+    def test_unknown_format(self):
+        self.client.force_authenticate(self.admin)
+        response = self.upload('J00;a', name='elements.txt')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
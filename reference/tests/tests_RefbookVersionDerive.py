@@ -0,0 +1,168 @@
+from datetime import date
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from reference import versioning
+from reference.cache import ElementLookup, element_cache
+from reference.models import Reference, ReferenceVersion, ReferenceElement
+from reference.search import search_elements
+
+
+class RefbookVersionDeriveViewTestCase(APITestCase):
+
+    def setUp(self):
+        element_cache.clear()
+        self.refbook = Reference.objects.create(code='ICD-10', name='ICD-10')
+        self.parent = ReferenceVersion.objects.create(reference=self.refbook, version='1.0',
+                                                      start_date=date(2022, 1, 1))
+        for code in ['A', 'B', 'C', 'D']:
+            ReferenceElement.objects.create(version=self.parent, code=code, value=code.lower())
+        self.url = reverse('reference:derive_refbook_version', args=[self.refbook.id])
+        self.client.force_authenticate(User.objects.create_superuser('admin', 'admin@example.com', 'admin'))
+
+    def derive(self, **data):
+        data = {'parent_version': '1.0', 'version': '2.0', 'start_date': '2023-01-01', **data}
+        return self.client.post(self.url, data, format='json')
+
+    def test_derive_version_from_delta(self):
+        response = self.derive(added=[{'code': 'E', 'value': 'e'}],
+                               changed=[{'code': 'B', 'value': 'b2'}],
+                               removed=['C'])
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['elements'], 4)
+        derived = ReferenceVersion.objects.get(reference=self.refbook, version='2.0')
+        self.assertEqual(derived.parent, self.parent)
+        self.assertEqual(dict(ReferenceElement.objects.in_version(derived.id).values_list('code', 'value')),
+                         {'A': 'a', 'B': 'b2', 'D': 'd', 'E': 'e'})
+        # Производная версия хранит только отличия от родительской
+        self.assertEqual(set(derived.referenceelement_set.values_list('code', 'removed')),
+                         {('B', False), ('C', True), ('E', False)})
+        self.assertEqual(self.parent.referenceelement_set.count(), 4)
+
+    def test_delta_checked_without_reading_parent_elements(self):
+        chunk_size, versioning.CHECK_CHUNK_SIZE = versioning.CHECK_CHUNK_SIZE, 2
+        self.addCleanup(setattr, versioning, 'CHECK_CHUNK_SIZE', chunk_size)
+        with CaptureQueriesContext(connection) as queries:
+            result = versioning.derive_version(self.parent, '2.0', date(2023, 1, 1), added=[('E', 'e')],
+                                               changed=[('B', 'b2')], removed=['C'])
+        self.assertEqual(result.count, 4)
+        selects = [query['sql'] for query in queries if query['sql'].startswith('SELECT')
+                   if 'FROM "reference_referenceelement"' in query['sql'] and 'COUNT(' not in query['sql']]
+        # Коды изменений проверяются запросами по CHECK_CHUNK_SIZE кодов, элементы родительской версии не копируются
+        self.assertEqual(len(selects), 2)
+        self.assertFalse([query for query in queries if 'INSERT' in query['sql'] and ' SELECT ' in query['sql']])
+        self.assertTrue(all(' IN (' in sql for sql in selects))
+
+    def test_derived_version_is_served_by_check_element(self):
+        self.derive(changed=[{'code': 'A', 'value': 'a2'}])
+        url = reverse('reference:check_refbook_element', args=[self.refbook.id])
+        response = self.client.get(url, {'code': 'A', 'value': 'a2'})
+        self.assertEqual(response.data['exists'], True)
+
+    def test_removed_code_must_exist_in_parent(self):
+        response = self.derive(removed=['Z'])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(ReferenceVersion.objects.filter(version='2.0').exists())
+
+    def test_added_code_must_be_new(self):
+        response = self.derive(added=[{'code': 'A', 'value': 'x'}])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_unknown_parent_version(self):
+        response = self.derive(parent_version='9.0')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_derive_requires_admin(self):
+        self.client.force_authenticate(None)
+        response = self.derive()
+        self.assertIn(response.status_code, (status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN))
+
+
+class DerivedVersionStorageTestCase(APITestCase):
+    """
+    Derived versions store only their delta; readers resolve the full element set through the parent chain.
+    """
+
+    def setUp(self):
+        element_cache.clear()
+        self.refbook = Reference.objects.create(code='ICD-10', name='ICD-10')
+        self.root = ReferenceVersion.objects.create(reference=self.refbook, version='1.0', start_date=date(2022, 1, 1))
+        ReferenceElement.objects.bulk_create(
+            ReferenceElement(version=self.root, code=code, value=f'{code.lower()} value') for code in 'ABCD')
+        self.middle = versioning.derive_version(self.root, '2.0', date(2023, 1, 1), added=[('E', 'e value')],
+                                                changed=[('B', 'b2 value')], removed=['C']).version
+        self.leaf = versioning.derive_version(self.middle, '3.0', date(2024, 1, 1), changed=[('E', 'e3 value')],
+                                              removed=['A']).version
+        self.expected = {'B': 'b2 value', 'D': 'd value', 'E': 'e3 value'}
+
+    def elements(self, version='3.0', **params):
+        url = reverse('reference:refbook_elements_list', args=[self.refbook.id])
+        return self.client.get(url, {'version': version, **params})
+
+    def test_readers_resolve_parent_chain(self):
+        self.assertEqual(ReferenceElement.objects.filter(version=self.leaf).count(), 2)
+        self.assertEqual({item['code']: item['value'] for item in self.elements().data['elements']}, self.expected)
+        self.assertEqual([item['code'] for item in self.elements(limit=2).data['elements']], ['B', 'D'])
+        streamed = b''.join(self.elements(stream='ndjson').streaming_content).decode()
+        self.assertEqual([line for line in streamed.splitlines() if line][-1], '{"code":"E","value":"e3 value"}')
+        self.assertEqual(dict(search_elements(self.refbook.id, self.leaf.id, query='value')), self.expected)
+        self.assertEqual(ElementLookup(self.leaf.id, ReferenceVersion.objects.chain(self.leaf.id)).contains_many(
+            [('A', 'a value'), ('B', 'b2 value'), ('C', 'c value'), ('D', 'd value')]), [False, True, False, True])
+
+    def test_parent_change_reaches_derived_versions(self):
+        leaf = self.elements()
+        with self.captureOnCommitCallbacks(execute=True):
+            element = ReferenceElement.objects.get(version=self.root, code='D')
+            element.value = 'd2 value'
+            element.save()
+        self.leaf.refresh_from_db()
+        self.assertEqual(self.leaf.revision, 2)
+        response = self.elements(HTTP_IF_NONE_MATCH=leaf['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual({item['code']: item['value'] for item in response.data['elements']}['D'], 'd2 value')
+
+    def test_parent_delete_materializes_children(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.middle.delete()
+        self.assertTrue([query for query in queries if query['sql'].startswith('INSERT')])
+        self.leaf.refresh_from_db()
+        self.assertIsNone(self.leaf.parent_id)
+        self.assertEqual(dict(ReferenceElement.objects.filter(version=self.leaf).values_list('code', 'value')),
+                         {'B': 'b2 value', 'D': 'd value', 'E': 'e3 value'})
+        self.assertFalse(ReferenceElement.objects.filter(removed=True, version=self.leaf).exists())
+
+
+class RefbookVersionDiffViewTestCase(APITestCase):
+
+    def setUp(self):
+        element_cache.clear()
+        self.refbook = Reference.objects.create(code='ICD-10', name='ICD-10')
+        old = ReferenceVersion.objects.create(reference=self.refbook, version='1.0', start_date=date(2022, 1, 1))
+        new = ReferenceVersion.objects.create(reference=self.refbook, version='2.0', start_date=date(2023, 1, 1))
+        ReferenceElement.objects.bulk_create([
+            ReferenceElement(version=old, code='A', value='a'),
+            ReferenceElement(version=old, code='B', value='b'),
+            ReferenceElement(version=old, code='C', value='c'),
+            ReferenceElement(version=new, code='A', value='a'),
+            ReferenceElement(version=new, code='B', value='b2'),
+            ReferenceElement(version=new, code='D', value='d'),
+        ])
+        self.url = reverse('reference:diff_refbook_versions', args=[self.refbook.id])
+
+    def test_diff(self):
+        response = self.client.get(self.url, {'from': '1.0', 'to': '2.0'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['added'], [{'code': 'D', 'value': 'd'}])
+        self.assertEqual(response.data['changed'], [{'code': 'B', 'old_value': 'b', 'new_value': 'b2'}])
+        self.assertEqual(response.data['removed'], [{'code': 'C', 'value': 'c'}])
+
+    def test_diff_unknown_version(self):
+        response = self.client.get(self.url, {'from': '1.0', 'to': '9.0'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_diff_requires_both_versions(self):
+        response = self.client.get(self.url, {'from': '1.0'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
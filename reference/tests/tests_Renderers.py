@@ -0,0 +1,64 @@
+import gzip
+import json
+from datetime import date
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+from reference.cache import element_cache
+from reference.middleware import brotli
+from reference.models import Reference, ReferenceVersion, ReferenceElement
+from reference.renderers import ORJSONRenderer, msgpack
+
+
+class RenderersTestCase(APITestCase):
+
+    def setUp(self):
+        element_cache.clear()
+        self.refbook = Reference.objects.create(code='ICD-10', name='ICD-10')
+        self.version = ReferenceVersion.objects.create(reference=self.refbook, version='1.0',
+                                                       start_date=date(2022, 1, 1))
+        ReferenceElement.objects.bulk_create(
+            ReferenceElement(version=self.version, code=f'J{number:03}', value=f'Значение {number}')
+            for number in range(200)
+        )
+        self.url = reverse('reference:refbook_elements_list', args=[self.refbook.id])
+
+    def test_orjson_output_matches_json_renderer(self):
+        data = {'elements': [{'code': 'J00', 'value': 'Острый назофарингит'}], 'date': date(2023, 1, 1),
+                'exists': True, 'count': 1, 'next': None}
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_json_is_default(self):
+        response = self.client.get(self.url, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(len(json.loads(response.content)['elements']), 200)
+
+    def test_msgpack(self):
+        response = self.client.get(self.url, HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        self.assertEqual(msgpack.unpackb(response.content)['elements'][0], {'code': 'J000', 'value': 'Значение 0'})
+
+    def test_gzip_for_large_responses(self):
+        response = self.client.get(self.url, {'version': '1.0'}, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(len(json.loads(gzip.decompress(response.content))['elements']), 200)
+
+        # Сжатый ответ получает слабый ETag, по которому условный запрос возвращает 304
+        etag = response['ETag']
+        self.assertTrue(etag.startswith('W/"'))
+        response = self.client.get(self.url, {'version': '1.0'}, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_small_responses_are_not_compressed(self):
+        url = reverse('reference:check_refbook_element', args=[self.refbook.id])
+        response = self.client.get(url, {'code': 'J000', 'value': 'Значение 0'}, HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertNotIn('Content-Encoding', response)
+        self.assertEqual(response.data, {'exists': True})
+
+    def test_brotli_preferred_when_accepted(self):
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(len(json.loads(brotli.decompress(response.content))['elements']), 200)
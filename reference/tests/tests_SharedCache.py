@@ -0,0 +1,113 @@
+import shutil
+import tempfile
+from datetime import date
+from asgiref.sync import async_to_sync
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from reference.cache import VersionElementCache, element_cache
+from reference.models import Reference, ReferenceVersion, ReferenceElement
+
+
+class SharedCacheMixin:
+    """
+    Подключает общий кэш справочников на время теста.
+    """
+    cache_backend = 'django.core.cache.backends.locmem.LocMemCache'
+
+    def setUp(self):
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location, ignore_errors=True)
+        shared_settings = self.settings(
+            CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+                    'reference': {'BACKEND': self.cache_backend, 'LOCATION': location}},
+            REFERENCE_CACHE_ALIAS='reference',
+        )
+        shared_settings.enable()
+        self.addCleanup(shared_settings.disable)
+        element_cache.clear()
+        super().setUp()
+
+
+class FileBasedSharedCacheTestCase(SharedCacheMixin, TestCase):
+    """
+    Два экземпляра VersionElementCache имитируют два процесса с общим файловым кэшем.
+    """
+    cache_backend = 'django.core.cache.backends.filebased.FileBasedCache'
+
+    def setUp(self):
+        super().setUp()
+        self.refbook = Reference.objects.create(code='ref1', name='Reference 1')
+        self.version = ReferenceVersion.objects.create(reference=self.refbook, version='1.0',
+                                                       start_date=date(2022, 1, 1))
+        ReferenceElement.objects.create(version=self.version, code='A', value='a')
+        self.worker_a = VersionElementCache(max_bytes=1024 * 1024)
+        self.worker_b = VersionElementCache(max_bytes=1024 * 1024)
+
+    def test_second_worker_is_warmed_by_first(self):
+        self.worker_a.get_versions(self.refbook.id)
+        self.worker_a.get_elements(self.refbook.id, self.version.id)
+        with self.assertNumQueries(0):
+            self.worker_b.get_versions(self.refbook.id)
+            self.assertEqual(self.worker_b.get_elements(self.refbook.id, self.version.id), {'A': 'a'})
+
+    def test_async_read_from_shared_cache(self):
+        self.worker_a.get_elements(self.refbook.id, self.version.id)
+        with self.assertNumQueries(0):
+            self.assertEqual(async_to_sync(self.worker_b.aget_elements)(self.refbook.id, self.version.id), {'A': 'a'})
+            self.assertEqual(async_to_sync(self.worker_b.aget_elements)(self.refbook.id, self.version.id), {'A': 'a'})
+        self.assertEqual(self.worker_b.stats()['hits'], 1)
+
+    def test_write_invalidates_all_workers(self):
+        self.worker_a.get_elements(self.refbook.id, self.version.id)
+        self.worker_b.get_elements(self.refbook.id, self.version.id)
+        ReferenceElement.objects.create(version=self.version, code='B', value='b')
+        self.assertEqual(self.worker_a.get_elements(self.refbook.id, self.version.id), {'A': 'a', 'B': 'b'})
+        self.assertEqual(self.worker_b.get_elements(self.refbook.id, self.version.id), {'A': 'a', 'B': 'b'})
+
+    def test_new_version_invalidates_versions(self):
+        self.worker_b.get_versions(self.refbook.id)
+        ReferenceVersion.objects.create(reference=self.refbook, version='2.0', start_date=date(2023, 1, 1))
+        self.assertEqual([item.version for item in self.worker_b.get_versions(self.refbook.id)], ['1.0', '2.0'])
+
+    def test_bulk_resolve_reads_shared_cache(self):
+        self.worker_a.get_versions(self.refbook.id)
+        with self.assertNumQueries(0):
+            resolved = self.worker_b.bulk_resolve([self.refbook.id], date(2022, 6, 1))
+        self.assertEqual(resolved[self.refbook.id].id, self.version.id)
+
+    def test_current_version_is_cached(self):
+        self.refbook.get_current_version()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.refbook.get_current_version().id, self.version.id)
+
+
+class RedisStyleSharedCacheTestCase(SharedCacheMixin, APITestCase):
+    """
+    LocMemCache выступает локальной заменой Redis: общее хранилище ключей с атомарным incr.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.refbook = Reference.objects.create(code='ref1', name='Reference 1')
+        ReferenceVersion.objects.create(reference=self.refbook, version='1.0', start_date=date(2022, 1, 1))
+
+    def test_refbook_list_payload_is_cached(self):
+        url = reverse('reference:refbook-list')
+        self.client.get(url, {'date': '2022-06-30'})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {'date': '2022-06-30'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['refbooks']), 1)
+        self.assertEqual(len(queries), 0)
+
+    def test_refbook_list_is_invalidated_by_new_refbook_version(self):
+        url = reverse('reference:refbook-list')
+        self.client.get(url)
+        other = Reference.objects.create(code='ref2', name='Reference 2')
+        ReferenceVersion.objects.create(reference=other, version='1.0', start_date=date(2022, 1, 1))
+        response = self.client.get(url)
+        self.assertEqual(len(response.data['refbooks']), 2)
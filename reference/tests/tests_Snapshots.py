@@ -0,0 +1,126 @@
+import io
+import os
+import shutil
+import tempfile
+from datetime import date
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from reference.cache import element_cache
+from reference.models import Reference, ReferenceVersion, ReferenceElement
+from reference.snapshots import VersionSnapshot, build_snapshot, snapshot_path, snapshots, write_snapshot
+
+
+class VersionSnapshotTestCase(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def test_lookup_and_order(self):
+        """
+        Elements keep their id order, lookups use the sorted code array.
+        """
+        rows = [('J01', 'Синусит'), ('A00', 'Холера'), ('Z99', ''), ('B', 'b')]
+        snapshot = VersionSnapshot(write_snapshot(7, 3, rows, self.directory))
+        self.assertEqual((snapshot.version_id, snapshot.revision, len(snapshot)), (7, 3, 4))
+        self.assertEqual(list(snapshot.items()), rows)
+        for code, value in rows:
+            self.assertTrue(snapshot.contains(code, value))
+            self.assertEqual(snapshot.get(code), value)
+        self.assertFalse(snapshot.contains('J01', 'Синус'))
+        self.assertFalse(snapshot.contains('A0', 'Холера'))
+        self.assertIsNone(snapshot.get('ZZZ'))
+
+    def test_empty(self):
+        snapshot = VersionSnapshot(write_snapshot(1, 1, [], self.directory))
+        self.assertEqual(list(snapshot.items()), [])
+        self.assertFalse(snapshot.contains('A', 'a'))
+
+    def test_atomic_replace(self):
+        """
+        Rewriting a snapshot replaces the file; an already opened snapshot keeps reading the old data.
+        """
+        old = VersionSnapshot(write_snapshot(1, 1, [('A', 'old')], self.directory))
+        write_snapshot(1, 2, [('A', 'new')], self.directory)
+        self.assertEqual(old.get('A'), 'old')
+        self.assertEqual(VersionSnapshot(snapshot_path(1, self.directory)).get('A'), 'new')
+        self.assertEqual(os.listdir(self.directory), ['1.snap'])
+
+
+class SnapshotViewsTestCase(APITestCase):
+
+    def setUp(self):
+        element_cache.clear()
+        snapshots.clear()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        settings_override = override_settings(REFERENCE_SNAPSHOT_DIR=self.directory)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.refbook = Reference.objects.create(code='ICD-10', name='ICD-10')
+        self.version = ReferenceVersion.objects.create(reference=self.refbook, version='1.0',
+                                                       start_date=date(2022, 1, 1))
+        ReferenceElement.objects.create(version=self.version, code='J00', value='Acute nasopharyngitis')
+        ReferenceElement.objects.create(version=self.version, code='A00', value='Cholera')
+
+    def test_views_read_from_snapshot(self):
+        """
+        With a fresh snapshot, elements and check views do not query elements through the ORM.
+        """
+        call_command('build_snapshot', stdout=io.StringIO())
+        check_url = reverse('reference:check_refbook_element', args=[self.refbook.id])
+        elements_url = reverse('reference:refbook_elements_list', args=[self.refbook.id])
+        self.client.get(check_url, {'code': 'J00', 'value': 'x', 'version': '1.0'})
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(check_url, {'code': 'J00', 'value': 'Acute nasopharyngitis',
+                                                   'version': '1.0'})
+            self.assertEqual(response.data, {'exists': True})
+            response = self.client.get(elements_url, {'version': '1.0'})
+            self.assertEqual(response.data['elements'], [{'code': 'J00', 'value': 'Acute nasopharyngitis'},
+                                                         {'code': 'A00', 'value': 'Cholera'}])
+        self.assertFalse([query for query in queries if 'reference_referenceelement' in query['sql']])
+        self.assertEqual(element_cache.stats()['entries'], 1)
+
+    def test_stale_snapshot_is_ignored(self):
+        """
+        After an element changes, the old snapshot's revision no longer matches and is not used.
+        """
+        build_snapshot(self.version.id)
+        ReferenceElement.objects.filter(code='J00').get().delete()
+        # После фиксации увеличивается ревизия версии, а снимок ещё не перестроен
+        for _, callback, _ in connection.run_on_commit:
+            if getattr(callback, 'revision_version_id', None) == self.version.id:
+                callback()
+        url = reverse('reference:check_refbook_element', args=[self.refbook.id])
+        response = self.client.get(url, {'code': 'J00', 'value': 'Acute nasopharyngitis', 'version': '1.0'})
+        self.assertEqual(response.data, {'exists': False})
+
+    def test_rebuilt_on_commit(self):
+        """
+        Changes to a version rebuild its snapshot once after the transaction commits.
+        """
+        ReferenceElement.objects.create(version=self.version, code='B00', value='Typhoid')
+        ReferenceElement.objects.create(version=self.version, code='B01', value='Paratyphoid')
+        pending = [item[1] for item in connection.run_on_commit
+                   if getattr(item[1], 'snapshot_version_id', None) == self.version.id]
+        self.assertEqual(len(pending), 1)
+        pending[0]()
+        snapshot = VersionSnapshot(snapshot_path(self.version.id))
+        self.version.refresh_from_db()
+        self.assertEqual(snapshot.revision, self.version.revision)
+        self.assertTrue(snapshot.contains('B01', 'Paratyphoid'))
+
+        version_id = self.version.id
+        with self.captureOnCommitCallbacks(execute=True):
+            self.version.delete()
+        self.assertFalse(os.path.exists(snapshot_path(version_id)))
+
+    def test_command_requires_directory(self):
+        with override_settings(REFERENCE_SNAPSHOT_DIR=None), self.assertRaises(CommandError):
+            call_command('build_snapshot', stdout=io.StringIO())
@@ -0,0 +1,65 @@
+from datetime import date
+from django.test import TestCase
+from reference.cache import VersionInfo, element_cache, find_version_on_date
+from reference.models import Reference, ReferenceVersion
+
+
+def version_info(start_date, version_id, version):
+    return VersionInfo(start_date=start_date, id=version_id, version=version,
+                       parent_id=None, revision=1, updated_at=None)
+
+
+class FindVersionOnDateTestCase(TestCase):
+
+    def setUp(self):
+        self.versions = (
+            version_info(date(2022, 1, 1), 1, '1.0'),
+            version_info(date(2023, 1, 1), 2, '2.0'),
+            version_info(date(2024, 1, 1), 3, '3.0'),
+        )
+
+    def test_date_before_first_version(self):
+        self.assertIsNone(find_version_on_date(self.versions, date(2021, 12, 31)))
+
+    def test_date_equal_to_start_date(self):
+        self.assertEqual(find_version_on_date(self.versions, date(2023, 1, 1)).version, '2.0')
+
+    def test_date_between_versions(self):
+        self.assertEqual(find_version_on_date(self.versions, date(2023, 6, 30)).version, '2.0')
+
+    def test_date_after_last_version(self):
+        self.assertEqual(find_version_on_date(self.versions, date(2030, 1, 1)).version, '3.0')
+
+    def test_no_versions(self):
+        self.assertIsNone(find_version_on_date((), date(2023, 1, 1)))
+
+
+class BulkResolveTestCase(TestCase):
+
+    def setUp(self):
+        element_cache.clear()
+        self.refbooks = []
+        for i in range(3):
+            refbook = Reference.objects.create(code=f'ref{i}', name=f'Reference {i}')
+            ReferenceVersion.objects.create(reference=refbook, version='1.0', start_date=date(2022, 1, 1))
+            ReferenceVersion.objects.create(reference=refbook, version='2.0', start_date=date(2023 + i, 1, 1))
+            self.refbooks.append(refbook)
+        self.empty = Reference.objects.create(code='empty', name='Empty')
+
+    def test_bulk_resolve_uses_one_query(self):
+        refbook_ids = [refbook.id for refbook in self.refbooks] + [self.empty.id]
+        with self.assertNumQueries(1):
+            resolved = element_cache.bulk_resolve(refbook_ids, date(2024, 6, 1))
+        self.assertEqual([resolved[refbook.id].version for refbook in self.refbooks], ['2.0', '2.0', '1.0'])
+        self.assertIsNone(resolved[self.empty.id])
+
+    def test_bulk_resolve_is_served_from_cache(self):
+        refbook_ids = [refbook.id for refbook in self.refbooks]
+        element_cache.bulk_resolve(refbook_ids, date(2024, 6, 1))
+        with self.assertNumQueries(0):
+            resolved = element_cache.bulk_resolve(refbook_ids, date(2022, 6, 1))
+        self.assertEqual({item.version for item in resolved.values()}, {'1.0'})
+
+    def test_get_version_on_date(self):
+        self.assertEqual(self.refbooks[0].get_version_on_date(date(2023, 1, 1)).version, '2.0')
+        self.assertIsNone(self.refbooks[0].get_version_on_date(date(2021, 1, 1)))
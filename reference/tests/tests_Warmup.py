@@ -0,0 +1,112 @@
+import asyncio
+import threading
+import time
+from datetime import date, timedelta
+from io import StringIO
+from asgiref.sync import sync_to_async
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+from reference import cache
+from reference.cache import SharedCache, VersionElementCache, element_cache
+from reference.models import Reference, ReferenceVersion, ReferenceElement
+from reference.tests.tests_SharedCache import SharedCacheMixin
+from reference.warmup import start_scheduler, upcoming_versions
+
+
+class SingleFlightTestCase(SimpleTestCase):
+
+    def test_one_thread_loads_missing_entry(self):
+        worker = VersionElementCache(max_bytes=1024 * 1024)
+        calls = []
+
+        def load():
+            calls.append(1)
+            time.sleep(0.05)
+            return {'A': 'a'}
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(worker._fetch(('elements', 1, 1, 0), load, len)))
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{'A': 'a'}] * 8)
+        self.assertEqual(worker._flights, {})
+
+
+class SharedSingleFlightTestCase(SharedCacheMixin, SimpleTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.shared = SharedCache()
+        self.key = self.shared.key('elements', 1, 1, 0)
+
+    def test_waits_for_other_process(self):
+        # Блокировка загрузки занята другим процессом, который сохраняет запись чуть позже
+        self.shared.cache.add(f'{self.key}:lock', 1)
+        timer = threading.Timer(0.05, self.shared.set, [self.key, {'A': 'a'}])
+        timer.start()
+        self.addCleanup(timer.join)
+        self.assertEqual(self.shared.get_or_build(self.key, lambda: self.fail('loaded twice')), {'A': 'a'})
+
+    def test_loads_itself_after_timeout(self):
+        self.shared.cache.add(f'{self.key}:lock', 1)
+        timeout, cache.BUILD_WAIT_TIMEOUT = cache.BUILD_WAIT_TIMEOUT, 0.1
+        self.addCleanup(setattr, cache, 'BUILD_WAIT_TIMEOUT', timeout)
+        self.assertEqual(self.shared.get_or_build(self.key, lambda: {'B': 'b'}), {'B': 'b'})
+
+    async def test_async_wait_does_not_hold_thread(self):
+        async def load():
+            self.fail('loaded twice')
+
+        self.shared.cache.add(f'{self.key}:lock', 1)
+        waiting = asyncio.ensure_future(self.shared.aget_or_build(self.key, load))
+        await asyncio.sleep(0.02)
+        # Пока корутина ждёт запись другого процесса, поток для синхронного кода свободен
+        self.assertEqual(await asyncio.wait_for(sync_to_async(lambda: 1)(), timeout=1), 1)
+        self.shared.set(self.key, {'A': 'a'})
+        self.assertEqual(await waiting, {'A': 'a'})
+
+    def test_stores_loaded_entry_and_releases_lock(self):
+        self.assertEqual(self.shared.get_or_build(self.key, lambda: {'C': 'c'}), {'C': 'c'})
+        self.assertEqual(self.shared.get(self.key), {'C': 'c'})
+        self.assertIsNone(self.shared.cache.get(f'{self.key}:lock'))
+
+
+class WarmupTestCase(TestCase):
+
+    def setUp(self):
+        element_cache.clear()
+        self.today = date.today()
+        self.refbook = Reference.objects.create(code='ICD-10', name='ICD-10')
+        self.current = ReferenceVersion.objects.create(reference=self.refbook, version='1.0',
+                                                       start_date=self.today - timedelta(days=10))
+        self.upcoming = ReferenceVersion.objects.create(reference=self.refbook, version='2.0',
+                                                        start_date=self.today + timedelta(days=1))
+        ReferenceVersion.objects.create(reference=self.refbook, version='3.0',
+                                        start_date=self.today + timedelta(days=30))
+        for version in [self.current, self.upcoming]:
+            ReferenceElement.objects.create(version=version, code='J00', value=version.version)
+        element_cache.clear()
+
+    def test_upcoming_versions(self):
+        self.assertEqual([item.version for _, item in upcoming_versions(today=self.today)], ['2.0'])
+        self.assertEqual([item.version for _, item in upcoming_versions(today=self.today, current=True)],
+                         ['2.0', '1.0'])
+        self.assertEqual([item.version for _, item in upcoming_versions(days=30, today=self.today)],
+                         ['2.0', '3.0'])
+
+    def test_command_warms_version_before_switch(self):
+        out = StringIO()
+        call_command('warm_cache', date=self.today, stdout=out)
+        self.assertIn('Warmed 1 versions', out.getvalue())
+
+        # В день смены версии элементы и индекс новой версии берутся из памяти, без запросов к базе
+        with self.assertNumQueries(0):
+            self.assertEqual(element_cache.get_elements(self.refbook.id, self.upcoming.id), {'J00': '2.0'})
+            self.assertTrue(element_cache.get_index(self.refbook.id, self.upcoming.id).contains('J00', '2.0'))
+
+    def test_scheduler_is_disabled_by_default(self):
+        self.assertIsNone(start_scheduler())
@@ -2,7 +2,10 @@ from django.urls import path
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 from rest_framework import permissions
-from .views import RefBookList, RefbookElementsView, RefbookElementCheckView
+from . import async_views
+from .views import (RefBookList, RefbookElementsView, RefbookElementCheckView, RefbookElementsBulkCheckView,
+                    RefbookImportView, RefbookVersionDeriveView, RefbookVersionDiffView, RefbookElementSearchView,
+                    RefbookDocumentValidateView, RefbookChangesView, metrics_view)
 
 app_name = 'reference'
 
@@ -22,8 +25,24 @@ schema_view = get_schema_view(
 
 urlpatterns = [
     path('refbooks/', RefBookList.as_view(), name='refbook-list'),
+    path('refbooks/validate/', RefbookDocumentValidateView.as_view(), name='validate_document'),
     path('refbooks/<int:id>/elements/', RefbookElementsView.as_view(), name='refbook_elements_list'),
     path('refbooks/<int:id>/check_element/', RefbookElementCheckView.as_view(), name='check_refbook_element'),
+    path('refbooks/<int:id>/check_elements/', RefbookElementsBulkCheckView.as_view(),
+         name='bulk_check_refbook_elements'),
+    path('refbooks/code/<str:code>/check_elements/', RefbookElementsBulkCheckView.as_view(),
+         name='bulk_check_refbook_elements_by_code'),
+    path('refbooks/<int:id>/import/', RefbookImportView.as_view(), name='import_refbook_version'),
+    path('refbooks/<int:id>/derive/', RefbookVersionDeriveView.as_view(), name='derive_refbook_version'),
+    path('refbooks/<int:id>/diff/', RefbookVersionDiffView.as_view(), name='diff_refbook_versions'),
+    path('refbooks/<int:id>/search/', RefbookElementSearchView.as_view(), name='search_refbook_elements'),
+    path('refbooks/<int:id>/changes/', RefbookChangesView.as_view(), name='refbook_changes'),
+    path('async/refbooks/', async_views.refbook_list, name='async-refbook-list'),
+    path('async/refbooks/<int:id>/elements/', async_views.refbook_elements, name='async_refbook_elements_list'),
+    path('async/refbooks/<int:id>/check_element/', async_views.check_element, name='async_check_refbook_element'),
+    path('async/refbooks/events/', async_views.refbook_events, name='async_refbook_events'),
+    path('async/refbooks/events/poll/', async_views.refbook_events_poll, name='async_refbook_events_poll'),
+    path('metrics/', metrics_view, name='metrics'),
     path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
     path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
 ]
@@ -0,0 +1,129 @@
+from collections import namedtuple
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Exists, OuterRef
+
+from . import changelog
+from .importers import RefbookImportError
+from .models import ReferenceChange, ReferenceVersion, ReferenceElement
+
+# Число кодов в одном запросе проверки изменений
+CHECK_CHUNK_SIZE = 500
+
+DerivationResult = namedtuple('DerivationResult', ['version', 'count'])
+VersionDiff = namedtuple('VersionDiff', ['added', 'changed', 'removed'])
+
+
+def _parent_codes(parent, codes):
+    """
+    Возвращает коды из codes, которые есть в родительской версии: запросы по CHECK_CHUNK_SIZE кодов
+    используют индекс (version, code) и не читают остальные элементы версии.
+    """
+    elements = ReferenceElement.objects.in_version(parent.id)
+    found = set()
+    for start in range(0, len(codes), CHECK_CHUNK_SIZE):
+        found.update(elements.filter(code__in=codes[start:start + CHECK_CHUNK_SIZE]).values_list('code', flat=True))
+    return found
+
+
+def _check_delta(parent, added, changed, removed):
+    codes = [code for code, _ in added] + [code for code, _ in changed] + list(removed)
+    if len(codes) != len(set(codes)):
+        raise RefbookImportError('Each code may appear only once in added, changed and removed')
+    parent_elements = _parent_codes(parent, codes)
+    for code, _ in added:
+        if code in parent_elements:
+            raise RefbookImportError(f'Added code "{code}" already exists in the parent version')
+    for code in [code for code, _ in changed] + list(removed):
+        if code not in parent_elements:
+            raise RefbookImportError(f'Code "{code}" does not exist in the parent version')
+
+
+def derive_version(parent, version, start_date, added=(), changed=(), removed=()):
+    """
+    Создаёт новую версию справочника как набор изменений относительно родительской версии.
+
+    Новая версия хранит только отличия от родительской: добавленные и изменённые элементы
+    и отметки удаления (ReferenceElement.removed) для удалённых кодов. Полный набор её элементов
+    собирается по цепочке родительских версий (ReferenceElementQuerySet.in_version) при заполнении
+    кэша элементов и построении снимка версии, поэтому создание версии не копирует элементы родительской.
+    В Python обрабатываются только изменения, они проверяются запросами по их кодам.
+
+    :argument:
+        parent (ReferenceVersion): родительская версия
+        version (str): номер новой версии
+        start_date (date): дата начала действия новой версии
+        added (list[tuple[str, str]]): новые элементы (код, значение)
+        changed (list[tuple[str, str]]): элементы с изменённым значением (код, новое значение)
+        removed (list[str]): коды удалённых элементов
+
+    :returns:
+        DerivationResult(version, count)
+    Raises: RefbookImportError:
+        если изменения не согласуются с родительской версией или версия не уникальна
+    """
+    added, changed, removed = list(added), list(changed), list(removed)
+    _check_delta(parent, added, changed, removed)
+
+    try:
+        with transaction.atomic():
+            derived = ReferenceVersion.objects.create(
+                reference_id=parent.reference_id, version=version, start_date=start_date, parent=parent
+            )
+            ReferenceElement.objects.bulk_create([
+                *(ReferenceElement(version=derived, code=code, value=value) for code, value in added + changed),
+                *(ReferenceElement(version=derived, code=code, value='', removed=True) for code in removed),
+            ])
+            # Запись о новой версии с родительской уже в журнале (сигнал): добавляем только отличия от родительской
+            changelog.record(derived.reference_id, [
+                *(changelog.element_change(derived.id, version, ReferenceChange.DELETE, code) for code in removed),
+                *(changelog.element_change(derived.id, version, ReferenceChange.UPDATE, code, value)
+                  for code, value in changed),
+                *(changelog.element_change(derived.id, version, ReferenceChange.INSERT, code, value)
+                  for code, value in added),
+            ])
+    except IntegrityError as error:
+        raise RefbookImportError(f'Version is not unique ({error})')
+    count = ReferenceElement.objects.in_version(parent.id).count()
+    return DerivationResult(derived, count - len(removed) + len(added))
+
+
+def materialize_children(parent):
+    """
+    Сохраняет в версиях, созданных от parent, полный набор их элементов: элементы parent, которые они
+    наследуют, копируются одним запросом INSERT ... SELECT, а отметки удаления удаляются.
+    Вызывается перед удалением parent, после которого версии остаются без родительской (on_delete=SET_NULL).
+    Содержимое версий не меняется, поэтому сигналы элементов не отправляются.
+    """
+    children = list(parent.children.values_list('id', flat=True))
+    if not children:
+        return
+    table = connection.ops.quote_name(ReferenceElement._meta.db_table)
+    inherited = ReferenceElement.objects.in_version(parent.id)
+    with connection.cursor() as cursor:
+        for child_id in children:
+            own = ReferenceElement.objects.filter(version_id=child_id, code=OuterRef('code'))
+            sql, params = inherited.filter(~Exists(own)).values_list('code', 'value').query.sql_with_params()
+            cursor.execute(
+                f'INSERT INTO {table} (version_id, code, value, removed) SELECT %s, code, value, %s FROM ({sql}) inherited',
+                [child_id, False, *params],
+            )
+            cursor.execute(f'DELETE FROM {table} WHERE version_id = %s AND removed = %s', [child_id, True])
+
+
+def diff_elements(old, new):
+    """
+    Сравнивает элементы двух версий справочника.
+
+    :argument:
+        old (dict): элементы старой версии, код → значение
+        new (dict): элементы новой версии, код → значение
+
+    :returns:
+        VersionDiff(added, changed, removed), отсортированные по коду:
+        added — [(код, значение)], changed — [(код, старое значение, новое значение)], removed — [(код, значение)]
+    """
+    added = [(code, new[code]) for code in sorted(new.keys() - old.keys())]
+    removed = [(code, old[code]) for code in sorted(old.keys() - new.keys())]
+    changed = [(code, old[code], new[code]) for code in sorted(old.keys() & new.keys()) if old[code] != new[code]]
+    return VersionDiff(added, changed, removed)
@@ -1,11 +1,59 @@
+import datetime
+import io
+import ipaddress
+
+from django.conf import settings
+from django.db.models import Exists, OuterRef
+from django.http import HttpResponse, HttpResponseForbidden
+from django.views.decorators.http import require_GET
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
-from rest_framework import generics
+from rest_framework import generics, permissions
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from django.shortcuts import get_object_or_404
+from .cache import element_cache, find_version, find_version_on_date
+from .changelog import SYNC_DEFAULT_LIMIT, SYNC_MAX_LIMIT, changes_since, latest_cursor
+from .conditional import not_modified_response, set_cache_headers
+from .metrics import render_metrics
+from .importers import RefbookImportError, guess_format, import_version, iter_rows
 from .models import Reference, ReferenceVersion, ReferenceElement
-from .serializers import RefBookSerializer, RefBookElementSerializer
+from .pagination import RefBookPagination, ElementCursorPagination
+from .search import SEARCH_DEFAULT_LIMIT, SEARCH_MAX_LIMIT, search_elements
+from .streaming import stream_elements, stream_format
+from .versioning import derive_version, diff_elements
+from .snapshots import element_index, element_items, snapshots
+from .serializers import (RefBookSerializer, RefBookElementSerializer, BulkCheckElementsSerializer,
+                          RefbookImportSerializer, DeriveVersionSerializer, ElementSearchSerializer,
+                          ValidateDocumentSerializer, ChangesQuerySerializer)
+
+
+def get_refbook_versions(refbook_id):
+    """
+    Возвращает версии справочника (VersionInfo) из кэша.
+
+    Raises: Http404:
+    В случае отсутствия запрашиваемого справочника.
+    """
+    versions = element_cache.get_versions(refbook_id)
+    if not versions:
+        get_object_or_404(Reference, id=refbook_id)
+    return versions
+
+
+def refbooks_queryset(date):
+    """
+    Возвращает справочники (id, code, name), у которых есть версии, действующие на дату date,
+    или все справочники с версиями, если дата не указана.
+    Список строится одним запросом с подзапросом EXISTS по версиям и кэшируется целиком
+    (VersionElementCache.get_refbook_list). Определение версий всех справочников через bulk_resolve
+    здесь не используется: оно загружало бы в кэш версии каждого справочника ради одного списка.
+    """
+    versions = ReferenceVersion.objects.filter(reference=OuterRef('pk'))
+    if date is not None:
+        versions = versions.filter(start_date__lte=date)
+    return Reference.objects.filter(Exists(versions)).order_by('id').values(*RefBookSerializer.Meta.fields)
 
 
 class RefBookList(APIView):
@@ -15,7 +63,9 @@ class RefBookList(APIView):
     Methods:
         get(request): Возвращает ответ JSON, содержащий список допустимых справочников.
         В указанную дату, если она предусмотрена. Если дата не указана, возвращает все доступные справочники.
+        Если передан параметр limit, список разбивается на страницы.
     """
+    pagination_class = RefBookPagination
 
     @swagger_auto_schema(
         operation_summary="Get list of reference books",
@@ -28,24 +78,40 @@ class RefBookList(APIView):
                 required=False,
                 type=openapi.TYPE_STRING,
                 description='Date for filtering the list of reference books in format yyyy-mm-dd.'
-            )
+            ),
+            openapi.Parameter(
+                name='limit',
+                in_=openapi.IN_QUERY,
+                required=False,
+                type=openapi.TYPE_INTEGER,
+                description='Number of reference books per page. If omitted, the whole list is returned.'
+            ),
+            openapi.Parameter(
+                name='offset',
+                in_=openapi.IN_QUERY,
+                required=False,
+                type=openapi.TYPE_INTEGER,
+                description='Index of the first reference book on the page.'
+            ),
         ]
     )
     def get(self, request):
         date = self.request.query_params.get('date', None)
-        refbooks = []
-        for reference in Reference.objects.all():
-            if date is not None:
-                versions = ReferenceVersion.objects.filter(
-                    reference=reference, start_date__lte=date
-                ).order_by('-start_date')
-            else:
-                versions = ReferenceVersion.objects.filter(reference=reference).order_by('-start_date')
-            if versions.exists():
-                serializer = RefBookSerializer({'id': reference.id, 'code': reference.code, 'name': reference.name})
-                refbooks.append(serializer.data)
+        refbooks = element_cache.get_refbook_list(date, lambda: self.get_refbooks(date))
+
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(refbooks, request, view=self)
+        if page is not None:
+            return paginator.get_paginated_response(page)
         return Response({'refbooks': refbooks})
 
+    def get_refbooks(self, date):
+        """
+        Возвращает список справочников, у которых есть версии, действующие на дату date.
+        Если дата не указана, возвращает все справочники, у которых есть версии.
+        """
+        return list(refbooks_queryset(date))
+
 
 class RefbookElementsView(generics.RetrieveAPIView):
     """
@@ -53,40 +119,32 @@ class RefbookElementsView(generics.RetrieveAPIView):
 
     """
     serializer_class = RefBookElementSerializer
+    pagination_class = ElementCursorPagination
 
-
-    def get_queryset(self):
+    def get_version(self):
         """
         :argument:
         id (int): Идентификатор справочника.
         version (str, optional): Версия справочника для проверки.
 
-        :return: elements : list
-        Список элементов справочника.
+        :return: VersionInfo запрошенной (или текущей) версии справочника или None, если такой версии нет.
         Raises: Http404:
-        В случае отсутствия запрашиваемого справочника или его версии.
+        В случае отсутствия запрашиваемого справочника.
+
+        Версия одного справочника определяется по его версиям из кэша (get_versions);
+        bulk_resolve и get_versions_many нужны, когда справочников несколько (RefbookDocumentValidateView).
         """
         refbook_id = self.kwargs.get('id')
         version = self.request.query_params.get('version')
 
-        refbook = get_object_or_404(Reference, id=refbook_id)
+        versions = get_refbook_versions(refbook_id)
 
-        # Получить текущую версию справочника
-        current_version = refbook.get_current_version()
-
-        # Если указана версия, отфильтровать элементы по версии
+        # Если указана версия, отфильтровать элементы по версии,
+        # в противном случае получить элементы из текущей версии
         if version:
-            refbook_version = ReferenceVersion.objects.filter(reference=refbook, version=version).first()
-            if refbook_version:
-                elements = ReferenceElement.objects.filter(version=refbook_version)
-                current_version = refbook_version
-            else:
-                elements = ReferenceElement.objects.none()
-        # В противном случае получить элементы из текущей версии
-        else:
-            elements = ReferenceElement.objects.filter(version=current_version)
+            return find_version(versions, version)
+        return find_version_on_date(versions, datetime.date.today())
 
-        return elements
     @swagger_auto_schema(
         operation_summary="Get elements of reference book",
         operation_description="Returns a JSON response containing the elements of a reference book.",
@@ -95,21 +153,69 @@ class RefbookElementsView(generics.RetrieveAPIView):
             openapi.Parameter('id', openapi.IN_PATH, description="ID of the reference book", type=openapi.TYPE_INTEGER),
             openapi.Parameter('version', openapi.IN_QUERY, description="Version of the reference book",
                               type=openapi.TYPE_STRING),
+            openapi.Parameter('stream', openapi.IN_QUERY,
+                              description="Stream the elements straight from the database: "
+                                          "'1' or 'true' for JSON, 'ndjson' for newline-delimited JSON; "
+                                          "'0' or 'false' returns a regular response",
+                              type=openapi.TYPE_STRING),
+            openapi.Parameter('cursor', openapi.IN_QUERY,
+                              description="Opaque cursor from the 'next' or 'previous' link of a previous page",
+                              type=openapi.TYPE_STRING),
+            openapi.Parameter('limit', openapi.IN_QUERY,
+                              description="Number of elements per page, ordered by code. "
+                                          "If neither cursor nor limit is given, all elements are returned",
+                              type=openapi.TYPE_INTEGER),
         ]
     )
     def get(self, request, *args, **kwargs):
         """
         Получение элементов справочника.
+        Если параметр stream истинен (1, true) или равен ndjson, элементы отдаются потоковым ответом
+        в формате JSON или NDJSON; stream=0 или stream=false означает обычный ответ.
+        Если передан параметр cursor или limit, элементы отдаются постранично в порядке кода.
+        Ответ содержит ETag и Last-Modified версии; при совпадении If-None-Match или
+        If-Modified-Since возвращается 304 без обращения к элементам справочника.
 
         Returns:
         -------
         elements : list
             Список элементов справочника.
         """
-        queryset = self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True)
+        try:
+            stream = stream_format(self.request.query_params.get('stream'))
+        except ValueError:
+            return Response({"message": "Invalid stream, expected a boolean or ndjson"}, status=400)
 
-        response_data = {"elements": serializer.data}
+        refbook_version = self.get_version()
+        versioned = bool(self.request.query_params.get('version'))
+        if refbook_version is not None:
+            not_modified = not_modified_response(request, refbook_version, versioned)
+            if not_modified is not None:
+                return not_modified
+
+        response = self.get_elements_response(refbook_version, stream)
+        if refbook_version is not None:
+            set_cache_headers(response, request, refbook_version, versioned)
+        return response
+
+    def get_elements_response(self, refbook_version, stream=None):
+        version_id = refbook_version.id if refbook_version else None
+
+        # Версии справочника из кэша: по ним определяется цепочка родительских версий производной версии
+        versions = element_cache.get_versions(self.kwargs.get('id'))
+        if stream:
+            snapshot = snapshots.open(version_id, refbook_version.revision) if refbook_version else None
+            return stream_elements(version_id, ndjson=stream == 'ndjson', versions=versions,
+                                   rows=snapshot.items() if snapshot is not None else None)
+
+        if 'cursor' in self.request.query_params or 'limit' in self.request.query_params:
+            queryset = ReferenceElement.objects.in_version(version_id, versions).values('code', 'value')
+            page = self.paginate_queryset(queryset)
+            return self.get_paginated_response(page)
+
+        elements = element_items(self.kwargs.get('id'), refbook_version) if refbook_version else ()
+
+        response_data = {"elements": [{"code": code, "value": value} for code, value in elements]}
         return Response(response_data)
 
 
@@ -168,21 +274,448 @@ class RefbookElementCheckView(APIView):
         value = self.request.query_params.get('value')
         version = self.request.query_params.get('version')
 
-        # Получаем объект справочника по его идентификатору
-        refbook = Reference.objects.get(id=id)
+        # Получаем версии справочника по его идентификатору
+        versions = get_refbook_versions(id)
 
-        # Если версия не указана, получаем текущую версию справочника
+        # Если версия не указана, получаем текущую версию справочника,
+        # иначе версию справочника с указанным номером версии
         if version is None:
-            current_version = refbook.get_current_version()
-            if current_version is None:
+            refbook_version = find_version_on_date(versions, datetime.date.today())
+            if refbook_version is None:
                 return Response({"message": "No current version found"}, status=404)
-            version = current_version.version
+        else:
+            refbook_version = find_version(versions, version)
+
+        if refbook_version is None:
+            return Response({"exists": False})
 
-        # Получаем версию справочника с указанным номером версии
-        refbook_version = ReferenceVersion.objects.filter(reference=refbook, version=version).first()
+        not_modified = not_modified_response(request, refbook_version, version is not None)
+        if not_modified is not None:
+            return not_modified
 
         # Проверяем, есть ли элемент с указанным кодом и значением в данной версии справочника
-        element_exists = ReferenceElement.objects.filter(version=refbook_version, code=code, value=value).exists()
+        element_exists = element_index(id, refbook_version).contains(code, value)
 
         # Возвращаем результат проверки
-        return Response({"exists": element_exists})
+        return set_cache_headers(Response({"exists": element_exists}), request, refbook_version, version is not None)
+
+
+class RefbookElementsBulkCheckView(APIView):
+    """
+    Представление для пакетной проверки элементов справочника.
+    Принимает список пар код/значение и проверяет их в одной версии справочника,
+    которая определяется один раз на весь запрос.
+    Справочник задаётся идентификатором (id) или уникальным кодом (code).
+
+    """
+    max_items = getattr(settings, 'REFERENCE_BULK_CHECK_MAX_ITEMS', 10000)
+
+    def get_refbook_id(self):
+        """
+        Возвращает идентификатор справочника по идентификатору или коду из URL.
+
+        Raises: Http404:
+        В случае отсутствия запрашиваемого справочника.
+        """
+        if 'code' in self.kwargs:
+            return get_object_or_404(Reference, code=self.kwargs['code']).id
+        return self.kwargs['id']
+
+    @swagger_auto_schema(
+        operation_summary="Bulk check reference elements",
+        operation_description="Checks a list of code/value pairs against a single version of a reference book."
+                              " The version is resolved once: by its number, by the effective date,"
+                              " or the current one if neither is given. Results are returned in input order.",
+        request_body=BulkCheckElementsSerializer,
+        responses={200: 'results'},
+    )
+    def post(self, request, *args, **kwargs):
+        """
+        POST request body:
+        elements (list): Список объектов {"code": ..., "value": ...} для проверки.
+        version (str, optional): Версия справочника для проверки.
+        date (str, optional): Дата в формате yyyy-mm-dd, на которую определяется версия.
+        Returns: Объект JSON с версией справочника и списком результатов
+         {"code", "value", "exists"} в порядке входных элементов."""
+        serializer = BulkCheckElementsSerializer(data=request.data, context={'max_items': self.max_items})
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        refbook_id = self.get_refbook_id()
+        versions = get_refbook_versions(refbook_id)
+
+        if 'version' in data:
+            refbook_version = find_version(versions, data['version'])
+            if refbook_version is None:
+                return Response({"message": "Version not found"}, status=404)
+        elif 'date' in data:
+            refbook_version = find_version_on_date(versions, data['date'])
+            if refbook_version is None:
+                return Response({"message": "No version found for the date"}, status=404)
+        else:
+            refbook_version = find_version_on_date(versions, datetime.date.today())
+            if refbook_version is None:
+                return Response({"message": "No current version found"}, status=404)
+
+        index = element_index(refbook_id, refbook_version)
+        exists = index.contains_many((element['code'], element['value']) for element in data['elements'])
+
+        results = [
+            {"code": element['code'], "value": element['value'], "exists": element_exists}
+            for element, element_exists in zip(data['elements'], exists)
+        ]
+        return Response({"version": refbook_version.version, "results": results})
+
+
+class RefbookDocumentValidateView(APIView):
+    """
+    Представление для проверки документа, поля которого ссылаются на элементы разных справочников.
+    Версии всех справочников определяются на одну дату за один проход,
+    проверки группируются по версиям.
+
+    """
+    max_items = getattr(settings, 'REFERENCE_BULK_CHECK_MAX_ITEMS', 10000)
+
+    @swagger_auto_schema(
+        operation_summary="Validate a document against several reference books",
+        operation_description="Checks a list of refbook_code/code/value triples. The version of every"
+                              " reference book is resolved once for the given date (today by default)."
+                              " Results are returned in input order; the document is valid if every"
+                              " element exists.",
+        request_body=ValidateDocumentSerializer,
+        responses={200: 'report'},
+    )
+    def post(self, request, *args, **kwargs):
+        """
+        POST request body:
+        elements (list): Список объектов {"refbook_code": ..., "code": ..., "value": ...}.
+        date (str, optional): Дата в формате yyyy-mm-dd, на которую определяются версии справочников.
+        Returns: Объект JSON с признаком valid, версиями справочников и списком результатов
+         {"refbook_code", "code", "value", "version", "exists"} в порядке входных элементов;
+         для неизвестного справочника или справочника без версии на дату результат содержит поле error."""
+        serializer = ValidateDocumentSerializer(data=request.data, context={'max_items': self.max_items})
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        date = data.get('date') or datetime.date.today()
+
+        refbook_codes = {element['refbook_code'] for element in data['elements']}
+        refbook_ids = dict(Reference.objects.filter(code__in=refbook_codes).values_list('code', 'id'))
+        versions = element_cache.bulk_resolve(list(refbook_ids.values()), date)
+
+        indexes = {}
+        for refbook_code, refbook_id in refbook_ids.items():
+            refbook_version = versions[refbook_id]
+            if refbook_version is not None:
+                indexes[refbook_code] = (refbook_version, element_index(refbook_id, refbook_version))
+
+        # Элементы каждого справочника проверяются одним вызовом contains_many
+        exists = {}
+        for refbook_code, (_, index) in indexes.items():
+            pairs = [(element['code'], element['value'])
+                     for element in data['elements'] if element['refbook_code'] == refbook_code]
+            exists[refbook_code] = iter(index.contains_many(pairs))
+
+        results = []
+        for element in data['elements']:
+            refbook_code = element['refbook_code']
+            result = {"refbook_code": refbook_code, "code": element['code'], "value": element['value']}
+            if refbook_code in indexes:
+                refbook_version, _ = indexes[refbook_code]
+                result.update(version=refbook_version.version, exists=next(exists[refbook_code]))
+            else:
+                error = "No version found for the date" if refbook_code in refbook_ids else "Reference book not found"
+                result.update(version=None, exists=False, error=error)
+            results.append(result)
+
+        return Response({
+            "date": date,
+            "valid": all(result['exists'] for result in results),
+            "versions": {refbook_code: refbook_version.version
+                         for refbook_code, (refbook_version, _) in sorted(indexes.items())},
+            "results": results,
+        })
+
+
+class RefbookImportView(APIView):
+    """
+    Представление для загрузки новой версии справочника из файла CSV, JSON или NDJSON.
+    Файл разбирается потоково, элементы сохраняются пакетами через bulk_create.
+    Доступно только администраторам.
+
+    """
+    permission_classes = [permissions.IsAdminUser]
+    parser_classes = [MultiPartParser]
+
+    @swagger_auto_schema(
+        operation_summary="Import reference book version",
+        operation_description="Creates a new version of the reference book from an uploaded CSV"
+                              " (code,value header), JSON or NDJSON file.",
+        request_body=RefbookImportSerializer,
+        responses={201: 'imported version'},
+    )
+    def post(self, request, id):
+        """
+        POST request body (multipart/form-data):
+        file: Файл с элементами справочника.
+        version (str): Номер новой версии.
+        start_date (str): Дата начала действия версии в формате yyyy-mm-dd.
+        format (str, optional): csv, json или ndjson. По умолчанию определяется по расширению файла.
+        Returns: Объект JSON с созданной версией, числом элементов и скоростью импорта."""
+        serializer = RefbookImportSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        refbook = get_object_or_404(Reference, id=id)
+        import_format = data.get('format') or guess_format(data['file'].name)
+        if import_format is None:
+            return Response({"message": "Cannot guess the file format, specify format"}, status=400)
+
+        stream = io.TextIOWrapper(data['file'].file, encoding='utf-8', newline='')
+        try:
+            result = import_version(refbook, data['version'], data['start_date'], iter_rows(stream, import_format))
+        except (RefbookImportError, UnicodeDecodeError) as error:
+            return Response({"message": str(error)}, status=400)
+
+        return Response({
+            "id": result.version.id,
+            "version": result.version.version,
+            "start_date": result.version.start_date,
+            "elements": result.count,
+            "seconds": round(result.seconds, 3),
+            "rows_per_second": round(result.count / result.seconds) if result.seconds else None,
+        }, status=201)
+
+
+class RefbookVersionDeriveView(APIView):
+    """
+    Представление для публикации новой версии справочника как набора изменений
+    (добавленные, изменённые и удалённые коды) относительно родительской версии.
+    Доступно только администраторам.
+
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    @swagger_auto_schema(
+        operation_summary="Derive reference book version",
+        operation_description="Creates a new version of the reference book from the parent version"
+                              " and a delta of added, changed and removed codes.",
+        request_body=DeriveVersionSerializer,
+        responses={201: 'derived version'},
+    )
+    def post(self, request, id):
+        """
+        POST request body:
+        parent_version (str): Номер родительской версии.
+        version (str): Номер новой версии.
+        start_date (str): Дата начала действия версии в формате yyyy-mm-dd.
+        added (list, optional): Новые элементы {"code", "value"}.
+        changed (list, optional): Элементы с новыми значениями {"code", "value"}.
+        removed (list, optional): Коды удалённых элементов.
+        Returns: Объект JSON с созданной версией и числом её элементов."""
+        serializer = DeriveVersionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        refbook = get_object_or_404(Reference, id=id)
+        parent = ReferenceVersion.objects.filter(reference=refbook, version=data['parent_version']).first()
+        if parent is None:
+            return Response({"message": "Parent version not found"}, status=404)
+
+        try:
+            result = derive_version(
+                parent, data['version'], data['start_date'],
+                added=[(element['code'], element['value']) for element in data.get('added', [])],
+                changed=[(element['code'], element['value']) for element in data.get('changed', [])],
+                removed=data.get('removed', []),
+            )
+        except RefbookImportError as error:
+            return Response({"message": str(error)}, status=400)
+
+        return Response({
+            "id": result.version.id,
+            "version": result.version.version,
+            "start_date": result.version.start_date,
+            "parent_version": parent.version,
+            "elements": result.count,
+        }, status=201)
+
+
+class RefbookVersionDiffView(APIView):
+    """
+    Представление, возвращающее различия между двумя версиями справочника.
+
+    """
+
+    @swagger_auto_schema(
+        operation_summary="Diff reference book versions",
+        operation_description="Returns codes added, changed and removed between two versions of a reference book.",
+        responses={200: 'diff'},
+        manual_parameters=[
+            openapi.Parameter('from', openapi.IN_QUERY, description="Old version of the reference book",
+                              type=openapi.TYPE_STRING, required=True),
+            openapi.Parameter('to', openapi.IN_QUERY, description="New version of the reference book",
+                              type=openapi.TYPE_STRING, required=True),
+        ]
+    )
+    def get(self, request, id):
+        """
+        GET request parameters:
+        id (int): Идентификатор справочника.
+        from (str): Старая версия справочника.
+        to (str): Новая версия справочника.
+        Returns: Объект JSON со списками added, changed и removed, отсортированными по коду."""
+        old_number = self.request.query_params.get('from')
+        new_number = self.request.query_params.get('to')
+        if not old_number or not new_number:
+            return Response({"message": "Both from and to versions are required"}, status=400)
+
+        versions = get_refbook_versions(id)
+        old_version = find_version(versions, old_number)
+        new_version = find_version(versions, new_number)
+        if old_version is None or new_version is None:
+            return Response({"message": "Version not found"}, status=404)
+
+        diff = diff_elements(element_cache.get_elements(id, old_version.id),
+                             element_cache.get_elements(id, new_version.id))
+        return Response({
+            "from": old_version.version,
+            "to": new_version.version,
+            "added": [{"code": code, "value": value} for code, value in diff.added],
+            "changed": [{"code": code, "old_value": old_value, "new_value": new_value}
+                        for code, old_value, new_value in diff.changed],
+            "removed": [{"code": code, "value": value} for code, value in diff.removed],
+        })
+
+
+class RefbookElementSearchView(APIView):
+    """
+    Представление для поиска элементов справочника по префиксу кода и словам значения
+    (автодополнение) в указанной или текущей версии справочника.
+
+    """
+
+    @swagger_auto_schema(
+        operation_summary="Search reference elements",
+        operation_description="Searches elements of a reference book version by code prefix and/or words"
+                              " of the value. The last word is matched as a prefix. Results are ranked"
+                              " by relevance when q is given, otherwise ordered by code.",
+        responses={200: 'elements'},
+        manual_parameters=[
+            openapi.Parameter('q', openapi.IN_QUERY, description="Words that must occur in the element value",
+                              type=openapi.TYPE_STRING),
+            openapi.Parameter('code', openapi.IN_QUERY, description="Element code prefix",
+                              type=openapi.TYPE_STRING),
+            openapi.Parameter('version', openapi.IN_QUERY,
+                              description="Version of the reference book. The current version if omitted",
+                              type=openapi.TYPE_STRING),
+            openapi.Parameter('limit', openapi.IN_QUERY,
+                              description=f"Maximum number of results, {SEARCH_DEFAULT_LIMIT} by default,"
+                                          f" at most {SEARCH_MAX_LIMIT}",
+                              type=openapi.TYPE_INTEGER),
+        ]
+    )
+    def get(self, request, id):
+        """
+        GET request parameters:
+        id (int): Идентификатор справочника.
+        q (str, optional): Слова, которые должны встречаться в значении элемента.
+        code (str, optional): Префикс кода элемента.
+        version (str, optional): Версия справочника, по умолчанию текущая.
+        limit (int, optional): Максимальное число результатов.
+        Returns: Объект JSON с версией справочника и списком найденных элементов {"code", "value"}."""
+        serializer = ElementSearchSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        versions = get_refbook_versions(id)
+        if 'version' in data:
+            refbook_version = find_version(versions, data['version'])
+            if refbook_version is None:
+                return Response({"message": "Version not found"}, status=404)
+        else:
+            refbook_version = find_version_on_date(versions, datetime.date.today())
+            if refbook_version is None:
+                return Response({"message": "No current version found"}, status=404)
+
+        not_modified = not_modified_response(request, refbook_version, 'version' in data)
+        if not_modified is not None:
+            return not_modified
+
+        results = search_elements(id, refbook_version.id, query=data.get('q'), code_prefix=data.get('code'),
+                                  limit=data['limit'])
+        response = Response({
+            "version": refbook_version.version,
+            "elements": [{"code": code, "value": value} for code, value in results],
+        })
+        return set_cache_headers(response, request, refbook_version, 'version' in data)
+
+
+class RefbookChangesView(APIView):
+    """
+    Представление для синхронизации локальных копий справочника: изменения версий и элементов
+    после курсора клиента из журнала изменений (reference.changelog).
+
+    """
+
+    @swagger_auto_schema(
+        operation_summary="Get reference book changes since cursor",
+        operation_description="Returns version and element inserts, updates and deletes of a reference book"
+                              " after the client's cursor, in order. Without since, returns the current cursor"
+                              " only: take it before downloading the elements, then poll with since=cursor."
+                              " A version insert without parent means the whole version must be downloaded;"
+                              " with parent, the version starts as a copy of the parent version."
+                              " Changes carry version_id, which stays the same when a version is renamed.",
+        responses={200: 'changes'},
+        manual_parameters=[
+            openapi.Parameter('since', openapi.IN_QUERY,
+                              description="Cursor: seq of the last change already applied by the client",
+                              type=openapi.TYPE_INTEGER),
+            openapi.Parameter('limit', openapi.IN_QUERY,
+                              description=f"Maximum number of changes, {SYNC_DEFAULT_LIMIT} by default,"
+                                          f" at most {SYNC_MAX_LIMIT}",
+                              type=openapi.TYPE_INTEGER),
+        ]
+    )
+    def get(self, request, id):
+        """
+        GET request parameters:
+        id (int): Идентификатор справочника.
+        since (int, optional): Курсор — номер последнего изменения, уже применённого клиентом.
+        limit (int, optional): Максимальное число изменений.
+        Returns: Объект JSON с новым курсором, признаком more (есть ещё изменения) и списком изменений."""
+        serializer = ChangesQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        get_object_or_404(Reference, id=id)
+        if 'since' not in data:
+            return Response({"cursor": latest_cursor(id), "more": False, "changes": []})
+
+        changes, cursor, more = changes_since(id, data['since'], data['limit'])
+        return Response({"cursor": cursor, "more": more, "changes": changes})
+
+
+def metrics_allowed(request):
+    """
+    Проверяет, что метрики можно отдать: пользователь — сотрудник (is_staff) или адрес клиента входит
+    в одну из сетей настройки REFERENCE_METRICS_ALLOWED_IPS (по умолчанию только локальный адрес).
+    """
+    if request.user.is_staff:
+        return True
+    networks = getattr(settings, 'REFERENCE_METRICS_ALLOWED_IPS', ('127.0.0.1', '::1'))
+    try:
+        address = ipaddress.ip_address(request.META.get('REMOTE_ADDR', ''))
+    except ValueError:
+        return False
+    return any(address in ipaddress.ip_network(network, strict=False) for network in networks)
+
+
+@require_GET
+def metrics_view(request):
+    """
+    Метрики запросов и кэша в текстовом формате Prometheus.
+    Доступны сотрудникам и клиентам из сетей REFERENCE_METRICS_ALLOWED_IPS (metrics_allowed).
+    """
+    if not metrics_allowed(request):
+        return HttpResponseForbidden()
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,124 @@
+"""
+Предварительная загрузка в кэш версий справочников, которые скоро станут текущими.
+
+Текущая версия определяется по дате начала действия, поэтому в день смены версии все воркеры
+одновременно промахиваются по кэшу новой версии. Записи кэша и снимки привязаны к идентификатору версии,
+а не к признаку «текущая», поэтому заранее загруженная версия начинает использоваться в момент смены
+без дополнительных действий.
+
+Загрузку выполняют:
+    - команда warm_cache — снимки версий (REFERENCE_SNAPSHOT_DIR) и общий кэш (REFERENCE_CACHE_URL);
+    - планировщик WarmupScheduler в каждом процессе сервера, если задан REFERENCE_WARMUP_INTERVAL, —
+      ещё и кэш в памяти процесса.
+"""
+import datetime
+import logging
+import threading
+
+from django.conf import settings
+from django.db import connections
+
+from .cache import element_cache
+from .models import Reference, ReferenceVersion
+from .snapshots import build_snapshot, element_index, element_items, snapshot_dir, snapshots
+
+logger = logging.getLogger('reference.warmup')
+
+# За сколько дней до начала действия версии она загружается в кэш
+WARMUP_DAYS_AHEAD = getattr(settings, 'REFERENCE_WARMUP_DAYS_AHEAD', 1)
+
+
+def upcoming_versions(days=WARMUP_DAYS_AHEAD, today=None, current=False):
+    """
+    Возвращает версии справочников, которые станут текущими в ближайшие days дней.
+
+    :argument:
+        days (int): число дней после today
+        today (date, optional): дата отсчёта, по умолчанию сегодня
+        current (bool): добавить версии, текущие на сегодня (для загрузки после перезапуска)
+
+    :returns:
+        list[tuple[int, VersionInfo]]: пары (id справочника, версия)
+    """
+    today = today or datetime.date.today()
+    pairs = list(ReferenceVersion.objects.filter(
+        start_date__gt=today, start_date__lte=today + datetime.timedelta(days=days)
+    ).order_by('start_date').values_list('reference_id', 'id'))
+    if current:
+        pairs += Reference.objects.filter(current_version__isnull=False).values_list('id', 'current_version_id')
+    versions = element_cache.get_versions_many(refbook_id for refbook_id, _ in pairs)
+    result = []
+    for refbook_id, version_id in dict.fromkeys(pairs):
+        version = next((item for item in versions[refbook_id] if item.id == version_id), None)
+        if version is not None:
+            result.append((refbook_id, version))
+    return result
+
+
+def warm_version(refbook_id, refbook_version):
+    """
+    Загружает версию справочника так же, как её читают представления: элементы и индекс для проверки
+    элементов берутся из снимка, если он задан (недостающий снимок строится), иначе — из кэша элементов.
+    """
+    if snapshot_dir() is not None and snapshots.open(refbook_version.id, refbook_version.revision) is None:
+        build_snapshot(refbook_version.id)
+    element_index(refbook_id, refbook_version)
+    element_items(refbook_id, refbook_version)
+
+
+def warm_upcoming(days=WARMUP_DAYS_AHEAD, today=None, current=False):
+    """
+    Загружает в кэш версии справочников, которые станут текущими в ближайшие days дней.
+
+    :returns:
+        list[tuple[int, VersionInfo]]: загруженные версии
+    """
+    versions = upcoming_versions(days, today, current)
+    for refbook_id, refbook_version in versions:
+        warm_version(refbook_id, refbook_version)
+    return versions
+
+
+class WarmupScheduler(threading.Thread):
+    """
+    Фоновый поток процесса сервера, который раз в interval секунд загружает в кэш версии,
+    становящиеся текущими в ближайшие days дней. При первом запуске загружаются и текущие версии.
+    """
+
+    def __init__(self, interval, days=WARMUP_DAYS_AHEAD):
+        super().__init__(name='reference-warmup', daemon=True)
+        self.interval = interval
+        self.days = days
+        self._stopped = threading.Event()
+
+    def run(self):
+        current = True
+        while not self._stopped.is_set():
+            try:
+                versions = warm_upcoming(self.days, current=current)
+                logger.debug('Warmed %d reference book versions', len(versions))
+                current = False
+            except Exception:
+                logger.exception('Reference book cache warmup failed')
+            finally:
+                # Соединения потока не закрываются автоматически, как соединения запросов
+                connections.close_all()
+            self._stopped.wait(self.interval)
+
+    def stop(self):
+        self._stopped.set()
+
+
+def start_scheduler():
+    """
+    Запускает WarmupScheduler, если задан REFERENCE_WARMUP_INTERVAL (вызывается из config.wsgi и config.asgi).
+
+    :returns:
+        запущенный планировщик или None
+    """
+    interval = getattr(settings, 'REFERENCE_WARMUP_INTERVAL', None)
+    if not interval:
+        return None
+    scheduler = WarmupScheduler(interval)
+    scheduler.start()
+    return scheduler